@@ -0,0 +1,268 @@
+"""
+Асинхронные представления горячих путей чтения для режима ASGI.
+
+Подключаются через foodgram.urls_asgi поверх обычных маршрутов и отвечают
+так же, как представления DRF из api.views: пока запрос ждет базу или
+кэш, процесс обслуживает другие соединения. Запросы на запись и
+варианты, которые асинхронно не поддерживаются (поиск, keyset-пагинация),
+передаются синхронным представлениям DRF.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from api.authentication import CachedTokenAuthentication
+from api.conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_conditional_headers,
+)
+from api.views import IngredientsViewSet, RecipesViewSet, TagViewSet
+from foodgram.settings import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENT_SEARCH_MAX_LIMIT,
+    SHORT_LINK_REDIRECT_MAX_AGE,
+)
+from recipes.models import Ingredient, Tag
+from recipes.services.ingredient_index import get_ingredient_index
+from recipes.services.recipe_fragments import aget_recipe_fragments
+from recipes.services.short_links import (
+    arecipe_exists,
+    get_id_from_short_link,
+    get_recipe_path,
+)
+
+READ_METHODS = ('GET', 'HEAD')
+# Параметры списка рецептов, которые обрабатывает синхронное
+# представление DRF: поиск и keyset-пагинация
+SYNC_RECIPE_PARAMS = ('search', 'cursor')
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def error_response(exc):
+    response = json_response(
+        exc.detail
+        if isinstance(exc.detail, (list, dict))
+        else {'detail': exc.detail},
+        status=exc.status_code,
+    )
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+    return response
+
+
+def read_view(sync_view):
+    """Оборачивает async-представление: запросы кроме GET/HEAD уходят в
+    sync_view, ошибки DRF превращаются в ответы как в api.views."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in READ_METHODS:
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs
+                )
+            try:
+                user = await CachedTokenAuthentication().aauthenticate(
+                    request
+                )
+                request.user = user[0] if user else AnonymousUser()
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+            except Http404:
+                return error_response(exceptions.NotFound())
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def get_viewset(viewset_class, request, action, **kwargs):
+    """Экземпляр viewset для переиспользования его методов (фильтры,
+    пагинация, наложение полей пользователя) в async-представлении."""
+    drf_request = Request(request)
+    drf_request.user = request.user
+    return viewset_class(
+        request=drf_request,
+        args=(),
+        kwargs=kwargs,
+        action=action,
+        format_kwarg=None,
+    )
+
+
+async def render_recipes(view, recipes):
+    fragments = await aget_recipe_fragments(
+        view.get_fragment_versions(recipes),
+        sync_to_async(view.render_fragments),
+    )
+    return view.apply_overlay(recipes, fragments)
+
+
+recipes_list_sync = RecipesViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='recipes', detail=False
+)
+recipes_detail_sync = RecipesViewSet.as_view(
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    basename='recipes',
+    detail=True,
+)
+
+
+@read_view(recipes_list_sync)
+async def recipe_list(request):
+    if any(param in request.GET for param in SYNC_RECIPE_PARAMS):
+        return await sync_to_async(recipes_list_sync)(request)
+    view = get_viewset(RecipesViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_overlay_queryset())
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset, view.request)
+    recipes = (
+        [recipe async for recipe in queryset] if page is None else page
+    )
+
+    versions = [view.get_versions(recipe) for recipe in recipes]
+    etag = make_etag(
+        request.get_full_path(),
+        versions
+        if page is None
+        else paginator.get_paginated_response(versions).data,
+    )
+    not_modified = get_not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    data = await render_recipes(view, recipes)
+    if page is not None:
+        data = paginator.get_paginated_response(data).data
+    return set_conditional_headers(json_response(data), etag)
+
+
+@read_view(recipes_detail_sync)
+async def recipe_detail(request, pk):
+    view = get_viewset(RecipesViewSet, request, 'retrieve', pk=pk)
+    recipe = await view.get_overlay_queryset().filter(pk=pk).afirst()
+    if recipe is None:
+        raise Http404
+
+    etag = make_etag('recipe', view.get_versions(recipe))
+    last_modified = view.get_last_modified(recipe)
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    data = (await render_recipes(view, [recipe]))[0]
+    return set_conditional_headers(
+        json_response(data), etag, last_modified
+    )
+
+
+@read_view(TagViewSet.as_view({'get': 'list'}, basename='tags', detail=False))
+async def tag_list(request):
+    tags = Tag.objects.values('id', 'name', 'slug')
+    if 'name' in request.GET:
+        tags = tags.filter(name=request.GET['name'])
+    return json_response([tag async for tag in tags])
+
+
+@read_view(
+    TagViewSet.as_view({'get': 'retrieve'}, basename='tags', detail=True)
+)
+async def tag_detail(request, pk):
+    tag = await Tag.objects.values('id', 'name', 'slug').filter(pk=pk).afirst()
+    if tag is None:
+        raise Http404
+    return json_response(tag)
+
+
+def ingredient_rows():
+    # Аннотация не может называться как поле модели measurement_unit
+    return Ingredient.objects.values(
+        'id', 'name', unit_name=F('measurement_unit__name')
+    )
+
+
+def ingredient_data(row):
+    """Строка ingredient_rows в формате IngredientSerializer."""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'measurement_unit': row['unit_name'],
+    }
+
+
+@read_view(
+    IngredientsViewSet.as_view(
+        {'get': 'list'}, basename='ingredients', detail=False
+    )
+)
+async def ingredient_list(request):
+    name = request.GET.get('name')
+    # Индекс строится из базы, если файла еще нет
+    index = await sync_to_async(get_ingredient_index)() if name else None
+    if index is not None:
+        limit = request.GET.get('limit', '')
+        limit = (
+            min(int(limit), INGREDIENT_SEARCH_MAX_LIMIT)
+            if limit.isdigit()
+            else INGREDIENT_SEARCH_LIMIT
+        )
+        return json_response(index.search(name, limit))
+
+    ingredients = ingredient_rows()
+    if name:
+        ingredients = ingredients.filter(name__istartswith=name)
+    return json_response(
+        [ingredient_data(row) async for row in ingredients]
+    )
+
+
+@read_view(
+    IngredientsViewSet.as_view(
+        {'get': 'retrieve'}, basename='ingredients', detail=True
+    )
+)
+async def ingredient_detail(request, pk):
+    ingredient = await ingredient_rows().filter(pk=pk).afirst()
+    if ingredient is None:
+        raise Http404
+    return json_response(ingredient_data(ingredient))
+
+
+async def short_recipe_redirect(request, code):
+    try:
+        recipe_id = get_id_from_short_link(code)
+    except ValueError:
+        raise Http404('Invalid short link')
+
+    if not await arecipe_exists(recipe_id):
+        raise Http404('Recipe not found')
+    response = HttpResponseRedirect(get_recipe_path(recipe_id))
+    patch_cache_control(
+        response, public=True, max_age=SHORT_LINK_REDIRECT_MAX_AGE
+    )
+    return response
@@ -0,0 +1,62 @@
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+
+from foodgram.db.routers import read_from
+from recipes.services.auth_cache import cache_user, get_cached_user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который берет пользователя из кэша
+    recipes.services.auth_cache и обращается к базе только при промахе."""
+
+    def authenticate_credentials(self, key):
+        user = get_cached_user(key)
+        if user is None:
+            # Токен мог быть выдан только что и еще не дойти до реплики
+            with read_from(None):
+                user, token = super().authenticate_credentials(key)
+            cache_user(key, user)
+            return user, token
+        return self._check_cached(key, user)
+
+    def _check_cached(self, key, user):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        token = Token(key=key, user_id=user.pk)
+        token.user = user
+        return user, token
+
+    async def aauthenticate(self, request):
+        """Асинхронный вариант authenticate для async-представлений:
+        из LRU процесса пользователь берется без перехода в поток."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.')
+            )
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain '
+                  'spaces.')
+            )
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain '
+                  'invalid characters.')
+            )
+        user = get_cached_user(key, use_shared=False)
+        if user is not None:
+            return self._check_cached(key, user)
+        return await sync_to_async(self.authenticate_credentials)(key)
@@ -0,0 +1,45 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Собирает значение заголовка ETag из частей версии ресурса."""
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def set_conditional_headers(response, etag, last_modified=None):
+    """Добавляет в ответ валидаторы кэша.
+
+    Ответы зависят от пользователя (is_favorited, is_subscribed и т.п.),
+    поэтому разрешено только приватное кэширование с перепроверкой.
+    """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """Проверяет If-None-Match/If-Modified-Since запроса.
+
+    Возвращает готовый ответ 304 (или 412 для If-Match), если клиентская
+    копия актуальна, иначе None.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is not None:
+        set_conditional_headers(response, etag, last_modified)
+    return response
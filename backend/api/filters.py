@@ -1,6 +1,13 @@
-from django_filters.rest_framework import CharFilter, FilterSet, NumberFilter
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import (
+    CharFilter,
+    ChoiceFilter,
+    FilterSet,
+    NumberFilter,
+)
 
 from recipes.models import Ingredient, Recipe
+from recipes.services.search import search_recipes
 
 
 class IngredientFilter(FilterSet):
@@ -16,11 +23,25 @@ class RecipeFilters(FilterSet):
     author = CharFilter(field_name='author__id', lookup_expr='exact')
     is_in_shopping_cart = NumberFilter(method='filter_is_in_shopping_cart')
     is_favorited = NumberFilter(method='filter_is_favorited')
+    search = CharFilter(method='filter_search')
+    # Объявлен последним: сортировка заменяет порядок, заданный поиском
+    ordering = ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='filter_ordering',
+    )
 
     def filter_tags(self, queryset, name, value):
         tags = self.request.query_params.getlist('tags')
         if tags:
-            return queryset.filter(tags__slug__in=tags).distinct()
+            # EXISTS вместо JOIN + DISTINCT: не размножает строки рецептов
+            # и не мешает сортировке по индексу
+            return queryset.filter(
+                Exists(
+                    Recipe.tags.through.objects.filter(
+                        recipe=OuterRef('pk'), tag__slug__in=tags
+                    )
+                )
+            )
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
@@ -39,6 +60,17 @@ class RecipeFilters(FilterSet):
             return queryset.filter(favorites__user=user)
         return queryset.exclude(favorites__user=user)
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        # Рейтинги хранятся готовыми (recipes.services.scores), порядок
+        # совпадает с индексами recipe_popularity_idx и recipe_trending_idx
+        field = (
+            'popularity_score' if value == 'popular' else 'trending_score'
+        )
+        return queryset.order_by(f'-{field}', '-id')
+
     class Meta:
         model = Recipe
         fields = (
@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -6,3 +15,217 @@ class PageLimitPagination(PageNumberPagination):
     page_query_param = 'page'
     default_limit = 6
     max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request):
+        """Асинхронный вариант paginate_queryset для async-представлений:
+        количество и строки страницы читаются асинхронным ORM."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count — cached_property, Paginator не будет считать его сам
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.page.object_list = [
+            row async for row in self.page.object_list
+        ]
+        return self.page.object_list
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу (keyset/cursor pagination).
+
+    Вместо OFFSET следующая страница выбирается условием по значениям
+    полей сортировки последней строки, поэтому глубокие страницы
+    читаются индексом так же быстро, как первая.
+    Порядок берется из order_by() queryset или Meta.ordering модели,
+    к нему добавляется -id для однозначности.
+    Точное количество объектов (count) можно отключить параметром
+    ?count=false.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param, '')
+        if value.isdigit() and int(value) > 0:
+            return min(int(value), self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(item, str) or '?' in item:
+                continue
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            ordering.append(('id' if name == 'pk' else name, descending))
+        if not any(name == 'id' for name, _ in ordering):
+            ordering.append(('id', True))
+        return ordering
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps(
+            {'v': values, 'r': reverse},
+            default=lambda value: value.isoformat(),
+            separators=(',', ':'),
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = payload['v']
+            reverse = bool(payload['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = []
+            for (name, _), value in zip(self.ordering, values):
+                try:
+                    field = queryset.model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    # Аннотация (например, ранг поиска)
+                    position.append(value)
+                else:
+                    position.append(field.to_python(value))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def keyset_filter(self, position, reverse):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_index, (prev_name, _) in enumerate(self.ordering[:index]):
+                step &= Q(**{prev_name: position[prev_index]})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.page_size = self.get_page_size(request)
+        self.with_count = (
+            request.query_params.get(self.count_query_param, '').lower()
+            not in ('false', '0')
+        )
+        self.count = queryset.count() if self.with_count else None
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if cursor:
+            position, reverse = self.decode_cursor(queryset, cursor)
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+
+        order_by = [
+            F(name).asc() if descending == reverse else F(name).desc()
+            for name, descending in self.ordering
+        ]
+        queryset = queryset.annotate(
+            **{
+                f'keyset_{index}': F(name)
+                for index, (name, _) in enumerate(self.ordering)
+            }
+        ).order_by(*order_by)
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.has_next = has_more if not reverse else bool(cursor)
+        self.has_previous = bool(cursor) and (has_more if reverse else True)
+        self.first_position = self._position(rows[0]) if rows else None
+        self.last_position = self._position(rows[-1]) if rows else None
+        return rows
+
+    def _position(self, row):
+        return [
+            (
+                row[f'keyset_{index}']
+                if isinstance(row, dict)
+                else getattr(row, f'keyset_{index}')
+            )
+            for index in range(len(self.ordering))
+        ]
+
+    def _link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse),
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.cursor_query_param, '')
+        return self._link(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.with_count:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class FeedPagination(KeysetPagination):
+    """Keyset-пагинация ленты подписок: записи одного пользователя
+    однозначно упорядочены по рецепту (новые первыми), и порядок совпадает
+    с индексом (user, recipe)."""
+
+    def get_ordering(self, queryset):
+        return [('recipe', True)]
+
+
+class PageOrKeysetPagination(PageLimitPagination):
+    """Номерные страницы по умолчанию и keyset-пагинация, если в запросе
+    передан параметр cursor (для первой страницы: ?cursor=)."""
+
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        # Асинхронно поддерживаются только номерные страницы
+        self.keyset = None
+        return await super().apaginate_queryset(queryset, request)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
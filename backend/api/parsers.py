@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import (
+    FileUploadParser,
+    JSONParser,
+    MultiPartParser,
+)
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Размер запроса превышает допустимый.'
+    default_code = 'request_entity_too_large'
+
+
+class ContentLengthLimitMixin:
+    """Отклоняет по заголовку Content-Length тело больше настройки
+    max_body_size_setting до того, как оно будет прочитано."""
+
+    max_body_size_setting = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        meta = parser_context['request'].META
+        try:
+            content_length = int(meta.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > getattr(settings, self.max_body_size_setting):
+            raise RequestEntityTooLarge()
+        return super().parse(stream, media_type, parser_context)
+
+
+class LimitedJSONParser(ContentLengthLimitMixin, JSONParser):
+    max_body_size_setting = 'JSON_MAX_BODY_SIZE'
+
+
+class ImageMultiPartParser(ContentLengthLimitMixin, MultiPartParser):
+    """multipart/form-data с изображением: файл пишется на диск
+    обработчиками загрузки Django по мере чтения тела."""
+
+    max_body_size_setting = 'IMAGE_UPLOAD_MAX_BODY_SIZE'
+
+
+class RawImageParser(ContentLengthLimitMixin, FileUploadParser):
+    """Тело запроса image/* целиком — файл изображения.
+
+    Файл доступен в request.data['file']; имя файла необязательно,
+    настоящее расширение определяется по содержимому при валидации.
+    """
+
+    media_type = 'image/*'
+    max_body_size_setting = 'IMAGE_UPLOAD_MAX_BODY_SIZE'
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(
+            stream, media_type, parser_context
+        ) or 'upload'
+
+
+# Парсеры эндпоинтов загрузки изображений: файл, multipart или base64
+IMAGE_UPLOAD_PARSERS = (RawImageParser, ImageMultiPartParser, LimitedJSONParser)
@@ -1,10 +1,16 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.core.files.base import ContentFile
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
 from rest_framework import serializers
 
+from foodgram.settings import AVATAR_IMAGE_MAX_SIZE, RECIPE_IMAGE_MAX_SIZE
 from recipes import validators
 from recipes.models import (
     Favorite,
@@ -15,26 +21,172 @@ from recipes.models import (
     Subscription,
     Tag,
 )
+from recipes.services.counters import change_counter
+from recipes.services.feed import publish_to_feeds
+from recipes.services.images import (
+    SIGNATURE_LENGTH,
+    UPLOAD_FORMATS,
+    detect_image_format,
+    schedule_image_processing,
+)
+from recipes.services.recipe_fragments import invalidate_recipe_fragments
+from recipes.services.search import update_search_index
+from recipes.services.shopping_cart import (
+    get_recipe_shopping_cart_user_ids,
+    rebuild_shopping_lists,
+)
+from recipes.services.short_links import invalidate_short_links
 from recipes.validators import username_validation
 
 User = get_user_model()
 
+DATA_URI_PREFIX_MAX_LENGTH = 64
+# Размер части base64 при декодировании, кратен 4
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class Base64ImageField(serializers.FileField):
+    """Изображение в виде data URI с base64 или файла.
+
+    Размер и сигнатура формата проверяются до декодирования по длине
+    строки и ее первым символам; base64 декодируется по частям во
+    временный файл, который переносится на диск при превышении
+    FILE_UPLOAD_MAX_MEMORY_SIZE. Пиксели в запросе не декодируются:
+    это происходит при построении вариантов (recipes.services.images).
+    """
+
+    default_error_messages = {
+        'invalid_image': (
+            'Загрузите корректное изображение. Файл, который вы загрузили, '
+            'поврежден или не является изображением.'
+        ),
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+    }
+
+    def __init__(self, max_size=None, **kwargs):
+        self.max_size = max_size
+        super().__init__(**kwargs)
 
-class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+            data = self.decode_data_uri(data)
+
+        file = super().to_internal_value(data)
+        if self.max_size is not None and file.size > self.max_size:
+            self.fail('max_size', max_size=self.max_size)
+        try:
+            # Image.open читает только заголовок, пиксели не декодируются
+            with Image.open(file) as image:
+                image_format = image.format
+        except (OSError, ValueError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        if image_format not in UPLOAD_FORMATS:
+            self.fail('invalid_image')
+        file.seek(0)
+        # Имя от клиента не используется: расширение — по содержимому
+        file.name = f'image.{UPLOAD_FORMATS[image_format]}'
+        return file
+
+    def decode_data_uri(self, data):
+        prefix, separator, _ = data[:DATA_URI_PREFIX_MAX_LENGTH].partition(
+            ';base64,'
+        )
+        if not separator:
+            self.fail('invalid_image')
+        start = len(prefix) + len(separator)
+        encoded_length = len(data) - start
+        if encoded_length % 4:
+            self.fail('invalid_image')
+        size = encoded_length // 4 * 3 - (
+            2 if data.endswith('==') else int(data.endswith('='))
+        )
+        if self.max_size is not None and size > self.max_size:
+            self.fail('max_size', max_size=self.max_size)
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        head_length = -(-SIGNATURE_LENGTH // 3) * 4
+        image_format = detect_image_format(
+            self.decode_chunk(data[start:start + head_length])
+        )
+        if image_format is None:
+            self.fail('invalid_image')
 
-        return super().to_internal_value(data)
+        buffer = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            buffer.write(
+                self.decode_chunk(data[position:position + BASE64_CHUNK_SIZE])
+            )
+        buffer.seek(0)
+        file = File(buffer, name=f'image.{UPLOAD_FORMATS[image_format]}')
+        file.size = size
+        return file
+
+    def decode_chunk(self, chunk):
+        try:
+            return base64.b64decode(chunk.encode('ascii'), validate=True)
+        except (binascii.Error, UnicodeEncodeError):
+            self.fail('invalid_image')
+
+
+class ImageVariantsField(serializers.Field):
+    """Уменьшенные копии изображения и заглушка из поля вариантов.
+
+    Возвращает None, пока варианты для текущего изображения не построены.
+    """
+
+    def __init__(self, image_field, variants_field, **kwargs):
+        self.image_field = image_field
+        self.variants_field = variants_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        variants = getattr(instance, self.variants_field)
+        if not image or variants.get('source') != image.name:
+            return None
+        if 'files' not in variants:
+            return None
+        request = self.context.get('request')
+        data = {
+            'width': variants['width'],
+            'height': variants['height'],
+            'placeholder': variants['placeholder'],
+            'sources': {
+                variant_format: {
+                    width: image.storage.url(name)
+                    for width, name in names.items()
+                }
+                for variant_format, names in variants['files'].items()
+            },
+        }
+        if request is not None:
+            return self.absolute(data, request.build_absolute_uri)
+        return data
+
+    @staticmethod
+    def absolute(data, build_uri):
+        """Дополняет относительные ссылки вариантов до абсолютных."""
+        if data is None:
+            return None
+        return {
+            **data,
+            'sources': {
+                variant_format: {
+                    width: build_uri(url) for width, url in urls.items()
+                }
+                for variant_format, urls in data['sources'].items()
+            },
+        }
 
 
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для управления пользователями Администратором."""
 
     is_subscribed = serializers.BooleanField(read_only=True)
+    avatar_variants = ImageVariantsField('avatar', 'avatar_variants')
 
     class Meta:
         model = User
@@ -46,6 +198,7 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
 
@@ -82,13 +235,30 @@ class SetPasswordSerializer(serializers.Serializer):
 class UserAvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для обновления аватара пользователя."""
 
-    avatar = Base64ImageField()
+    avatar = Base64ImageField(max_size=AVATAR_IMAGE_MAX_SIZE)
 
     class Meta:
         model = User
         fields = ('avatar',)
 
 
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Сериализатор для замены изображения рецепта."""
+
+    image = Base64ImageField(max_size=RECIPE_IMAGE_MAX_SIZE)
+    image_variants = ImageVariantsField('image', 'image_variants')
+
+    class Meta:
+        model = Recipe
+        fields = ('image', 'image_variants')
+
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        schedule_image_processing(instance)
+        invalidate_recipe_fragments([instance.id])
+        return instance
+
+
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения списка тегов."""
 
@@ -142,6 +312,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         read_only=True, default=False
     )
     image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField('image', 'image_variants')
 
     class Meta:
         model = Recipe
@@ -154,6 +325,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
@@ -166,7 +338,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
-    image = Base64ImageField()
+    image = Base64ImageField(max_size=RECIPE_IMAGE_MAX_SIZE)
 
     class Meta:
         model = Recipe
@@ -189,17 +361,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     'Количество ингредиентов должно быть больше нуля.'
                 )
         ingredient_ids = [ingredient['id'] for ingredient in value]
-        existing_ids = set(
-            Ingredient.objects.filter(id__in=ingredient_ids).values_list(
-                'id', flat=True
-            )
-        )
-        missing_ids = set(ingredient_ids) - existing_ids
+        ingredients_map = Ingredient.objects.in_bulk(ingredient_ids)
+        missing_ids = set(ingredient_ids) - set(ingredients_map)
         if missing_ids:
             raise serializers.ValidationError(
                 f'Ингредиента(ов) с id={", ".join(map(str, missing_ids))} '
                 'не существует.'
             )
+        # Сохраняем найденные объекты, чтобы не запрашивать их повторно
+        # при записи рецепта.
+        for ingredient in value:
+            ingredient['ingredient'] = ingredients_map[ingredient['id']]
         return value
 
     def validate_tags(self, value):
@@ -212,29 +384,69 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return validators.validate_cooking_time(value)
 
     def create_ingredients(self, ingredients, recipe):
-        recipe_ingredients = []
-        for ingredient_data in ingredients:
-            ingredient = Ingredient.objects.get(id=ingredient_data['id'])
-            recipe_ingredients.append(
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredient=ingredient,
-                    amount=ingredient_data['amount'],
-                    measurement_unit=ingredient.measurement_unit,
-                )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=item['ingredient'],
+                amount=item['amount'],
+                measurement_unit_id=item['ingredient'].measurement_unit_id,
             )
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+            for item in ingredients
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        """Применяет к рецепту только изменившиеся ингредиенты.
+
+        Строки RecipeIngredient добавляются, обновляются и удаляются
+        по разнице между текущим и новым составом рецепта.
+        Возвращает True, если состав рецепта изменился.
+        """
+        existing = {
+            item.ingredient_id: item for item in recipe.recipe_ingredients.all()
+        }
+        to_create = []
+        to_update = []
+        for item in ingredients:
+            recipe_ingredient = existing.pop(item['id'], None)
+            unit_id = item['ingredient'].measurement_unit_id
+            if recipe_ingredient is None:
+                to_create.append(item)
+            elif (
+                recipe_ingredient.amount != item['amount']
+                or recipe_ingredient.measurement_unit_id != unit_id
+            ):
+                recipe_ingredient.amount = item['amount']
+                recipe_ingredient.measurement_unit_id = unit_id
+                to_update.append(recipe_ingredient)
+
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in existing.values()]
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(
+                to_update, ['amount', 'measurement_unit']
+            )
+        if to_create:
+            self.create_ingredients(to_create, recipe)
+        return bool(existing or to_update or to_create)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user, **validated_data
-        )
-        recipe.tags.set(tags, clear=True)
+        author = self.context['request'].user
+        recipe = Recipe.objects.create(author=author, **validated_data)
+        change_counter(User, author.pk, 'recipes_count', 1)
+        invalidate_short_links([recipe.id])
+        schedule_image_processing(recipe)
+        recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        update_search_index([recipe.id])
+        publish_to_feeds(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
@@ -247,11 +459,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.tags.set(tags, clear=True)
-        instance.recipe_ingredients.all().delete()
-        self.create_ingredients(ingredients, instance)
+        instance.tags.set(tags)
+        if self.update_ingredients(ingredients, instance):
+            cart_user_ids = get_recipe_shopping_cart_user_ids(instance)
+            if cart_user_ids:
+                rebuild_shopping_lists(cart_user_ids)
 
         instance.save()
+        if 'image' in validated_data:
+            schedule_image_processing(instance)
+        update_search_index([instance.id])
+        invalidate_recipe_fragments([instance.id])
         return instance
 
     def to_representation(self, instance):
@@ -269,22 +487,27 @@ class RecipeForCartSerializer(serializers.ModelSerializer):
     """
 
     image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField('image', 'image_variants')
 
     class Meta:
         model = Recipe
         ordering = '-pub_date'
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class SubscribtionReadSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения подписок пользователя.
     Возвращает информацию об авторах и их рецептах
     на которых подписан текущий пользователь.
+    Ожидает авторов из UserViewSet.get_subscriptions_queryset().
     """
 
-    is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
-    recipes = serializers.SerializerMethodField()
+    is_subscribed = serializers.BooleanField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
+    recipes = RecipeForCartSerializer(
+        many=True, read_only=True, source='limited_recipes'
+    )
+    avatar_variants = ImageVariantsField('avatar', 'avatar_variants')
 
     class Meta:
         model = User
@@ -296,28 +519,11 @@ class SubscribtionReadSerializer(serializers.ModelSerializer):
             'email',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
             'recipes_count',
             'recipes',
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and user.subscriptions.filter(author=obj).exists()
-        )
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit is not None and recipes_limit.isdigit():
-            recipes = recipes[: int(recipes_limit)]
-        return RecipeForCartSerializer(recipes, many=True).data
-
 
 class SubscribtionWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и удаления подписок пользователя."""
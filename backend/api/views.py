@@ -1,43 +1,93 @@
 from django.contrib.auth import get_user_model
-from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from api import filters, pagination, serializers
+from api.conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_conditional_headers,
+)
+from api.parsers import IMAGE_UPLOAD_PARSERS
 from api.permissions import IsAuthorOrReadOnly
 from foodgram.settings import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENT_SEARCH_MAX_LIMIT,
     SHOPPING_CART_FILENAME,
     SHOPPING_CART_FORMAT,
+    SHOPPING_CART_STREAMING,
     USER_SELFINFO_PATH,
 )
 from recipes.models import (
     Favorite,
+    FeedEntry,
     Ingredient,
     Recipe,
     ShoppingCart,
     Subscription,
     Tag,
 )
+from recipes.services.counters import change_counter
+from recipes.services.feed import backfill_feed, remove_from_feed
+from recipes.services.images import (
+    clear_image_variants,
+    schedule_image_processing,
+)
+from recipes.services.ingredient_index import get_ingredient_index
+from recipes.services.recipe_fragments import (
+    fragment_version,
+    get_recipe_fragments,
+    invalidate_recipe_fragments,
+)
+from recipes.services.search import delete_from_search_index
 from recipes.services.shopping_cart import (
+    SHOPPING_CART_RENDERERS,
+    add_recipe_to_shopping_list,
     build_file_response,
-    get_shopping_cart_ingredients,
-    render_as_csv,
-    render_as_json,
-    render_as_txt,
+    build_streaming_file_response,
+    encode_chunks,
+    get_recipe_shopping_cart_user_ids,
+    get_shopping_list_items,
+    get_shopping_list_version,
+    rebuild_shopping_lists,
+    remove_recipe_from_shopping_list,
+)
+from recipes.services.short_links import (
+    get_short_link,
+    invalidate_short_links,
 )
-from recipes.services.short_links import get_short_link
+from recipes.services.versions import catalog_version, touch_users
 
 User = get_user_model()
 
 
+def get_image_upload_data(request, field_name):
+    """Данные для сериализатора изображения: файл из тела image/*,
+    поле multipart или base64 из JSON."""
+    if 'file' in request.FILES:
+        return {field_name: request.FILES['file']}
+    return request.data
+
+
 class UserViewSet(ModelViewSet):
     lookup_field = 'id'
     permission_classes = (AllowAny,)
-    pagination_class = pagination.PageLimitPagination
+    pagination_class = pagination.PageOrKeysetPagination
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve', 'create'):
@@ -67,13 +117,53 @@ class UserViewSet(ModelViewSet):
             return serializers.UserCreateSerializer
         return serializers.UserSerializer
 
+    def get_subscriptions_queryset(self):
+        """Авторы, на которых подписан текущий пользователь.
+
+        Количество запросов не зависит от размера страницы:
+        число рецептов берется из счетчика User.recipes_count, а рецепты
+        каждого автора ограничиваются recipes_limit оконной функцией
+        в одном prefetch.
+        """
+        recipes = Recipe.objects.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).order_by('-pub_date', '-id')
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is not None and recipes_limit.isdigit():
+            recipes = recipes.filter(row_number__lte=int(recipes_limit))
+
+        return (
+            User.objects.filter(followers__user=self.request.user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .prefetch_related(
+                Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+            )
+            .order_by('username')
+        )
+
     @action(methods=['GET'], detail=False, url_path=USER_SELFINFO_PATH)
     def me(self, request):
+        updated_at = (
+            User.objects.filter(pk=request.user.pk)
+            .values_list('updated_at', flat=True)
+            .get()
+        )
+        etag = make_etag('user', request.user.pk, updated_at.isoformat())
+        not_modified = get_not_modified_response(request, etag, updated_at)
+        if not_modified is not None:
+            return not_modified
+
         serializer = serializers.UserSerializer(
             self.get_queryset().get(pk=request.user.pk),
             context={'request': request},
         )
-        return Response(serializer.data)
+        return set_conditional_headers(
+            Response(serializer.data), etag, updated_at
+        )
 
     @action(
         methods=['POST'],
@@ -85,7 +175,9 @@ class UserViewSet(ModelViewSet):
         serializer = serializers.SetPasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
+        # request.user может быть копией из кэша аутентификации со
+        # устаревшими счетчиками: сохраняется свежая строка
+        user = User.objects.get(pk=request.user.pk)
         if not user.check_password(
             serializer.validated_data['current_password']
         ):
@@ -105,18 +197,23 @@ class UserViewSet(ModelViewSet):
         url_path=USER_SELFINFO_PATH + '/avatar',
         url_name='avatar',
         permission_classes=[IsAuthenticated],
+        parser_classes=IMAGE_UPLOAD_PARSERS,
     )
     def avatar(self, request):
-        user = request.user
+        user = User.objects.get(pk=request.user.pk)
         if request.method == 'PUT':
             serializer = serializers.UserAvatarSerializer(
-                user, data=request.data, context={'request': request}
+                user,
+                data=get_image_upload_data(request, 'avatar'),
+                context={'request': request},
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            schedule_image_processing(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         if user.avatar:
+            clear_image_variants(user)
             user.avatar.delete(save=True)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -126,9 +223,7 @@ class UserViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        page = self.paginate_queryset(
-            User.objects.filter(followers__user=request.user)
-        )
+        page = self.paginate_queryset(self.get_subscriptions_queryset())
         serializer = serializers.SubscribtionReadSerializer(
             page,
             many=True,
@@ -149,10 +244,15 @@ class UserViewSet(ModelViewSet):
             context={'request': request},
         )
         create_subscription.is_valid(raise_exception=True)
-        create_subscription.save()
+        with transaction.atomic():
+            create_subscription.save()
+            change_counter(User, author.pk, 'followers_count', 1)
+            backfill_feed(request.user.pk, author.pk)
+            touch_users([request.user.pk])
 
         read_subscription = serializers.SubscribtionReadSerializer(
-            author, context={'request': request}
+            self.get_subscriptions_queryset().get(pk=author.pk),
+            context={'request': request},
         )
 
         return Response(read_subscription.data, status=status.HTTP_201_CREATED)
@@ -168,7 +268,11 @@ class UserViewSet(ModelViewSet):
                 {'errors': 'Вы не подписаны на данного пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        subscription.delete()
+        with transaction.atomic():
+            subscription.delete()
+            change_counter(User, author.pk, 'followers_count', -1)
+            remove_from_feed(user.pk, author.pk)
+            touch_users([user.pk])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -181,16 +285,245 @@ class TagViewSet(ReadOnlyModelViewSet):
 
 class IngredientsViewSet(ReadOnlyModelViewSet):
     serializer_class = serializers.IngredientSerializer
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.select_related('measurement_unit')
     pagination_class = None
     filterset_class = filters.IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        index = get_ingredient_index() if name else None
+        if index is None:
+            return super().list(request, *args, **kwargs)
+
+        limit = request.query_params.get('limit', '')
+        limit = (
+            min(int(limit), INGREDIENT_SEARCH_MAX_LIMIT)
+            if limit.isdigit()
+            else INGREDIENT_SEARCH_LIMIT
+        )
+        return Response(index.search(name, limit))
+
 
 class RecipesViewSet(ModelViewSet):
-    pagination_class = pagination.PageLimitPagination
+    pagination_class = pagination.PageOrKeysetPagination
     filterset_class = filters.RecipeFilters
     permission_classes = (IsAuthorOrReadOnly,)
 
+    def get_overlay_queryset(self):
+        """Легкий запрос рецептов для list и retrieve: версии рецепта и
+        автора и поля, зависящие от текущего пользователя, без prefetch."""
+        user = self.request.user
+        queryset = Recipe.objects.only('id', 'author_id', 'updated_at')
+        if user.is_authenticated:
+            overlay = {
+                'is_favorited': Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+                ),
+                'is_in_shopping_cart': Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=OuterRef('pk')
+                    )
+                ),
+                'author_is_subscribed': Exists(
+                    Subscription.objects.filter(
+                        user=user, author=OuterRef('author')
+                    )
+                ),
+            }
+        else:
+            overlay = dict.fromkeys(
+                ('is_favorited', 'is_in_shopping_cart', 'author_is_subscribed'),
+                Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            author_updated_at=F('author__updated_at'),
+            catalog_version=catalog_version(),
+            **overlay,
+        )
+
+    def render_fragments(self, recipe_ids):
+        """Сериализует общую для всех пользователей часть рецептов.
+
+        Сериализатор работает без запроса: ссылки на изображения
+        остаются относительными, а поля текущего пользователя — False.
+        """
+        recipes = Recipe.objects.filter(pk__in=recipe_ids).annotate(
+            catalog_version=catalog_version()
+        ).select_related('author').prefetch_related(
+            'tags',
+            'recipe_ingredients__ingredient__measurement_unit',
+            'recipe_ingredients__measurement_unit',
+        )
+        rendered = {}
+        for recipe in recipes:
+            recipe.author.is_subscribed = False
+            rendered[recipe.pk] = (
+                fragment_version(
+                    recipe.updated_at,
+                    recipe.author.updated_at,
+                    recipe.catalog_version,
+                ),
+                serializers.RecipeReadSerializer(recipe).data,
+            )
+        return rendered
+
+    def get_fragment_versions(self, recipes):
+        return {
+            recipe.pk: fragment_version(
+                recipe.updated_at,
+                recipe.author_updated_at,
+                recipe.catalog_version,
+            )
+            for recipe in recipes
+        }
+
+    def render_recipes(self, recipes):
+        """Собирает ответ из кэшированных фрагментов и полей текущего
+        пользователя из легкого запроса."""
+        fragments = get_recipe_fragments(
+            self.get_fragment_versions(recipes), self.render_fragments
+        )
+        return self.apply_overlay(recipes, fragments)
+
+    def apply_overlay(self, recipes, fragments):
+        """Накладывает на фрагменты поля текущего пользователя и
+        абсолютные ссылки на изображения."""
+        build_uri = self.request.build_absolute_uri
+        absolute_variants = serializers.ImageVariantsField.absolute
+        data = []
+        for recipe in recipes:
+            fragment = fragments[recipe.pk]
+            author = fragment['author']
+            data.append(
+                {
+                    **fragment,
+                    'author': {
+                        **author,
+                        'is_subscribed': recipe.author_is_subscribed,
+                        'avatar': author['avatar']
+                        and build_uri(author['avatar']),
+                        'avatar_variants': absolute_variants(
+                            author['avatar_variants'], build_uri
+                        ),
+                    },
+                    'is_favorited': recipe.is_favorited,
+                    'is_in_shopping_cart': recipe.is_in_shopping_cart,
+                    'image': fragment['image'] and build_uri(fragment['image']),
+                    'image_variants': absolute_variants(
+                        fragment['image_variants'], build_uri
+                    ),
+                }
+            )
+        return data
+
+    def get_versions(self, recipe):
+        return (
+            recipe.pk,
+            recipe.updated_at.isoformat(),
+            recipe.author_updated_at.isoformat(),
+            recipe.catalog_version,
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart,
+            recipe.author_is_subscribed,
+        )
+
+    def get_last_modified(self, recipe):
+        """Время последнего изменения рецепта, его автора и текущего
+        пользователя: его версия меняется вместе с избранным, корзиной
+        и подписками.
+
+        У списков Last-Modified нет: после удаления рецепта на страницу
+        попадает более старый, и максимум времени не меняется. Список
+        проверяется только по ETag, в который входят id рецептов.
+        """
+        times = [recipe.updated_at, recipe.author_updated_at]
+        user = self.request.user
+        if user.is_authenticated:
+            times.append(user.updated_at)
+        return max(times)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_overlay_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset) if page is None else page
+
+        versions = [self.get_versions(recipe) for recipe in recipes]
+        etag = make_etag(
+            request.get_full_path(),
+            versions
+            if page is None
+            else self.get_paginated_response(versions).data,
+        )
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = self.render_recipes(recipes)
+        response = (
+            Response(data)
+            if page is None
+            else self.get_paginated_response(data)
+        )
+        return set_conditional_headers(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = generics.get_object_or_404(
+            self.get_overlay_queryset(), pk=self.kwargs['pk']
+        )
+        self.check_object_permissions(request, recipe)
+
+        etag = make_etag('recipe', self.get_versions(recipe))
+        last_modified = self.get_last_modified(recipe)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(self.render_recipes([recipe])[0])
+        return set_conditional_headers(response, etag, last_modified)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=pagination.FeedPagination,
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок пользователя, новые первыми."""
+        page = self.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).values('recipe_id')
+        )
+        recipes = self.get_overlay_queryset().in_bulk(
+            [entry['recipe_id'] for entry in page]
+        )
+        return self.get_paginated_response(
+            self.render_recipes(
+                [
+                    recipes[entry['recipe_id']]
+                    for entry in page
+                    if entry['recipe_id'] in recipes
+                ]
+            )
+        )
+
+    @action(
+        methods=['PUT'],
+        detail=True,
+        url_path='image',
+        permission_classes=(IsAuthenticated, IsAuthorOrReadOnly),
+        parser_classes=IMAGE_UPLOAD_PARSERS,
+    )
+    def image(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        self.check_object_permissions(request, recipe)
+        serializer = serializers.RecipeImageSerializer(
+            recipe,
+            data=get_image_upload_data(request, 'image'),
+            context={'request': request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(methods=['GET'], detail=True, url_path='get-link')
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -202,34 +535,71 @@ class RecipesViewSet(ModelViewSet):
     @action(methods=['POST', 'DELETE'], detail=True, url_path='favorite')
     def favorite(self, request, pk=None):
         return self._manage_recipe_relation(
-            request, pk, serializers.FavoriteSerializer, Favorite
+            request,
+            pk,
+            serializers.FavoriteSerializer,
+            Favorite,
+            counter_field='favorites_count',
         )
 
     @action(methods=['POST', 'DELETE'], detail=True, url_path='shopping_cart')
     def shopping_cart(self, request, pk=None):
         return self._manage_recipe_relation(
-            request, pk, serializers.ShoppingCartSerializer, ShoppingCart
+            request,
+            pk,
+            serializers.ShoppingCartSerializer,
+            ShoppingCart,
+            counter_field='shopping_cart_count',
+            on_add=add_recipe_to_shopping_list,
+            on_remove=remove_recipe_from_shopping_list,
         )
 
     @action(methods=['GET'], detail=False, url_path='download_shopping_cart')
     def download_shopping_cart(self, request):
         file_format = request.query_params.get('file_format', None)
-        if file_format is None:
+        if file_format not in SHOPPING_CART_RENDERERS:
             file_format = SHOPPING_CART_FORMAT
-        data = get_shopping_cart_ingredients(request.user)
+        etag = make_etag(
+            request.user.pk,
+            get_shopping_list_version(request.user),
+            file_format,
+        )
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        render, iter_render, content_type = SHOPPING_CART_RENDERERS[
+            file_format
+        ]
+        data = get_shopping_list_items(request.user)
         filename = f'{SHOPPING_CART_FILENAME}.{file_format}'
-        if file_format == 'csv':
-            file_content = render_as_csv(data)
-            content_type = 'text/csv'
-        elif file_format == 'json':
-            file_content = render_as_json(data)
-            content_type = 'aplication/json'
+        if SHOPPING_CART_STREAMING:
+            response = build_streaming_file_response(
+                encode_chunks(iter_render(data.iterator())),
+                filename,
+                content_type,
+            )
         else:
-            file_content = render_as_txt(data)
-            content_type = 'text/plain'
-        return build_file_response(file_content, filename, content_type)
-
-    def _manage_recipe_relation(self, request, pk, serializer_class, model):
+            response = build_file_response(
+                render(data), filename, content_type
+            )
+        return set_conditional_headers(response, etag)
+
+    def _manage_recipe_relation(
+        self,
+        request,
+        pk,
+        serializer_class,
+        model,
+        counter_field,
+        on_add=None,
+        on_remove=None,
+    ):
+        """Добавляет рецепт в список пользователя или удаляет из него.
+
+        В той же транзакции, что и запись связи, изменяется счетчик рецепта
+        counter_field и вызываются on_add/on_remove с (user, recipe).
+        """
         if request.user.is_anonymous:
             return Response(
                 {'errors': 'Авторизуйтесь для выполнения данного действия.'},
@@ -242,7 +612,12 @@ class RecipesViewSet(ModelViewSet):
                 context={'request': request},
             )
             write_serializer.is_valid(raise_exception=True)
-            write_serializer.save()
+            with transaction.atomic():
+                write_serializer.save()
+                change_counter(Recipe, recipe.pk, counter_field, 1)
+                touch_users([request.user.pk])
+                if on_add is not None:
+                    on_add(request.user, recipe)
 
             read_serializer = serializers.RecipeForCartSerializer(
                 recipe, context={'request': request}
@@ -260,9 +635,25 @@ class RecipesViewSet(ModelViewSet):
                     {'errors': 'Рецепт не найден в списке.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            relation_instance.delete()
+            with transaction.atomic():
+                relation_instance.delete()
+                change_counter(Recipe, recipe.pk, counter_field, -1)
+                touch_users([request.user.pk])
+                if on_remove is not None:
+                    on_remove(request.user, recipe)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        cart_user_ids = get_recipe_shopping_cart_user_ids(instance)
+        delete_from_search_index([instance.id])
+        invalidate_recipe_fragments([instance.id])
+        invalidate_short_links([instance.id])
+        instance.delete()
+        change_counter(User, instance.author_id, 'recipes_count', -1)
+        if cart_user_ids:
+            rebuild_shopping_lists(cart_user_ids)
+
     def get_queryset(self):
         user = self.request.user
 
@@ -0,0 +1,114 @@
+"""
+Бэкенд PostgreSQL с пулом соединений на процесс.
+
+Django закрывает соединение в конце запроса (CONN_MAX_AGE = 0) — здесь
+закрытие возвращает его в пул, а следующий запрос берет готовое
+соединение без TCP-рукопожатия и аутентификации. Пул общий для потоков
+процесса, поэтому работает и с синхронными воркерами gunicorn, и в
+режиме ASGI, где запросы выполняются в разных потоках.
+
+Параметры пула задаются ключом POOL в settings.DATABASES (см.
+foodgram.settings), статистика — pool_stats().
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from foodgram.db.pool import ConnectionPool, PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _check(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(conn):
+    """Откатывает незавершенную транзакцию возвращаемого соединения."""
+    if conn.closed:
+        return False
+    if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+def get_pool(alias, settings_dict):
+    """Пул соединений alias текущего процесса; после fork создается
+    заново."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            # Пулы родительского процесса в дочернем не используются
+            for stale in [k for k in _pools if k[1] != key[1]]:
+                del _pools[stale]
+            pool = _pools[key] = ConnectionPool(
+                connect=None,
+                close=lambda conn: conn.close(),
+                check=_check,
+                reset=_reset,
+                **settings_dict.get('POOL', {}),
+            )
+        return pool
+
+
+def pool_stats():
+    """Состояние и счетчики пулов текущего процесса по алиасам баз."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {
+            alias: pool for (alias, key_pid), pool in _pools.items()
+            if key_pid == pid
+        }
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Как часто писать статистику пула в лог, секунд
+    stats_interval = 60
+    _stats_logged = 0
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict)
+        try:
+            connection = pool.getconn(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                )
+            )
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        # Для соединения из пула родительский метод не вызывался, уровень
+        # изоляции задан ему при создании
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get(
+                'isolation_level', base.IsolationLevel.READ_COMMITTED
+            )
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = get_pool(self.alias, self.settings_dict)
+        with self.wrap_database_errors:
+            # Внутри atomic Django оставляет ссылку на закрытое соединение
+            # до отката, поэтому в пул его возвращать нельзя
+            pool.putconn(self.connection, discard=self.in_atomic_block)
+        self._log_stats(pool)
+
+    def _log_stats(self, pool):
+        now = time.monotonic()
+        if now - DatabaseWrapper._stats_logged < self.stats_interval:
+            return
+        DatabaseWrapper._stats_logged = now
+        logger.info('Пул соединений %s: %s', self.alias, pool.snapshot())
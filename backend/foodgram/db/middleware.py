@@ -0,0 +1,86 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+
+from foodgram.db.routers import choose_replica, read_from
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'db-primary:{client}'
+
+
+def _key(credentials):
+    return STICKY_KEY.format(
+        client=hashlib.sha256(credentials.encode()).hexdigest()
+    )
+
+
+def _sticky_key(request, response=None):
+    """Ключ кэша клиента по заголовку Authorization или сессии; None для
+    анонимного. Учитывает сессию, которую открывает ответ (вход в
+    админку)."""
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if response is not None and settings.SESSION_COOKIE_NAME in (
+        response.cookies
+    ):
+        credentials = response.cookies[settings.SESSION_COOKIE_NAME].value
+    return _key(credentials) if credentials else None
+
+
+def stick_to_primary(token_key):
+    """Клиент с токеном token_key читает с default, пока реплики не
+    получат запись: вызывается при выдаче токена, запрос входа идет
+    без заголовка Authorization."""
+    if settings.REPLICA_DATABASES:
+        cache.set(
+            _key(f'Token {token_key}'), True, settings.REPLICA_STICKY_TIMEOUT
+        )
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    """Чтение безопасных запросов — с реплики, но после записи клиент
+    REPLICA_STICKY_TIMEOUT секунд читает с default и видит свои
+    изменения (избранное, корзину), даже если реплика отстает. Отметка о
+    записи хранится в кэше default; с репликами он обязан быть общим для
+    воркеров (REDIS_URL, проверяется в настройках)."""
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if not settings.REPLICA_DATABASES:
+                return await get_response(request)
+            if request.method not in SAFE_METHODS:
+                response = await get_response(request)
+                key = _sticky_key(request, response)
+                if key:
+                    await cache.aset(
+                        key, True, settings.REPLICA_STICKY_TIMEOUT
+                    )
+                return response
+            key = _sticky_key(request)
+            alias = None if key and await cache.aget(key) else choose_replica()
+            with read_from(alias):
+                return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            if not settings.REPLICA_DATABASES:
+                return get_response(request)
+            if request.method not in SAFE_METHODS:
+                response = get_response(request)
+                key = _sticky_key(request, response)
+                if key:
+                    cache.set(key, True, settings.REPLICA_STICKY_TIMEOUT)
+                return response
+            key = _sticky_key(request)
+            alias = None if key and cache.get(key) else choose_replica()
+            with read_from(alias):
+                return get_response(request)
+
+    return middleware
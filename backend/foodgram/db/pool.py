@@ -0,0 +1,218 @@
+"""
+Пул соединений с базой данных на процесс.
+
+Соединения создаются по требованию до max_size; если все заняты, запрос
+ждет освобождения не дольше timeout. Соединение, простоявшее в пуле
+дольше health_check_interval, перед выдачей проверяется функцией check,
+а прожившее дольше max_lifetime — закрывается и создается заново.
+Свободные дольше max_idle соединения сверх min_size закрываются.
+
+Пул не переживает fork: в дочернем процессе (воркеры gunicorn) создается
+новый, унаследованные соединения не используются.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PoolStats:
+    """Счетчики пула; snapshot() возвращает их вместе с текущим
+    состоянием."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.created = 0
+        self.closed = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.health_check_failures = 0
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        close,
+        check=None,
+        reset=None,
+        min_size=0,
+        max_size=10,
+        timeout=10,
+        health_check_interval=30,
+        max_lifetime=3600,
+        max_idle=600,
+    ):
+        """connect() создает соединение (может быть None, если его
+        передают в getconn), close(conn) закрывает его,
+        check(conn) возвращает False для нерабочего соединения, reset(conn)
+        готовит возвращенное соединение к повторной выдаче и возвращает
+        False, если его нельзя переиспользовать."""
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Нужно 0 <= min_size <= max_size, max_size >= 1.')
+        self._connect = connect
+        self._close = close
+        self._check = check or (lambda conn: True)
+        self._reset = reset or (lambda conn: True)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+
+        # Свободные соединения: (conn, время создания, время возврата)
+        self._idle = deque()
+        # id(conn) -> время создания для выданных соединений
+        self._checked_out = {}
+        self._size = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self.stats = PoolStats()
+
+    def getconn(self, connect=None):
+        """Свободное или новое соединение; connect заменяет фабрику пула
+        для создания нового."""
+        started = time.monotonic()
+        waited = False
+        with self._condition:
+            while True:
+                if self._idle:
+                    conn, created, returned = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Место резервируется до подключения, чтобы параллельные
+                    # запросы не превысили max_size
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.stats.timeouts += 1
+                    logger.warning(
+                        'Пул соединений исчерпан: %s занято, ожидание '
+                        'дольше %s с.',
+                        len(self._checked_out),
+                        self.timeout,
+                    )
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.timeout} с '
+                        f'(max_size={self.max_size}).'
+                    )
+                waited = True
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        if conn is not None:
+            conn, created = self._validate(conn, created, returned)
+        if conn is None:
+            conn, created = self._new_connection(connect or self._connect)
+
+        with self._condition:
+            self._checked_out[id(conn)] = created
+            self.stats.checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self.stats.waits += 1
+                self.stats.wait_time += wait_time
+                self.stats.max_wait_time = max(
+                    self.stats.max_wait_time, wait_time
+                )
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Возвращает соединение в пул; discard=True — закрывает его."""
+        with self._condition:
+            created = self._checked_out.pop(id(conn), None)
+        if created is None:
+            # Соединение не из этого пула (например, выдано до fork)
+            self._discard(conn, release=False)
+            return
+        if (
+            discard
+            or time.monotonic() - created > self.max_lifetime
+            or not self._safe(self._reset, conn)
+        ):
+            self._discard(conn)
+            return
+        now = time.monotonic()
+        stale = []
+        with self._condition:
+            self._idle.append((conn, created, now))
+            self._condition.notify()
+            # Слева самые давно возвращенные соединения
+            while (
+                len(self._idle) > self.min_size
+                and now - self._idle[0][2] > self.max_idle
+            ):
+                stale.append(self._idle.popleft()[0])
+        for conn in stale:
+            self._discard(conn)
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'checked_out': len(self._checked_out),
+                'waiting': self._waiting,
+                **vars(self.stats),
+            }
+
+    def _validate(self, conn, created, returned):
+        now = time.monotonic()
+        if now - created > self.max_lifetime:
+            self._discard(conn, release=False)
+            return None, None
+        if now - returned > self.health_check_interval and not self._safe(
+            self._check, conn
+        ):
+            with self._condition:
+                self.stats.health_check_failures += 1
+            self._discard(conn, release=False)
+            return None, None
+        return conn, created
+
+    def _new_connection(self, connect):
+        try:
+            conn = connect()
+        except BaseException:
+            self._release_slot()
+            raise
+        with self._condition:
+            self.stats.created += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn, release=True):
+        """Закрывает соединение; release=False — место в пуле остается
+        занятым под новое соединение вызывающего."""
+        self._safe(self._close, conn)
+        with self._condition:
+            self.stats.closed += 1
+        if release:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _safe(func, conn):
+        try:
+            return func(conn) is not False
+        except Exception:
+            return False
@@ -0,0 +1,54 @@
+"""
+Маршрутизация запросов к репликам базы данных.
+
+Запись всегда идет в default. Чтение уходит на реплику
+(settings.REPLICA_DATABASES) только внутри запроса, который
+ReplicaRoutingMiddleware отметил как безопасный: GET/HEAD/OPTIONS без
+недавней записи того же клиента. Команды управления, запросы на запись и
+чтение внутри транзакции работают с default, поэтому сразу видят свои
+изменения.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Алиас базы для чтения в текущем запросе; None — default
+_read_database = ContextVar('read_database', default=None)
+
+
+@contextmanager
+def read_from(alias):
+    """Направляет чтение в блоке на alias (None — на default)."""
+    token = _read_database.set(alias)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def choose_replica():
+    replicas = settings.REPLICA_DATABASES
+    return random.choice(replicas) if replicas else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты с любой из них совместимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплики приходит репликацией
+        return db == DEFAULT_DB_ALIAS
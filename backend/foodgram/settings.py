@@ -3,9 +3,11 @@ Django settings for Foodgram project.
 """
 
 import string
+from datetime import datetime, timedelta, timezone
 from os import getenv
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -39,6 +42,7 @@ if DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.db.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +54,9 @@ MIDDLEWARE = [
 if DEBUG:
     MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
-ROOT_URLCONF = 'foodgram.urls'
+# В режиме ASGI горячие пути чтения обслуживают async-представления
+ASYNC_VIEWS = getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+ROOT_URLCONF = 'foodgram.urls_asgi' if ASYNC_VIEWS else 'foodgram.urls'
 
 TEMPLATES = [
     {
@@ -70,8 +76,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
-# DB_ENGINE может принимать значения sqlite, postgres
-if getenv('DB_ENGINE', 'postgres') == 'postgres':
+# DB_ENGINE может принимать значения sqlite, postgres, postgres_pool.
+# postgres_pool — PostgreSQL с пулом соединений на процесс
+# (foodgram.db.backends.postgresql_pool)
+DB_ENGINE = getenv('DB_ENGINE', 'postgres')
+if DB_ENGINE in ('postgres', 'postgres_pool'):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
@@ -80,8 +89,36 @@ if getenv('DB_ENGINE', 'postgres') == 'postgres':
             'PASSWORD': getenv('POSTGRES_PASSWORD', ''),
             'HOST': getenv('DB_HOST', 'db'),
             'PORT': getenv('DB_PORT', 5432),
+            # Постоянные соединения: в режиме ASGI каждый запрос
+            # выполняется в новом потоке и оставлял бы свое соединение,
+            # а с пулом соединение возвращается в пул в конце запроса
+            'CONN_MAX_AGE': int(
+                getenv(
+                    'DB_CONN_MAX_AGE',
+                    0 if ASYNC_VIEWS or DB_ENGINE == 'postgres_pool' else 60,
+                )
+            ),
+            'CONN_HEALTH_CHECKS': (
+                getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+            ),
         }
     }
+    if DB_ENGINE == 'postgres_pool':
+        DATABASES['default'].update(
+            ENGINE='foodgram.db.backends.postgresql_pool',
+            POOL={
+                'min_size': int(getenv('DB_POOL_MIN_SIZE', 0)),
+                'max_size': int(getenv('DB_POOL_MAX_SIZE', 10)),
+                # Сколько секунд ждать свободного соединения
+                'timeout': float(getenv('DB_POOL_TIMEOUT', 10)),
+                # Проверка SELECT 1 соединения, простоявшего дольше
+                'health_check_interval': float(
+                    getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)
+                ),
+                'max_lifetime': float(getenv('DB_POOL_MAX_LIFETIME', 3600)),
+                'max_idle': float(getenv('DB_POOL_MAX_IDLE', 600)),
+            },
+        )
 else:
     DATABASES = {
         'default': {
@@ -90,6 +127,64 @@ else:
         }
     }
 
+# Реплики только для чтения: DB_REPLICAS — через запятую хосты PostgreSQL
+# (host или host:port) либо, с DB_ENGINE=sqlite, пути к копиям базы.
+# Чтение безопасных запросов уходит на реплики (foodgram.db.routers)
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, map(str.strip, getenv('DB_REPLICAS', '').split(','))),
+    start=1,
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DB_ENGINE == 'sqlite':
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias].update(
+            HOST=host, PORT=port or DATABASES['default']['PORT']
+        )
+    REPLICA_DATABASES.append(alias)
+# Сколько секунд после записи клиент читает с default
+REPLICA_STICKY_TIMEOUT = int(getenv('DB_REPLICA_STICKY_TIMEOUT', 10))
+DATABASE_ROUTERS = ['foodgram.db.routers.PrimaryReplicaRouter']
+
+# Общий для всех воркеров кэш в Redis; без REDIS_URL — кэш в памяти процесса
+if getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+    if REPLICA_DATABASES:
+        # Отметка о записи клиента (foodgram.db.middleware) в кэше одного
+        # процесса не видна остальным воркерам: следующий запрос клиента
+        # прочитал бы отстающую реплику
+        raise ImproperlyConfigured(
+            'DB_REPLICAS требует общего кэша: задайте REDIS_URL.'
+        )
+
+# Статистика пула соединений (DB_ENGINE=postgres_pool) в stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'foodgram.db': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -127,11 +222,16 @@ MEDIA_ROOT = '/media'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.LimitedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
     'dEFAULT_RENDERER_CLASSES': [
@@ -160,8 +260,79 @@ RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
 RECIPE_IMAGE_PATH = 'recipes/image'
 AVATAR_IMAGE_MAX_SIZE = 5 * 1024 * 1024
 AVATAR_IMAGE_PATH = 'users/'
+# Предел тела JSON-запроса: изображение максимального размера в base64
+# плюс запас на остальные поля
+JSON_MAX_BODY_SIZE = (
+    -(-max(RECIPE_IMAGE_MAX_SIZE, AVATAR_IMAGE_MAX_SIZE) * 4 // 3)
+    + 1024 * 1024
+)
+# Предел тела запроса с изображением файлом или в multipart
+IMAGE_UPLOAD_MAX_BODY_SIZE = (
+    max(RECIPE_IMAGE_MAX_SIZE, AVATAR_IMAGE_MAX_SIZE) + 64 * 1024
+)
+# Ширины уменьшенных копий изображений (recipes.services.images)
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+AVATAR_IMAGE_WIDTHS = (64, 128, 256)
+# Потоки обработки изображений; 0 — обработка сразу после фиксации
+# транзакции в потоке запроса
+IMAGE_PROCESSING_WORKERS = int(getenv('IMAGE_PROCESSING_WORKERS', 2))
+# Лента подписок (recipes.services.feed): рецепт автора, у которого
+# подписчиков больше FEED_SYNC_FANOUT_LIMIT, рассылается FEED_FANOUT_WORKERS
+# потоками после фиксации транзакции; 0 потоков — всегда в транзакции
+FEED_SYNC_FANOUT_LIMIT = int(getenv('FEED_SYNC_FANOUT_LIMIT', 1000))
+FEED_FANOUT_WORKERS = int(getenv('FEED_FANOUT_WORKERS', 2))
+FEED_FANOUT_BATCH_SIZE = 1000
+# Сколько последних рецептов автора попадает в ленту при подписке
+FEED_BACKFILL_LIMIT = 100
+# Рейтинги рецептов (recipes.services.scores): вклад добавления в
+# избранное или корзину убывает вдвое за период полураспада
+RECIPE_SCORE_WEIGHTS = {'favorite': 2.0, 'shopping_cart': 1.0}
+RECIPE_POPULAR_HALF_LIFE = timedelta(days=30)
+RECIPE_TRENDING_HALF_LIFE = timedelta(days=3)
+# Начало отсчета растущих весов. Float вмещает около 1000 периодов
+# полураспада (8 лет для тренда), дату нужно переносить вперед вместе с
+# refresh_recipe_scores --full
+RECIPE_SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# Строки моложе этого не учитываются: их транзакции с меньшими id могут
+# быть еще не зафиксированы
+RECIPE_SCORE_REFRESH_LAG = timedelta(minutes=1)
 SHOPPING_CART_FILENAME = 'shopping_cart'
 SHOPPING_CART_FORMAT = 'txt'
+# Под ASGI Django собирает синхронный потоковый ответ в память целиком,
+# поэтому в этом режиме файл формируется обычным ответом
+SHOPPING_CART_STREAMING = (
+    not ASYNC_VIEWS
+    and getenv('SHOPPING_CART_STREAMING', 'True').lower() == 'true'
+)
+# Файл префиксного индекса ингредиентов; пустое значение отключает индекс
+INGREDIENT_INDEX_PATH = getenv(
+    'INGREDIENT_INDEX_PATH', str(BASE_DIR / 'ingredient_index.bin')
+)
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_SEARCH_MAX_LIMIT = 500
+# Конфигурация полнотекстового поиска PostgreSQL. Миграция 0003 строит
+# индекс с ней; после изменения нужна команда rebuild_search_index
+SEARCH_CONFIG = 'russian'
+# Время жизни сериализованных фрагментов рецептов в кэше, секунд
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# Кэш существования рецептов для коротких ссылок, секунд
+SHORT_LINK_CACHE_TIMEOUT = 24 * 60 * 60
+SHORT_LINK_NEGATIVE_CACHE_TIMEOUT = 5 * 60
+SHORT_LINK_REDIRECT_MAX_AGE = 60 * 60
+# Карта коротких ссылок для nginx (команда export_short_links)
+SHORT_LINKS_MAP_PATH = getenv(
+    'SHORT_LINKS_MAP_PATH', str(BASE_DIR / 'short_links.map')
+)
+# Кэш пользователей по токену (recipes.services.auth_cache): размер LRU
+# в памяти процесса и время жизни записей в нем, секунд
+AUTH_TOKEN_CACHE_SIZE = int(getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TIMEOUT = int(getenv('AUTH_TOKEN_CACHE_TIMEOUT', 30))
+# Общий для процессов кэш Django (алиас из CACHES) или None
+AUTH_TOKEN_SHARED_CACHE = 'default' if getenv('REDIS_URL') else None
+AUTH_TOKEN_SHARED_CACHE_TIMEOUT = 5 * 60
+# Списки админки: начиная с этого числа строк в таблице вместо COUNT(*)
+# показывается оценка из статистики PostgreSQL
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
 BASE62_ALPHABET = (
     string.digits + string.ascii_lowercase + string.ascii_uppercase
 )
@@ -0,0 +1,20 @@
+"""
+Маршруты режима ASGI: горячие пути чтения обслуживают асинхронные
+представления api.async_views, остальное — обычные маршруты foodgram.urls.
+"""
+
+from django.urls import path
+
+from api import async_views
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail),
+    path('api/tags/', async_views.tag_list),
+    path('api/tags/<int:pk>/', async_views.tag_detail),
+    path('api/ingredients/', async_views.ingredient_list),
+    path('api/ingredients/<int:pk>/', async_views.ingredient_detail),
+    path('s/<str:code>/', async_views.short_recipe_redirect),
+    *sync_urlpatterns,
+]
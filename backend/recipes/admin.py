@@ -1,4 +1,11 @@
+from collections import Counter
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 from .models import (
     Favorite,
@@ -10,28 +17,223 @@ from .models import (
     Tag,
     User,
 )
+from .services.counters import change_counter
+from .services.feed import publish_to_feeds
+from .services.images import schedule_image_processing
+from .services.ingredient_index import rebuild_ingredient_index
+from .services.recipe_fragments import invalidate_recipe_fragments
+from .services.search import (
+    delete_from_search_index,
+    search_recipes,
+    update_search_index,
+)
+from .services.shopping_cart import (
+    add_recipe_to_shopping_list,
+    get_recipe_shopping_cart_user_ids,
+    rebuild_shopping_lists,
+    remove_recipe_from_shopping_list,
+)
+from .services.short_links import invalidate_short_links
+from .services.versions import touch_catalog, touch_recipes, touch_users
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы модели из статистики PostgreSQL или
+    None, если оценки нет (другая база или таблица еще не
+    анализировалась)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки для больших таблиц.
+
+    Для списка без фильтров и поиска число строк берется из статистики
+    PostgreSQL, если оно больше ADMIN_ESTIMATED_COUNT_THRESHOLD: точный
+    COUNT(*) по всей таблице читает ее целиком.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if (
+                estimate is not None
+                and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """Список без точного подсчета строк всей таблицы."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class RecipeSearchAdminMixin:
+    """Поиск по индексам вместо icontains по связанным таблицам.
+
+    Рецепты ищутся полнотекстовым поиском recipes.services.search,
+    пользователи — по точному совпадению логина или почты (уникальные
+    индексы).
+    """
+
+    recipe_lookup = 'recipe'
+    user_lookup = 'user'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        recipe_ids = search_recipes(
+            Recipe.objects.all(), search_term
+        ).values('pk')
+        return (
+            queryset.filter(
+                Q(**{f'{self.recipe_lookup}__in': recipe_ids})
+                | Q(**{f'{self.user_lookup}__username': search_term})
+                | Q(**{f'{self.user_lookup}__email': search_term})
+            ),
+            False,
+        )
+
+
+class CatalogVersionAdminMixin:
+    """Меняет версию справочников после изменения справочника, названия
+    из которого выводятся в рецептах и списке покупок: с ней устаревают
+    фрагменты рецептов во всех процессах и ETag выгрузки списка покупок."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        touch_catalog()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        touch_catalog()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        touch_catalog()
+
+
+class IngredientIndexAdminMixin:
+    """Перестраивает индекс автодополнения после изменения справочника."""
+
+    def _schedule_index_rebuild(self):
+        transaction.on_commit(rebuild_ingredient_index)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._schedule_index_rebuild()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._schedule_index_rebuild()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._schedule_index_rebuild()
+
+
+class RecipeRelationAdminMixin:
+    """Изменяет счетчик рецепта counter_field и версию пользователя при
+    записи в избранное или корзину, как RecipesViewSet: update() и
+    каскадное удаление их не затрагивают."""
+
+    counter_field = None
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            change_counter(Recipe, obj.recipe_id, self.counter_field, 1)
+            touch_users([obj.user_id])
+        elif form.changed_data:
+            # Запись перенесена к другому пользователю или рецепту
+            change_counter(
+                Recipe, form.initial['recipe'], self.counter_field, -1
+            )
+            change_counter(Recipe, obj.recipe_id, self.counter_field, 1)
+            touch_users({form.initial['user'], obj.user_id})
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        change_counter(Recipe, obj.recipe_id, self.counter_field, -1)
+        touch_users([obj.user_id])
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('user_id', 'recipe_id'))
+        super().delete_queryset(request, queryset)
+        recipe_counts = Counter(recipe_id for _, recipe_id in rows)
+        for recipe_id, deleted in recipe_counts.items():
+            change_counter(Recipe, recipe_id, self.counter_field, -deleted)
+        touch_users({user_id for user_id, _ in rows})
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(CatalogVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'slug')
     search_fields = ('name', 'slug')
 
 
 @admin.register(MeasurementUnit)
-class MeasurementUnitAdmin(admin.ModelAdmin):
+class MeasurementUnitAdmin(
+    CatalogVersionAdminMixin, IngredientIndexAdminMixin, admin.ModelAdmin
+):
     list_display = ('name',)
     search_fields = ('name',)
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(
+    CatalogVersionAdminMixin,
+    IngredientIndexAdminMixin,
+    LargeTableAdminMixin,
+    admin.ModelAdmin,
+):
     list_display = ('name', 'measurement_unit')
+    list_select_related = ('measurement_unit',)
     search_fields = ('name',)
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('measurement_unit')
+    @staticmethod
+    def _recipe_ids(ingredients):
+        return list(
+            RecipeIngredient.objects.filter(ingredient__in=ingredients)
+            .values_list('recipe_id', flat=True)
+            .distinct()
+        )
+
+    # Названия ингредиентов входят в поисковый индекс рецептов
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'name' in form.changed_data:
+            update_search_index(self._recipe_ids([obj]))
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        recipe_ids = self._recipe_ids([obj])
+        super().delete_model(request, obj)
+        update_search_index(recipe_ids)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        recipe_ids = self._recipe_ids(queryset)
+        super().delete_queryset(request, queryset)
+        update_search_index(recipe_ids)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -47,47 +249,147 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(
+    RecipeSearchAdminMixin, LargeTableAdminMixin, admin.ModelAdmin
+):
     list_select_related = [
         'author',
     ]
     list_display = (
         'name',
         'author',
+        'favorites_count',
     )
-    search_fields = ('name__search', 'author')
+    # Поиск выполняет RecipeSearchAdminMixin: название, описание и
+    # ингредиенты рецепта, логин или почта автора
+    search_fields = ('name',)
+    recipe_lookup = 'pk'
+    user_lookup = 'author'
     list_filter = ('tags',)
     filter_horizontal = ('tags',)
-    readonly_fields = ('favorites_count',)
+    readonly_fields = ('favorites_count', 'shopping_cart_count')
 
     inlines = (RecipeIngredientInline,)
     # exclude = ('tags',)
 
-    @admin.display(description='Количество в избранном')
-    def favorites_count(self, obj):
-        return obj.favorites.count()
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            change_counter(User, obj.author_id, 'recipes_count', 1)
+            invalidate_short_links([obj.id])
+            publish_to_feeds(obj)
+        if 'image' in form.changed_data:
+            schedule_image_processing(obj)
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.prefetch_related('tags')
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Теги и ингредиенты сохраняются после самого рецепта
+        touch_recipes([form.instance.id])
+        update_search_index([form.instance.id])
+        invalidate_recipe_fragments([form.instance.id])
+        if change and any(formset.has_changed() for formset in formsets):
+            cart_user_ids = get_recipe_shopping_cart_user_ids(form.instance)
+            if cart_user_ids:
+                rebuild_shopping_lists(cart_user_ids)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        cart_user_ids = get_recipe_shopping_cart_user_ids(obj)
+        delete_from_search_index([obj.id])
+        invalidate_recipe_fragments([obj.id])
+        invalidate_short_links([obj.id])
+        super().delete_model(request, obj)
+        change_counter(User, obj.author_id, 'recipes_count', -1)
+        if cart_user_ids:
+            rebuild_shopping_lists(cart_user_ids)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('id', flat=True))
+        cart_user_ids = set(
+            ShoppingCart.objects.filter(recipe_id__in=recipe_ids).values_list(
+                'user_id', flat=True
+            )
+        )
+        delete_from_search_index(recipe_ids)
+        invalidate_recipe_fragments(recipe_ids)
+        invalidate_short_links(recipe_ids)
+        author_counts = Counter(queryset.values_list('author_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for author_id, deleted in author_counts.items():
+            change_counter(User, author_id, 'recipes_count', -deleted)
+        if cart_user_ids:
+            rebuild_shopping_lists(cart_user_ids)
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name')
+class UserAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = (
+        'username',
+        'email',
+        'first_name',
+        'last_name',
+        'recipes_count',
+        'followers_count',
+    )
+    readonly_fields = ('recipes_count', 'followers_count')
     search_fields = (
         'username',
         'email',
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'avatar' in form.changed_data:
+            schedule_image_processing(obj)
+
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(
+    RecipeRelationAdminMixin,
+    RecipeSearchAdminMixin,
+    LargeTableAdminMixin,
+    admin.ModelAdmin,
+):
+    counter_field = 'favorites_count'
     list_display = ('user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
+    list_select_related = ('user', 'recipe')
+    # Поиск выполняет RecipeSearchAdminMixin: рецепт, логин или почта
+    search_fields = ('recipe__name',)
+    raw_id_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(
+    RecipeRelationAdminMixin,
+    RecipeSearchAdminMixin,
+    LargeTableAdminMixin,
+    admin.ModelAdmin,
+):
+    counter_field = 'shopping_cart_count'
     list_display = ('user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
+    list_select_related = ('user', 'recipe')
+    # Поиск выполняет RecipeSearchAdminMixin: рецепт, логин или почта
+    search_fields = ('recipe__name',)
+    raw_id_fields = ('user', 'recipe')
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            add_recipe_to_shopping_list(obj.user, obj.recipe)
+        elif form.changed_data:
+            # Запись перенесена к другому пользователю или рецепту
+            rebuild_shopping_lists({form.initial['user'], obj.user_id})
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        remove_recipe_from_shopping_list(obj.user, obj.recipe)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_shopping_lists(user_ids)
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import User
+from recipes.services.benchmark import (
+    build_cases,
+    compare_reports,
+    load_report,
+    run_benchmark,
+    save_report,
+)
+
+
+class Command(BaseCommand):
+    """
+    Замер латентности (p50/p95/p99) и количества SQL-запросов для
+    эндпоинтов API и функций recipes.services на текущих данных.
+    """
+
+    help = (
+        'Benchmark API endpoints and recipes.services functions. '
+        'Parameters: '
+        '  --iterations (measured runs per case, default: 20) '
+        '  --warmup (unmeasured runs per case, default: 2) '
+        '  --case (case name prefix, can be repeated) '
+        '  --user (user id to run requests as) '
+        '  --cold (clear the cache before every run) '
+        '  --output (report path, default: benchmarks/<commit>.json) '
+        '  --compare (baseline report to compare with) '
+        '  --max-regression (allowed p95 growth in percent, default: 20)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--case',
+            action='append',
+            dest='cases',
+            help='Запускать только сценарии с этим префиксом имени.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Пользователь, от имени которого выполняются запросы.',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым замером.',
+        )
+        parser.add_argument('--output', help='Файл отчета (JSON).')
+        parser.add_argument(
+            '--compare', help='Отчет предыдущего прогона для сравнения.'
+        )
+        parser.add_argument('--max-regression', type=float, default=20.0)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = User.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.'
+                )
+        elif not User.objects.exists():
+            raise CommandError(
+                'Нет данных для замеров, запустите generate_dataset.'
+            )
+
+        cases = build_cases(user)
+        if options['cases']:
+            cases = {
+                name: func
+                for name, func in cases.items()
+                if name.startswith(tuple(options['cases']))
+            }
+
+        report = run_benchmark(
+            cases,
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            progress=self._progress,
+        )
+        path = save_report(
+            report,
+            options['output']
+            or settings.BASE_DIR / 'benchmarks' / f'{report["commit"]}.json',
+        )
+        self.stdout.write(self.style.SUCCESS(f'Отчет сохранен: {path}'))
+
+        if options['compare']:
+            self._compare(
+                load_report(options['compare']),
+                report,
+                options['max_regression'],
+            )
+
+    def _progress(self, name, result):
+        self.stdout.write(
+            f'{name:<50} p50 {result["p50_ms"]:>9.2f} ms  '
+            f'p95 {result["p95_ms"]:>9.2f} ms  '
+            f'p99 {result["p99_ms"]:>9.2f} ms  '
+            f'запросов {result["queries"]}'
+        )
+
+    def _compare(self, baseline, report, max_regression):
+        rows, regressions = compare_reports(baseline, report, max_regression)
+        self.stdout.write(
+            f'\nСравнение p95 с {baseline["commit"]} '
+            f'({baseline["created"]}):'
+        )
+        for name, before, after, change, queries in rows:
+            if before is None:
+                self.stdout.write(f'{name:<50} новый: {after:.2f} ms')
+                continue
+            self.stdout.write(
+                f'{name:<50} {before:>9.2f} -> {after:>9.2f} ms '
+                f'({change:+.1f}%), запросов {queries:+d}'
+            )
+        if regressions:
+            raise CommandError(
+                'Регрессия производительности: ' + ', '.join(regressions)
+            )
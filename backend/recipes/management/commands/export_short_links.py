@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.services.short_links import export_short_links_map
+
+
+class Command(BaseCommand):
+    """
+    Выгрузка карты коротких ссылок для nginx: известные ссылки
+    перенаправляются на страницу рецепта без обращения к Django.
+    """
+
+    help = (
+        'Export the short link -> recipe path map for nginx. '
+        'start_backend.sh runs it every SHORT_LINKS_EXPORT_INTERVAL '
+        'seconds; the file is rewritten only when it changes, and the '
+        'nginx container reloads after that. Links missing from the map '
+        'are still resolved by Django. '
+        'Parameters: '
+        '  --output (map file, default: SHORT_LINKS_MAP_PATH)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Файл карты (по умолчанию SHORT_LINKS_MAP_PATH).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.SHORT_LINKS_MAP_PATH
+        count = export_short_links_map(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Карта коротких ссылок для {count} рецептов: {path}'
+            )
+        )
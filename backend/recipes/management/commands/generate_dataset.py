@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+
+from recipes.services.dataset import DEFAULT_PASSWORD, DatasetGenerator
+
+
+class Command(BaseCommand):
+    """
+    Генерация воспроизводимого синтетического набора данных для
+    нагрузочного тестирования (пользователи, рецепты, избранное,
+    корзины, подписки).
+    """
+
+    help = (
+        'Generate a reproducible synthetic dataset with bulk inserts. '
+        'Parameters: '
+        '  --users, --recipes, --favorites, --shopping-carts, '
+        '--subscriptions (sizes) '
+        '  --seed (random seed, default: 0) '
+        '  --prefix (username prefix, must be unique per run) '
+        '  --batch-size (rows per insert, default: 5000) '
+        '  --skip-search-index (do not index generated recipes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--shopping-carts', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            default=8,
+            help='Количество ингредиентов в рецепте.',
+        )
+        parser.add_argument(
+            '--tags-per-recipe',
+            type=int,
+            default=2,
+            help='Количество тегов у рецепта.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='Префикс имен пользователей; для повторного запуска на '
+            'той же базе нужен другой префикс.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной вставке.',
+        )
+        parser.add_argument(
+            '--skip-search-index',
+            action='store_true',
+            help='Не обновлять поисковый индекс для новых рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        generator = DatasetGenerator(
+            users=options['users'],
+            recipes=options['recipes'],
+            favorites=options['favorites'],
+            shopping_carts=options['shopping_carts'],
+            subscriptions=options['subscriptions'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            tags_per_recipe=options['tags_per_recipe'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            update_search=not options['skip_search_index'],
+            progress=self._progress,
+        )
+        sizes = generator.generate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Набор данных создан: '
+                + ', '.join(f'{name} {count}' for name, count in sizes.items())
+                + f'. Пароль пользователей: {DEFAULT_PASSWORD}.'
+            )
+        )
+
+    def _progress(self, stage, done, total):
+        if self.verbosity > 1 or done == total:
+            self.stdout.write(f'{stage}: {done}/{total}')
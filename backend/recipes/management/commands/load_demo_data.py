@@ -15,10 +15,27 @@ from recipes.models import (
     RecipeIngredient,
     Tag,
 )
-from recipes.services.utils import read_data_from_file
+from recipes.services.counters import recount_counters
+from recipes.services.ingredient_index import rebuild_ingredient_index
+from recipes.services.passwords import hash_passwords
+from recipes.services.search import update_search_index
+from recipes.services.short_links import invalidate_short_links
+from recipes.services.utils import batched, read_data_from_file
 
 User = get_user_model()
 
+# Размер пачки для фильтров name__in: SQLite ограничивает число
+# параметров запроса
+LOOKUP_BATCH_SIZE = 500
+
+
+def _lookup(queryset, field, values, *fields):
+    """Строки queryset с field из values, выбранные пачками."""
+    for batch in batched(sorted(values), LOOKUP_BATCH_SIZE):
+        yield from queryset.filter(**{f'{field}__in': batch}).values_list(
+            *fields
+        )
+
 
 class Command(BaseCommand):
     help = 'Загрузка демо-данных из JSON: '
@@ -30,9 +47,28 @@ class Command(BaseCommand):
             default='../data',
             help='Каталог с JSON файлами (по умолчанию /data).',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT (по умолчанию 1000).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help=(
+                'Число процессов для хэширования паролей '
+                '(по умолчанию число ядер).'
+            ),
+        )
 
     def handle(self, *args, **options):
         data_dir = Path(options['data_dir'])
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
 
         tags_path = data_dir / 'tags.json'
         units_path = data_dir / 'units.json'
@@ -47,25 +83,34 @@ class Command(BaseCommand):
                     f'Проверьте volume-mount и размещение данных в {data_dir}.'
                 )
 
+        # Хэширование паролей занимает процессор надолго: оно выполняется
+        # до транзакции, в ней остаются только вставки
+        users = self._prepare_users(users_path)
         with transaction.atomic():
-            self._load_users(users_path)
+            self._load_users(users)
             self._load_tags(tags_path)
             self._load_units(units_path)
             self._load_ingredients(ingredients_path)
             self._load_recipes(recipes_path)
+            recount_counters(self.batch_size)
+            transaction.on_commit(rebuild_ingredient_index)
 
         self.stdout.write(self.style.SUCCESS('Демо-данные успешно загружены.'))
 
+    def _bulk_create(self, model, objs):
+        """Вставляет объекты пачками, пропуская нарушающие уникальность.
+        Возвращает количество действительно созданных строк."""
+        before = model.objects.count()
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return model.objects.count() - before
+
     def _load_tags(self, path):
         data = read_data_from_file(path)
 
-        created = 0
-        for item in data:
-            _, was_created = Tag.objects.get_or_create(
-                slug=item['slug'],
-                defaults={'name': item['name']},
-            )
-            created += int(was_created)
+        created = self._bulk_create(
+            Tag, (Tag(slug=item['slug'], name=item['name']) for item in data)
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -74,7 +119,7 @@ class Command(BaseCommand):
         )
 
     def _load_units(self, path):
-        created = load_units(path)
+        created = load_units(path, self.batch_size)
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -83,23 +128,52 @@ class Command(BaseCommand):
             )
         )
 
-    def _load_users(self, path):
+    def _password_progress(self, done, total):
+        # Не чаще чем каждые 10%
+        percent = done * 100 // total
+        if percent // 10 > self._reported_percent // 10 or done == total:
+            self._reported_percent = percent
+            self.stdout.write(f'Пароли: {done} из {total} ({percent}%)')
+
+    def _prepare_users(self, path):
+        """Новые пользователи из файла с готовыми хэшами паролей:
+        список пар (данные пользователя, хэш)."""
         data = read_data_from_file(path)
+        existing = {
+            email
+            for email, in _lookup(
+                User.objects, 'email', {item['email'] for item in data}, 'email'
+            )
+        }
 
-        created = 0
+        users = {}
         for item in data:
-            user, was_created = User.objects.get_or_create(
-                email=item['email'],
-                defaults={
-                    'username': item['username'],
-                    'first_name': item['first_name'],
-                    'last_name': item['last_name'],
-                },
-            )
-            if was_created:
-                user.set_password(item['password'])
-                user.save()
-                created += 1
+            email = item['email']
+            if email in existing or email in users:
+                continue
+            users[email] = item
+        self._reported_percent = 0
+        passwords = hash_passwords(
+            (item['password'] for item in users.values()),
+            self.workers,
+            self._password_progress,
+        )
+        return list(zip(users.values(), passwords))
+
+    def _load_users(self, users):
+        created = self._bulk_create(
+            User,
+            (
+                User(
+                    email=item['email'],
+                    username=item['username'],
+                    first_name=item['first_name'],
+                    last_name=item['last_name'],
+                    password=password,
+                )
+                for item, password in users
+            ),
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -110,52 +184,113 @@ class Command(BaseCommand):
     def _load_recipes(self, path: Path) -> None:
         data = read_data_from_file(path)
 
-        created_recipes = 0
-        created_links = 0
-
-        for item in data:
-            author = User.objects.get(email=item['author_email'])
-
-            recipe, was_created = Recipe.objects.get_or_create(
-                author=author,
-                name=item['name'],
-                defaults={
-                    'text': item['text'],
-                    'cooking_time': item['cooking_time'],
-                },
+        authors = dict(
+            _lookup(
+                User.objects,
+                'email',
+                {item['author_email'] for item in data},
+                'email',
+                'id',
+            )
+        )
+        tags = dict(Tag.objects.values_list('slug', 'id'))
+        ingredients = {
+            (name, unit_name): (ingredient_id, unit_id)
+            for ingredient_id, name, unit_id, unit_name in _lookup(
+                Ingredient.objects,
+                'name',
+                {ing['name'] for item in data for ing in item['ingredients']},
+                'id',
+                'name',
+                'measurement_unit_id',
+                'measurement_unit__name',
+            )
+        }
+        # Уже загруженные рецепты не дублируются вместе со связями
+        existing = set(
+            _lookup(
+                Recipe.objects,
+                'author_id',
+                set(authors.values()),
+                'author_id',
+                'name',
             )
+        )
 
-            if not was_created:
-                # Рецепт уже был — не плодим дубликаты связей
-                continue
+        missing_authors = {
+            item['author_email'] for item in data
+        } - authors.keys()
+        if missing_authors:
+            raise CommandError(
+                f'Не найдены авторы по email: {sorted(missing_authors)}'
+            )
+        missing_tags = {
+            slug for item in data for slug in item['tags']
+        } - tags.keys()
+        if missing_tags:
+            raise CommandError(
+                f'Не найдены теги по slug: {sorted(missing_tags)}'
+            )
+        missing_ingredients = {
+            (ing['name'], ing['measurement_unit'])
+            for item in data
+            for ing in item['ingredients']
+        } - ingredients.keys()
+        if missing_ingredients:
+            raise CommandError(
+                f'Не найдены ингредиенты: {sorted(missing_ingredients)}'
+            )
 
-            created_recipes += 1
+        new_items = []
+        for item in data:
+            key = (authors[item['author_email']], item['name'])
+            if key not in existing:
+                existing.add(key)
+                new_items.append(item)
 
-            # Теги (slug)
-            tags = Tag.objects.filter(slug__in=item['tags'])
-            if tags.count() != len(item['tags']):
-                missing = set(item['tags']) - set(
-                    tags.values_list('slug', flat=True)
-                )
-                raise CommandError(
-                    f'Не найдены теги по slug: {sorted(missing)}'
+        created_recipes = 0
+        created_links = 0
+        for batch in batched(new_items, self.batch_size):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=authors[item['author_email']],
+                    name=item['name'],
+                    text=item['text'],
+                    cooking_time=item['cooking_time'],
                 )
-            recipe.tags.add(*tags)
-
-            # Ингредиенты (name + measurement_unit)
-            for ing in item['ingredients']:
-                unit = MeasurementUnit.objects.get(name=ing['measurement_unit'])
-                ingredient = Ingredient.objects.get(
-                    name=ing['name'], measurement_unit=unit
+                for item in batch
+            )
+            recipe_tags = []
+            recipe_ingredients = []
+            for recipe, item in zip(recipes, batch):
+                recipe_tags.extend(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[slug])
+                    for slug in item['tags']
                 )
+                for ing in item['ingredients']:
+                    ingredient_id, unit_id = ingredients[
+                        (ing['name'], ing['measurement_unit'])
+                    ]
+                    recipe_ingredients.append(
+                        RecipeIngredient(
+                            recipe_id=recipe.pk,
+                            ingredient_id=ingredient_id,
+                            measurement_unit_id=unit_id,
+                            amount=ing['amount'],
+                        )
+                    )
+            Recipe.tags.through.objects.bulk_create(
+                recipe_tags, ignore_conflicts=True
+            )
+            RecipeIngredient.objects.bulk_create(
+                recipe_ingredients, ignore_conflicts=True
+            )
 
-                RecipeIngredient.objects.create(
-                    recipe=recipe,
-                    ingredient=ingredient,
-                    amount=ing['amount'],
-                    measurement_unit=unit,
-                )
-                created_links += 1
+            recipe_ids = [recipe.pk for recipe in recipes]
+            update_search_index(recipe_ids)
+            invalidate_short_links(recipe_ids)
+            created_recipes += len(recipes)
+            created_links += len(recipe_ingredients)
 
         self.stdout.write(
             self.style.SUCCESS(f'Рецепты: создано {created_recipes}.')
@@ -167,11 +302,11 @@ class Command(BaseCommand):
         )
 
     def _load_ingredients(self, path):
-        created = load_ingredients(path)
+        result = load_ingredients(path, self.batch_size)
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Ингредиенты: создано {len(created)}, '
+                f'Ингредиенты: создано {result.ingredients}, '
                 f'всего {Ingredient.objects.count()}'
             )
         )
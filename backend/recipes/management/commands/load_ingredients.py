@@ -1,17 +1,25 @@
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
 from recipes.models import Ingredient, MeasurementUnit
-from recipes.services.utils import read_data_from_file
+from recipes.services.ingredient_import import (
+    DEFAULT_BATCH_SIZE,
+    MODES,
+    import_ingredients,
+)
+from recipes.services.ingredient_index import rebuild_ingredient_index
+from recipes.services.utils import iter_data_from_file, read_data_from_file
 
 
 class Command(BaseCommand):
     """
-    Команда для загрузки ингредиентов из CSV-файла.
-    Проверка уникальности вручную по комбинации (name, measurement_unit),'
-    чтобы избежать ошибок ON CONFLICT в SQLite.
-    bulk_create только для новых объектов, дубликаты пропускаются.
+    Команда для загрузки ингредиентов из CSV- или JSON-файла.
+    Файл читается потоково и загружается пачками (см.
+    recipes.services.ingredient_import): в PostgreSQL через COPY во
+    временную таблицу, в остальных базах через bulk_create с проверкой
+    существующих пар (name, measurement_unit). Дубликаты пропускаются.
     Работает как с уже существующими MeasurementUnit, так и с новыми.
     """
 
@@ -19,7 +27,9 @@ class Command(BaseCommand):
         'Load ingredients list from file. '
         'Parameters: '
         '  --data-dir (default: ../data) '
-        '  --format (csv or json, default: json)'
+        '  --format (csv or json, default: json) '
+        '  --mode (auto, copy or batch, default: auto) '
+        '  --batch-size (default: 5000)'
     )
 
     def add_arguments(self, parser):
@@ -34,10 +44,32 @@ class Command(BaseCommand):
             choices=['csv', 'json'],
             help='Формат файла с ингредиентами (по умолчанию json).',
         )
+        parser.add_argument(
+            '--mode',
+            default='auto',
+            choices=MODES,
+            help=(
+                'Способ записи: copy (только PostgreSQL), batch или auto '
+                '(copy для PostgreSQL, иначе batch).'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в пачке (по умолчанию 5000).',
+        )
+
+    def _progress(self, result):
+        self.stdout.write(f'Прочитано строк: {result.rows}')
 
     def handle(self, *args, **options):
         data_dir = Path(options['data_dir'])
         frmt = options['format']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        if options['mode'] == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('Режим copy доступен только для PostgreSQL.')
 
         units_path = Path(data_dir, 'units.' + frmt)
         ingredients_path = Path(data_dir, 'ingredients.' + frmt)
@@ -57,71 +89,48 @@ class Command(BaseCommand):
             )
         )
 
-        created_ingredients = load_ingredients(ingredients_path)
+        try:
+            result = load_ingredients(
+                ingredients_path,
+                options['batch_size'],
+                options['mode'],
+                progress=self._progress,
+            )
+        except ValueError as error:
+            raise CommandError(error)
         self.stdout.write(
             self.style.SUCCESS(
-                f'Загружено {len(created_ingredients)} ингредиентов, '
+                f'Прочитано {result.rows} строк, загружено '
+                f'{result.ingredients} ингредиентов, '
                 f'всего {Ingredient.objects.count()}.'
             )
         )
 
-
-def load_units(filename):
-    """Загрузка единиц измерения из файла"""
-    data = read_data_from_file(filename)
-
-    created = 0
-    created_items = []
-    for item in data:
-        mu, was_created = MeasurementUnit.objects.get_or_create(
-            name=item['name'],
+        rebuild_ingredient_index()
+        self.stdout.write(
+            self.style.SUCCESS('Индекс автодополнения ингредиентов обновлен.')
         )
 
-        if was_created:
-            created += int(was_created)
-            created_items.append(mu)
 
-    return created_items
-
-
-def load_ingredients(filename):
-    data = read_data_from_file(filename)
-    unit_names = {row['measurement_unit'] for row in data}
-
-    existing_units = MeasurementUnit.objects.filter(name__in=unit_names)
-    existing_unit_names = set(unit.name for unit in existing_units)
-
-    m_units_to_create = [
-        MeasurementUnit(name=name)
-        for name in unit_names
-        if name not in existing_unit_names
-    ]
-
-    MeasurementUnit.objects.bulk_create(
-        m_units_to_create,
-        update_conflicts=True,
-        update_fields=['name'],
-        unique_fields=['name'],
+def load_units(filename, batch_size=None):
+    """Загрузка единиц измерения из файла, существующие пропускаются."""
+    names = {item['name'] for item in read_data_from_file(filename)}
+    existing = set(
+        MeasurementUnit.objects.filter(name__in=names).values_list(
+            'name', flat=True
+        )
     )
-
-    # Обновляем маппинг
-    units_map = {
-        unit.name: unit
-        for unit in MeasurementUnit.objects.filter(name__in=unit_names)
-    }
-    existing_ingredients = set(
-        Ingredient.objects.values_list('name', 'measurement_unit__name')
+    return MeasurementUnit.objects.bulk_create(
+        [MeasurementUnit(name=name) for name in sorted(names - existing)],
+        batch_size=batch_size,
+        ignore_conflicts=True,
     )
 
-    created_ingredients = Ingredient.objects.bulk_create(
-        [
-            Ingredient(
-                name=row['name'],
-                measurement_unit=units_map[row['measurement_unit']],
-            )
-            for row in data
-            if (row['name'], row['measurement_unit'])
-            not in existing_ingredients
-        ]
+
+def load_ingredients(
+    filename, batch_size=DEFAULT_BATCH_SIZE, mode='auto', progress=None
+):
+    """Потоковая загрузка ингредиентов из файла, возвращает ImportResult."""
+    return import_ingredients(
+        iter_data_from_file(filename), mode, batch_size, progress
     )
-    return created_ingredients
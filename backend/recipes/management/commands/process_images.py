@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from recipes.services.images import IMAGE_FIELDS, process_image
+
+
+class Command(BaseCommand):
+    """
+    Построение уменьшенных копий и заглушек для изображений рецептов и
+    аватаров, для которых они еще не построены (например, если процесс
+    был остановлен до обработки очереди).
+    """
+
+    help = (
+        'Build resized variants and placeholders for recipe images and '
+        'avatars. '
+        'Parameters: '
+        '  --force (rebuild variants that already exist)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить и уже обработанные изображения.',
+        )
+
+    def handle(self, *args, **options):
+        for model, (image_field, _, _) in IMAGE_FIELDS.items():
+            processed = 0
+            rows = list(
+                model.objects.exclude(**{image_field: ''})
+                .exclude(**{f'{image_field}__isnull': True})
+                .values_list('pk', image_field)
+            )
+            for pk, name in rows:
+                processed += process_image(model, pk, name, options['force'])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural}: обработано '
+                    f'{processed} изображений.'
+                )
+            )
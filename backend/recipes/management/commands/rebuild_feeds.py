@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import FeedEntry, Subscription
+from recipes.services.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    """
+    Пересборка лент подписок (FeedEntry) по текущим подпискам, например
+    после остановки процесса с незавершенной рассылкой рецепта.
+    """
+
+    help = (
+        'Rebuild subscription feeds from subscriptions. '
+        'Parameters: '
+        '  --user (user id, can be repeated; default: all users) '
+        '  --batch-size (users per transaction, default: 500)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            type=int,
+            dest='user_ids',
+            help='Пересобрать ленту только этого пользователя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество пользователей в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = sorted(
+                set(
+                    Subscription.objects.values_list(
+                        'user_id', flat=True
+                    ).distinct()
+                )
+                | set(
+                    FeedEntry.objects.values_list(
+                        'user_id', flat=True
+                    ).distinct()
+                )
+            )
+
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            rebuild_feeds(user_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ленты подписок пересобраны для {len(user_ids)} '
+                'пользователей.'
+            )
+        )
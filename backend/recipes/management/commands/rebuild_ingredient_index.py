@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.services.ingredient_index import build_ingredient_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ingredient autocomplete prefix index file.'
+
+    def handle(self, *args, **options):
+        if not settings.INGREDIENT_INDEX_PATH:
+            raise CommandError('Индекс отключен: INGREDIENT_INDEX_PATH пуст.')
+        count = build_ingredient_index(settings.INGREDIENT_INDEX_PATH)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Индекс {settings.INGREDIENT_INDEX_PATH} перестроен, '
+                f'записей: {count}.'
+            )
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.services.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the recipe full-text search index. '
+        'Parameters: '
+        '  --batch-size (recipes per update, default: 1000)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одном обновлении индекса.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        total = 0
+        for recipe_id in Recipe.objects.values_list('id', flat=True).iterator():
+            batch.append(recipe_id)
+            if len(batch) == batch_size:
+                update_search_index(batch)
+                total += len(batch)
+                batch = []
+        update_search_index(batch)
+        total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Поисковый индекс обновлен: {total} рецептов.')
+        )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.services.shopping_cart import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """
+    Пересчет материализованных списков покупок (ShoppingListItem)
+    по текущему содержимому корзин пользователей.
+    """
+
+    help = (
+        'Rebuild materialized shopping lists from shopping carts. '
+        'Parameters: '
+        '  --user (user id, can be repeated; default: all users) '
+        '  --batch-size (users per transaction, default: 500)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            type=int,
+            dest='user_ids',
+            help='Пересчитать список покупок только этого пользователя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество пользователей в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = sorted(
+                set(
+                    ShoppingCart.objects.values_list(
+                        'user_id', flat=True
+                    ).distinct()
+                )
+                | set(
+                    ShoppingListItem.objects.values_list(
+                        'user_id', flat=True
+                    ).distinct()
+                )
+            )
+
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            rebuild_shopping_lists(user_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Списки покупок пересчитаны для {len(user_ids)} '
+                'пользователей.'
+            )
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.services.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconcile denormalized counters (favorites, shopping carts, '
+        'recipes, followers) with the source tables. '
+        'Parameters: '
+        '  --batch-size (rows per update, default: 1000)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном обновлении.',
+        )
+
+    def handle(self, *args, **options):
+        recipes, users = recount_counters(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Счетчики пересчитаны: рецептов {recipes}, '
+                f'пользователей {users}.'
+            )
+        )
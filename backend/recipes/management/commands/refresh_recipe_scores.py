@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes.services.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Add new favorites and shopping cart entries to recipe popularity '
+        'and trending scores. Run periodically (e.g. every few minutes). '
+        'Parameters: '
+        '  --full (recompute from scratch, accounts for removals) '
+        '  --batch-size (rows per transaction, default: 1000)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рейтинги заново с учетом удалений.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        processed = refresh_scores(options['full'], options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Рейтинги обновлены: избранное '
+                f'{processed["favorite"]}, корзины '
+                f'{processed["shopping_cart"]}.'
+            )
+        )
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.25 on 2026-10-18 04:25
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Конфигурация подставляется из settings.SEARCH_CONFIG, как в
+# recipes.services.search
+POSTGRES_FORWARD = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm
+    ON recipes_recipe USING gin (name gin_trgm_ops);
+UPDATE recipes_recipe AS r SET search_vector =
+    setweight(to_tsvector(%s::regconfig, r.name), 'A')
+    || setweight(to_tsvector(%s::regconfig, r.text), 'B')
+    || setweight(to_tsvector(%s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_recipeingredient AS ri
+        JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'C');
+"""
+POSTGRES_BACKWARD = """
+DROP INDEX IF EXISTS recipes_recipe_name_trgm;
+DROP INDEX IF EXISTS recipes_recipe_search_vector_gin;
+"""
+SQLITE_FORWARD = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(
+        name, text, ingredients, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients)
+    SELECT r.id, r.name, r.text, coalesce((
+        SELECT group_concat(i.name, ' ')
+        FROM recipes_recipeingredient AS ri
+        JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')
+    FROM recipes_recipe AS r
+    """,
+)
+SQLITE_BACKWARD = ('DROP TABLE IF EXISTS recipes_recipe_fts',)
+
+
+def _run(schema_editor, postgres, sqlite):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            postgres, [settings.SEARCH_CONFIG] * postgres.count('%s')
+        )
+    elif vendor == 'sqlite':
+        for statement in sqlite:
+            schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, POSTGRES_FORWARD, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, POSTGRES_BACKWARD, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shopping_list'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 import recipes.constants as const
@@ -33,6 +34,21 @@ class User(AbstractUser):
     avatar = models.ImageField(
         upload_to=AVATAR_IMAGE_PATH, null=True, blank=True, default=None
     )
+    # Уменьшенные копии и заглушка, заполняются recipes.services.images
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, blank=True, editable=False
+    )
+    shopping_cart_version = models.PositiveIntegerField(
+        'Версия списка покупок', default=0, editable=False
+    )
+    updated_at = models.DateTimeField('Изменен', auto_now=True)
+    # Счетчики поддерживаются recipes.services.counters
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -112,11 +128,52 @@ class Recipe(models.Model):
     pub_date = models.DateField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменен')
+    # Счетчики поддерживаются recipes.services.counters
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество в избранном'
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество в корзинах'
+    )
+    # Рейтинги с затуханием, обновляются recipes.services.scores
+    popularity_score = models.FloatField(
+        default=0, editable=False, verbose_name='Популярность'
+    )
+    trending_score = models.FloatField(
+        default=0, editable=False, verbose_name='Тренд'
+    )
+    # Уменьшенные копии и заглушка, заполняются recipes.services.images
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+    )
+    # Заполняется recipes.services.search, используется только в PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popularity_score', '-id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'], name='recipe_trending_idx'
+            ),
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -143,6 +200,9 @@ class Favorite(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='favorites'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Добавлено'
+    )
 
     class Meta:
         default_related_name = 'favorites'
@@ -159,6 +219,36 @@ class ShoppingCart(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='shoppingcart'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Добавлено'
+    )
+
+
+class ShoppingListItem(models.Model):
+    """
+    Материализованный список покупок: суммарное количество ингредиента
+    по всем рецептам в корзине пользователя.
+    Поддерживается инкрементально сервисами recipes.services.shopping_cart.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    measurement_unit = models.ForeignKey(
+        MeasurementUnit, on_delete=models.CASCADE
+    )
+    total_amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient', 'measurement_unit'],
+                name='unique_shopping_list_item',
+            )
+        ]
 
 
 class Subscription(models.Model):
@@ -192,3 +282,68 @@ class Subscription(models.Model):
                 name='unique_subscription_per_user_per_author',
             ),
         ]
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Заполняется recipes.services.feed при публикации
+    рецепта и при подписке, поэтому лента читается по индексу
+    (user, recipe) без соединения с подписками.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='feed_entries'
+    )
+    # Копия recipe.author для удаления записей при отписке
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            # Индекс ограничения упорядочивает ленту пользователя
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            ),
+        ]
+
+
+class ScoreCheckpoint(models.Model):
+    """
+    Последняя учтенная в рейтингах рецептов строка источника (избранное,
+    корзина); recipes.services.scores обрабатывает только строки после
+    нее.
+    """
+
+    source = models.CharField(max_length=32, unique=True)
+    last_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Позиция пересчета рейтингов'
+        verbose_name_plural = 'Позиции пересчета рейтингов'
+
+
+class DataVersion(models.Model):
+    """
+    Версия данных, от которых зависят кэши всех процессов, например
+    справочников во фрагментах рецептов. Хранится в базе, чтобы ее
+    изменение видели все воркеры; меняется recipes.services.versions.
+    """
+
+    name = models.CharField(max_length=32, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
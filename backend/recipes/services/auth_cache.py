@@ -0,0 +1,180 @@
+"""
+Кэш пользователей по ключу токена для api.authentication.
+
+Первый уровень — LRU в памяти процесса (AUTH_TOKEN_CACHE_SIZE записей,
+время жизни AUTH_TOKEN_CACHE_TIMEOUT), второй — необязательный общий
+кэш Django AUTH_TOKEN_SHARED_CACHE (время жизни
+AUTH_TOKEN_SHARED_CACHE_TIMEOUT), общий для всех процессов.
+
+Записи удаляются при выходе (удаление токена), сохранении пользователя
+(смена пароля, деактивация, изменение профиля), touch_users и изменении
+полей пользователя через update() (счетчики, версия корзины, варианты
+аватара). LRU других процессов так сбросить нельзя, поэтому его время
+жизни — верхняя граница того, сколько там может прожить удаленный токен.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+SHARED_KEY = 'auth-token:{key}'
+
+
+class LRUCache:
+    """Потокобезопасный LRU с временем жизни записей и индексом по
+    пользователю для удаления всех его токенов."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + self.timeout, user)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.size:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def delete_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                for key in list(self._user_keys.get(user_id, ())):
+                    self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._user_keys.get(entry[1].pk)
+        keys.discard(key)
+        if not keys:
+            del self._user_keys[entry[1].pk]
+
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def _get_local():
+    global _local
+    with _local_lock:
+        if _local is None:
+            _local = LRUCache(
+                settings.AUTH_TOKEN_CACHE_SIZE,
+                settings.AUTH_TOKEN_CACHE_TIMEOUT,
+            )
+        return _local
+
+
+def _get_shared():
+    alias = settings.AUTH_TOKEN_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def get_cached_user(key, use_shared=True):
+    """Пользователь токена key из кэша или None.
+
+    use_shared=False — только LRU процесса, без сетевых обращений.
+    Возвращается копия: представления могут менять request.user, а
+    закэшированный объект общий для потоков процесса.
+    """
+    local = _get_local()
+    user = local.get(key)
+    if user is None:
+        shared = _get_shared() if use_shared else None
+        if shared is None:
+            return None
+        user = shared.get(SHARED_KEY.format(key=key))
+        if user is None:
+            return None
+        local.set(key, user)
+    return copy.copy(user)
+
+
+def cache_user(key, user):
+    user = copy.copy(user)
+    _get_local().set(key, user)
+    shared = _get_shared()
+    if shared is not None:
+        shared.set(
+            SHARED_KEY.format(key=key),
+            user,
+            timeout=settings.AUTH_TOKEN_SHARED_CACHE_TIMEOUT,
+        )
+
+
+def _delete_shared(keys):
+    shared = _get_shared()
+    if shared is not None and keys:
+        shared.delete_many([SHARED_KEY.format(key=key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    """Удаляет токены из кэша после фиксации транзакции: раньше
+    параллельный запрос мог бы вернуть в кэш старые данные."""
+    keys = list(keys)
+
+    def delete():
+        _get_local().delete(keys)
+        _delete_shared(keys)
+
+    transaction.on_commit(delete)
+
+
+def invalidate_users(user_ids):
+    """Удаляет из кэша все токены пользователей после фиксации
+    транзакции."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def delete():
+        _get_local().delete_users(user_ids)
+        if _get_shared() is not None:
+            _delete_shared(
+                list(
+                    Token.objects.filter(user_id__in=user_ids).values_list(
+                        'key', flat=True
+                    )
+                )
+            )
+
+    transaction.on_commit(delete)
+
+
+def clear_token_cache():
+    _get_local().clear()
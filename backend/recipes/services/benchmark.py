@@ -0,0 +1,268 @@
+"""
+Замеры производительности эндпоинтов API и функций recipes.services.
+
+Каждый сценарий выполняется несколько раз в процессе Django (без сети),
+для него сохраняются перцентили времени ответа и количество SQL-запросов.
+Результаты пишутся в JSON вместе с коммитом и размерами данных, чтобы
+сравнивать прогоны между коммитами.
+"""
+
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    User,
+)
+from recipes.services.ingredient_index import get_ingredient_index
+from recipes.services.search import search_recipes
+from recipes.services.shopping_cart import (
+    get_shopping_list_items,
+    rebuild_shopping_lists,
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга по отсортированным значениям."""
+    if not values:
+        return None
+    rank = max(0, -(-percent * len(values) // 100) - 1)
+    return values[min(rank, len(values) - 1)]
+
+
+def measure(func, iterations=20, warmup=2, cold=False):
+    """Выполняет func и возвращает сводку по времени (мс) и запросам.
+
+    cold=True очищает кэш Django перед каждым замером.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+    timings.sort()
+    summary = {
+        f'p{percent}_ms': round(percentile(timings, percent), 3)
+        for percent in PERCENTILES
+    }
+    summary.update(
+        iterations=iterations,
+        mean_ms=round(statistics.fmean(timings), 3),
+        max_ms=round(timings[-1], 3),
+        queries=max(queries),
+    )
+    return summary
+
+
+def _benchmark_user():
+    """Пользователь с наибольшей корзиной: на нем заметнее всего стоимость
+    списка покупок и подписок."""
+    user_id = (
+        ShoppingCart.objects.values('user_id')
+        .annotate(total=Count('pk'))
+        .order_by('-total', 'user_id')
+        .values_list('user_id', flat=True)
+        .first()
+    )
+    if user_id is None:
+        return User.objects.order_by('pk').first()
+    return User.objects.get(pk=user_id)
+
+
+def _client(user):
+    hosts = [
+        host for host in settings.ALLOWED_HOSTS if host and '*' not in host
+    ]
+    client = APIClient(HTTP_HOST=(hosts or ['localhost'])[0].lstrip('.'))
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def _get(client, url, **params):
+    def request():
+        response = client.get(url, params)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    return request
+
+
+def _search_word():
+    name = Recipe.objects.values_list('name', flat=True).first() or 'суп'
+    return name.split()[0]
+
+
+def build_cases(user=None):
+    """Сценарии замеров: {имя: функция без аргументов}."""
+    user = user or _benchmark_user()
+    client = _client(user)
+    recipe = (
+        Recipe.objects.order_by('-favorites_count', 'pk').first()
+        or Recipe.objects.first()
+    )
+    author = (
+        Subscription.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ).first()
+        or (recipe and recipe.author_id)
+    )
+    word = _search_word()
+    deep_page = max(1, Recipe.objects.count() // 6 // 2)
+
+    cases = {
+        'api.recipes.list': _get(client, reverse('recipes-list')),
+        'api.recipes.list_deep_page': _get(
+            client, reverse('recipes-list'), page=deep_page
+        ),
+        'api.recipes.list_cursor': _get(
+            client, reverse('recipes-list'), cursor='', count='false'
+        ),
+        'api.recipes.list_favorited': _get(
+            client, reverse('recipes-list'), is_favorited=1
+        ),
+        'api.recipes.list_author': _get(
+            client, reverse('recipes-list'), author=author
+        ),
+        'api.recipes.search': _get(
+            client, reverse('recipes-list'), search=word
+        ),
+        'api.users.subscriptions': _get(
+            client, reverse('users-subscriptions'), recipes_limit=3
+        ),
+        'api.users.me': _get(client, reverse('users-me')),
+        'api.recipes.download_shopping_cart': _get(
+            client, reverse('recipes-download-shopping-cart')
+        ),
+        'api.ingredients.autocomplete': _get(
+            client, reverse('ingredients-list'), name=word[:2]
+        ),
+        'services.shopping_cart.get_shopping_list_items': lambda: list(
+            get_shopping_list_items(user)
+        ),
+        'services.shopping_cart.rebuild_shopping_lists': lambda: (
+            rebuild_shopping_lists([user.pk])
+        ),
+        'services.search.search_recipes': lambda: list(
+            search_recipes(Recipe.objects.all(), word)[:20]
+        ),
+    }
+    if recipe is not None:
+        cases['api.recipes.detail'] = _get(
+            client, reverse('recipes-detail', args=[recipe.pk])
+        )
+    # Индекс отключается пустым INGREDIENT_INDEX_PATH
+    if get_ingredient_index() is not None:
+        cases['services.ingredient_index.search'] = lambda: (
+            get_ingredient_index().search(word[:2], 50)
+        )
+    return cases
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmark(cases, iterations=20, warmup=2, cold=False, progress=None):
+    """Прогоняет сценарии и возвращает отчет для сохранения в JSON."""
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, iterations, warmup, cold)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'commit': _git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'cold_cache': cold,
+        'dataset': {
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'favorites': Favorite.objects.count(),
+            'shopping_carts': ShoppingCart.objects.count(),
+            'subscriptions': Subscription.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def save_report(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    return path
+
+
+def load_report(path):
+    return json.loads(Path(path).read_text())
+
+
+def compare_reports(baseline, current, max_regression=20.0):
+    """Сравнивает отчеты по p95 и количеству запросов.
+
+    Возвращает строки сравнения и список регрессий: p95 вырос больше
+    чем на max_regression процентов или выросло число запросов.
+    """
+    rows = []
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            rows.append(
+                (name, None, result['p95_ms'], None, result['queries'])
+            )
+            continue
+        change = (
+            (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+            if before['p95_ms']
+            else 0.0
+        )
+        rows.append(
+            (
+                name,
+                before['p95_ms'],
+                result['p95_ms'],
+                round(change, 1),
+                result['queries'] - before['queries'],
+            )
+        )
+        if change > max_regression or result['queries'] > before['queries']:
+            regressions.append(name)
+    return rows, regressions
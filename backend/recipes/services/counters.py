@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription, User
+from recipes.services.auth_cache import invalidate_users
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик на delta выражением F() без чтения строки.
+
+    Вызывается в той же транзакции, что и запись связанного объекта.
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+    if model is User:
+        # update() не вызывает post_save, а кэш аутентификации хранит
+        # пользователя с прежними счетчиками
+        invalidate_users([pk])
+
+
+def _count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+# Счетчик -> (модель, поле, из которого он считается)
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'shopping_cart_count': (ShoppingCart, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Subscription, 'author'),
+}
+
+
+def _recount(model, counters, batch_size):
+    updated = 0
+    values = {
+        field: _count_of(source, source_field)
+        for field, (source, source_field) in counters.items()
+    }
+    last_pk = 0
+    while True:
+        pks = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return updated
+        with transaction.atomic():
+            updated += model.objects.filter(pk__in=pks).update(**values)
+        last_pk = pks[-1]
+
+
+def recount_counters(batch_size=1000):
+    """Пересчитывает все денормализованные счетчики по исходным таблицам.
+
+    Исправляет расхождения после каскадных удалений и правок в обход API.
+    Возвращает количество обновленных рецептов и пользователей.
+    """
+    return (
+        _recount(Recipe, RECIPE_COUNTERS, batch_size),
+        _recount(User, USER_COUNTERS, batch_size),
+    )
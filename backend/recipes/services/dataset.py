@@ -0,0 +1,304 @@
+"""
+Генерация синтетического набора данных для нагрузочного тестирования.
+
+Данные воспроизводимы: при одинаковых размерах, seed и исходном
+содержимом справочников получается одинаковая структура связей.
+Все строки вставляются пачками через bulk_create, производные данные
+(счетчики, списки покупок, поисковый индекс) пересчитываются в конце.
+"""
+
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    MeasurementUnit,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscription,
+    Tag,
+    User,
+)
+from recipes.services.counters import recount_counters
+from recipes.services.feed import rebuild_feeds
+from recipes.services.ingredient_index import rebuild_ingredient_index
+from recipes.services.search import update_search_index
+from recipes.services.shopping_cart import rebuild_shopping_lists
+
+DEFAULT_PASSWORD = 'benchmark'
+SYNTHETIC_UNITS = 10
+SYNTHETIC_INGREDIENTS = 1000
+SYNTHETIC_TAGS = 8
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'запеканка', 'рагу', 'паста', 'соус',
+    'курица', 'говядина', 'рыба', 'грибы', 'сыр', 'томаты', 'картофель',
+    'рис', 'гречка', 'тыква', 'яблоки', 'ягоды', 'шоколад', 'творог',
+)
+
+
+def _skewed_index(rng, size):
+    """Индекс с перекосом к началу: первые объекты популярнее."""
+    return int(size * rng.random() ** 2)
+
+
+def _sample(rng, size, count, exclude=None):
+    """count различных индексов из range(size) с перекосом к началу."""
+    count = min(count, size - (exclude is not None))
+    if count * 2 > size:
+        population = [index for index in range(size) if index != exclude]
+        return set(rng.sample(population, count))
+    chosen = set()
+    while len(chosen) < count:
+        index = _skewed_index(rng, size)
+        if index != exclude:
+            chosen.add(index)
+    return chosen
+
+
+def _per_user(total, users_count, position):
+    """Доля total, приходящаяся на пользователя с номером position."""
+    return total // users_count + (position < total % users_count)
+
+
+def _last_pk(model):
+    return (
+        model.objects.order_by('-pk').values_list('pk', flat=True).first()
+        or 0
+    )
+
+
+def _new_pks(model, after):
+    return list(
+        model.objects.filter(pk__gt=after)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def _ensure_catalog(rng):
+    """Теги и ингредиенты: существующие или синтетические, если
+    справочники пусты."""
+    if not Tag.objects.exists():
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag-{number}')
+            for number in range(SYNTHETIC_TAGS)
+        )
+    if not Ingredient.objects.exists():
+        if not MeasurementUnit.objects.exists():
+            MeasurementUnit.objects.bulk_create(
+                MeasurementUnit(name=f'ед{number}')
+                for number in range(SYNTHETIC_UNITS)
+            )
+        unit_ids = list(
+            MeasurementUnit.objects.order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'{rng.choice(WORDS)} {number}',
+                measurement_unit_id=rng.choice(unit_ids),
+            )
+            for number in range(SYNTHETIC_INGREDIENTS)
+        )
+        transaction.on_commit(rebuild_ingredient_index)
+    return (
+        list(Tag.objects.order_by('pk').values_list('pk', flat=True)),
+        list(
+            Ingredient.objects.order_by('pk').values_list(
+                'pk', 'measurement_unit_id'
+            )
+        ),
+    )
+
+
+class DatasetGenerator:
+    """Генератор набора данных заданного размера.
+
+    progress(stage, done, total) вызывается после каждой пачки.
+    """
+
+    def __init__(
+        self,
+        users=1000,
+        recipes=10000,
+        favorites=100000,
+        shopping_carts=10000,
+        subscriptions=20000,
+        ingredients_per_recipe=8,
+        tags_per_recipe=2,
+        seed=0,
+        prefix='bench',
+        batch_size=5000,
+        update_search=True,
+        progress=None,
+    ):
+        self.sizes = {
+            'users': users,
+            'recipes': recipes,
+            'favorites': favorites,
+            'shopping_carts': shopping_carts,
+            'subscriptions': subscriptions,
+        }
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.tags_per_recipe = tags_per_recipe
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.update_search = update_search
+        self.progress = progress or (lambda stage, done, total: None)
+        self.user_ids = []
+        self.recipe_ids = []
+
+    def generate(self):
+        if not self.sizes['users']:
+            return self.sizes
+        # Отдельный генератор для справочников: связи не должны зависеть
+        # от того, создавались ли справочники в этом запуске
+        with transaction.atomic():
+            self.tag_ids, self.ingredients = _ensure_catalog(
+                random.Random(self.seed)
+            )
+        self._create_users()
+        self._create_recipes()
+        self._create_user_relations(
+            Favorite, 'recipe_id', 'favorites', self.recipe_ids
+        )
+        self._create_user_relations(
+            ShoppingCart, 'recipe_id', 'shopping_carts', self.recipe_ids
+        )
+        self._create_user_relations(
+            Subscription, 'author_id', 'subscriptions', self.user_ids
+        )
+        self._update_derived_data()
+        return self.sizes
+
+    def _batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(start + self.batch_size, total)
+
+    def _create_users(self):
+        # Хэш пароля считается один раз: PBKDF2 для каждого пользователя
+        # занял бы больше времени, чем вся остальная генерация
+        password = make_password(DEFAULT_PASSWORD)
+        total = self.sizes['users']
+        after = self.users_after = _last_pk(User)
+        for start, end in self._batches(total):
+            User.objects.bulk_create(
+                User(
+                    username=f'{self.prefix}{number}',
+                    email=f'{self.prefix}{number}@example.com',
+                    first_name='Benchmark',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(start, end)
+            )
+            self.progress('users', end, total)
+        self.user_ids = _new_pks(User, after)
+
+    def _create_recipes(self):
+        total = self.sizes['recipes']
+        rng = self.rng
+        for start, end in self._batches(total):
+            after = _last_pk(Recipe)
+            with transaction.atomic():
+                Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=self.user_ids[
+                            _skewed_index(rng, len(self.user_ids))
+                        ],
+                        name=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                        text=' '.join(rng.choices(WORDS, k=40)),
+                        cooking_time=rng.randint(5, 180),
+                    )
+                    for _ in range(start, end)
+                )
+                recipe_ids = _new_pks(Recipe, after)
+                self._create_recipe_relations(recipe_ids)
+                if self.update_search:
+                    update_search_index(recipe_ids)
+            self.recipe_ids.extend(recipe_ids)
+            self.progress('recipes', end, total)
+
+    def _create_recipe_relations(self, recipe_ids):
+        rng = self.rng
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe_id in recipe_ids:
+            recipe_tags.extend(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in rng.sample(
+                    self.tag_ids, min(self.tags_per_recipe, len(self.tag_ids))
+                )
+            )
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    measurement_unit_id=unit_id,
+                    amount=rng.randint(1, 500),
+                )
+                for ingredient_id, unit_id in rng.sample(
+                    self.ingredients,
+                    min(self.ingredients_per_recipe, len(self.ingredients)),
+                )
+            )
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+    def _create_user_relations(self, model, target_field, stage, targets):
+        """Связи пользователь -> объект без повторов у одного пользователя,
+        популярность объектов неравномерная."""
+        total = self.sizes[stage]
+        users_count = len(self.user_ids)
+        rows = []
+        done = 0
+        for position, user_id in enumerate(self.user_ids):
+            count = _per_user(total, users_count, position)
+            exclude = position if model is Subscription else None
+            rows.extend(
+                model(user_id=user_id, **{target_field: targets[index]})
+                for index in sorted(
+                    _sample(self.rng, len(targets), count, exclude)
+                )
+            )
+            if len(rows) >= self.batch_size:
+                model.objects.bulk_create(rows)
+                done += len(rows)
+                rows = []
+                self.progress(stage, done, total)
+        if rows:
+            model.objects.bulk_create(rows)
+            done += len(rows)
+            self.progress(stage, done, total)
+        self.sizes[stage] = done
+
+    def _update_derived_data(self):
+        recount_counters(self.batch_size)
+        self.progress('counters', 1, 1)
+        cart_user_ids = sorted(
+            set(
+                ShoppingCart.objects.filter(
+                    user_id__gt=self.users_after
+                ).values_list('user_id', flat=True)
+            )
+        )
+        for start, end in self._batches(len(cart_user_ids)):
+            rebuild_shopping_lists(cart_user_ids[start:end])
+            self.progress('shopping_lists', end, len(cart_user_ids))
+        subscriber_ids = sorted(
+            set(
+                Subscription.objects.filter(
+                    user_id__gt=self.users_after
+                ).values_list('user_id', flat=True)
+            )
+        )
+        for start, end in self._batches(len(subscriber_ids)):
+            rebuild_feeds(subscriber_ids[start:end])
+            self.progress('feeds', end, len(subscriber_ids))
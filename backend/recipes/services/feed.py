@@ -0,0 +1,132 @@
+"""
+Лента подписок с разветвлением при записи (fan-out on write).
+
+Для каждого подписчика автора хранится FeedEntry на каждый рецепт, поэтому
+лента читается одним запросом по индексу (user, recipe), а не выборкой
+рецептов всех авторов подписок с сортировкой.
+
+* публикация рецепта — записи для всех подписчиков автора: до
+  FEED_SYNC_FANOUT_LIMIT подписчиков в транзакции публикации, больше —
+  пулом потоков после фиксации, чтобы не задерживать ответ;
+* подписка — последние FEED_BACKFILL_LIMIT рецептов автора;
+* отписка — удаление записей автора из ленты;
+* удаление рецепта — каскадом по внешнему ключу.
+
+Задачи пула теряются при остановке процесса; команда rebuild_feeds
+пересобирает ленты из подписок.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from recipes.models import FeedEntry, Recipe, Subscription, User
+
+logger = logging.getLogger(__name__)
+
+
+def fan_out_recipe(recipe_id, author_id):
+    """Добавляет рецепт в ленты всех подписчиков автора пачками по
+    FEED_FANOUT_BATCH_SIZE."""
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    last_pk = 0
+    while True:
+        rows = list(
+            Subscription.objects.filter(author_id=author_id, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'user_id')[:batch_size]
+        )
+        if not rows:
+            return
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, author_id=author_id
+                )
+                for _, user_id in rows
+            ],
+            ignore_conflicts=True,
+        )
+        last_pk = rows[-1][0]
+
+
+def _fan_out_in_worker(recipe_id, author_id):
+    try:
+        fan_out_recipe(recipe_id, author_id)
+    except Exception:
+        logger.exception('Ошибка рассылки рецепта %s в ленты', recipe_id)
+    finally:
+        # Соединения потока пула не закрываются обработчиком конца запроса
+        connections.close_all()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_FANOUT_WORKERS,
+                thread_name_prefix='feed',
+            )
+        return _executor
+
+
+def publish_to_feeds(recipe):
+    """Рассылает новый рецепт подписчикам автора. Вызывается в транзакции
+    создания рецепта."""
+    # recipe.author может быть копией из кэша аутентификации
+    followers = User.objects.values_list('followers_count', flat=True).get(
+        pk=recipe.author_id
+    )
+    if not followers:
+        return
+    if (
+        followers <= settings.FEED_SYNC_FANOUT_LIMIT
+        or not settings.FEED_FANOUT_WORKERS
+    ):
+        fan_out_recipe(recipe.pk, recipe.author_id)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(
+            _fan_out_in_worker, recipe.pk, recipe.author_id
+        )
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту пользователя последние рецепты автора, на
+    которого он подписался."""
+    recipe_ids = (
+        Recipe.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', flat=True)[:settings.FEED_BACKFILL_LIMIT]
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id in recipe_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild_feeds(user_ids):
+    """Пересобирает ленты пользователей по их текущим подпискам."""
+    FeedEntry.objects.filter(user_id__in=user_ids).delete()
+    subscriptions = Subscription.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions:
+        backfill_feed(user_id, author_id)
@@ -0,0 +1,236 @@
+"""
+Обработка загруженных изображений вне запроса.
+
+В запросе оригинал только сохраняется в хранилище, а после фиксации
+транзакции пул потоков строит уменьшенные копии в WebP и JPEG и крошечную
+размытую заглушку (data URI), которую клиент показывает до загрузки
+картинки. Результат записывается в Recipe.image_variants и
+User.avatar_variants:
+
+    {
+        'source': имя оригинала в хранилище,
+        'width': ширина оригинала, 'height': высота оригинала,
+        'placeholder': 'data:image/webp;base64,...',
+        'files': {'webp': {'320': имя файла, ...}, 'jpeg': {...}},
+    }
+
+Задачи пула теряются при остановке процесса; команда process_images
+достраивает варианты для изображений, которые остались без них.
+"""
+
+import base64
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps
+
+from recipes.models import Recipe, User
+from recipes.services.auth_cache import invalidate_users
+
+logger = logging.getLogger(__name__)
+
+# Форматы, которые принимаются при загрузке, и расширения их файлов
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+# Сигнатуры форматов в начале файла: (смещение, байты)
+IMAGE_SIGNATURES = {
+    'JPEG': ((0, b'\xff\xd8\xff'),),
+    'PNG': ((0, b'\x89PNG\r\n\x1a\n'),),
+    'WEBP': ((0, b'RIFF'), (8, b'WEBP')),
+    'GIF': ((0, b'GIF8'),),
+}
+# Сколько байт начала файла нужно detect_image_format
+SIGNATURE_LENGTH = 12
+# Формат варианта -> (формат Pillow, параметры сохранения)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+PLACEHOLDER_WIDTH = 16
+# Модель -> (поле изображения, поле вариантов, настройка с ширинами)
+IMAGE_FIELDS = {
+    Recipe: ('image', 'image_variants', 'RECIPE_IMAGE_WIDTHS'),
+    User: ('avatar', 'avatar_variants', 'AVATAR_IMAGE_WIDTHS'),
+}
+
+
+def detect_image_format(head):
+    """Формат изображения по первым SIGNATURE_LENGTH байтам файла или
+    None, если это не поддерживаемое изображение."""
+    for image_format, signature in IMAGE_SIGNATURES.items():
+        if all(
+            head[offset:offset + len(magic)] == magic
+            for offset, magic in signature
+        ):
+            return image_format
+    return None
+
+
+def _flatten(image):
+    """RGB без прозрачности: JPEG не поддерживает альфа-канал."""
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, variant_format):
+    pil_format, options = VARIANT_FORMATS[variant_format]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _resize(image, width):
+    if width >= image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def make_placeholder(image):
+    """Крошечная размытая копия изображения в виде data URI."""
+    small = _resize(image, PLACEHOLDER_WIDTH).filter(
+        ImageFilter.GaussianBlur(1)
+    )
+    data = base64.b64encode(_encode(small, 'webp')).decode()
+    return f'data:image/webp;base64,{data}'
+
+
+def build_variants(storage, name, widths):
+    """Строит и сохраняет варианты изображения name из хранилища."""
+    with storage.open(name, 'rb') as file:
+        with Image.open(file) as original:
+            image = _flatten(ImageOps.exif_transpose(original))
+
+    path = PurePosixPath(name)
+    directory = path.parent / 'variants'
+    # Ширины больше оригинала не нужны: копия была бы не четче его
+    targets = sorted({min(width, image.width) for width in widths})
+    files = {variant_format: {} for variant_format in VARIANT_FORMATS}
+    # Каждая копия уменьшается из предыдущей, большей: так быстрее, чем
+    # каждый раз из оригинала
+    resized = image
+    for width in reversed(targets):
+        resized = _resize(resized, width)
+        for variant_format in VARIANT_FORMATS:
+            files[variant_format][str(width)] = storage.save(
+                f'{directory}/{path.stem}_{width}.{variant_format}',
+                ContentFile(_encode(resized, variant_format)),
+            )
+    return {
+        'source': name,
+        'width': image.width,
+        'height': image.height,
+        'placeholder': make_placeholder(resized),
+        'files': files,
+    }
+
+
+def delete_variants(storage, variants):
+    for names in variants.get('files', {}).values():
+        for name in names.values():
+            storage.delete(name)
+
+
+def process_image(model, pk, name, force=False):
+    """Строит варианты изображения объекта model с ключом pk.
+
+    Ничего не делает, если изображение уже заменено другим (name
+    устарело) или варианты для него уже построены и force не задан.
+    """
+    image_field, variants_field, widths_setting = IMAGE_FIELDS[model]
+    row = (
+        model.objects.filter(pk=pk)
+        .values(image_field, variants_field)
+        .first()
+    )
+    if row is None or row[image_field] != name:
+        return False
+    previous = row[variants_field] or {}
+    if previous.get('source') == name and not force:
+        return False
+
+    storage = model._meta.get_field(image_field).storage
+    try:
+        variants = build_variants(
+            storage, name, getattr(settings, widths_setting)
+        )
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning('Не удалось обработать изображение %s: %s', name, error)
+        variants = {'source': name, 'error': str(error)}
+
+    updated = model.objects.filter(pk=pk, **{image_field: name}).update(
+        **{variants_field: variants, 'updated_at': timezone.now()}
+    )
+    if updated and model is User:
+        invalidate_users([pk])
+    # Удаляются файлы, которые больше не упоминаются в базе
+    delete_variants(storage, previous if updated else variants)
+    return bool(updated)
+
+
+def _process_in_worker(model, pk, name):
+    try:
+        process_image(model, pk, name)
+    except Exception:
+        logger.exception('Ошибка обработки изображения %s', name)
+    finally:
+        # Соединения потока пула не закрываются обработчиком конца запроса
+        connections.close_all()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='images',
+            )
+        return _executor
+
+
+def schedule_image_processing(instance):
+    """Ставит обработку изображения объекта в очередь пула после фиксации
+    транзакции. При IMAGE_PROCESSING_WORKERS = 0 обработка выполняется
+    сразу в текущем потоке."""
+    model = instance._meta.concrete_model
+    name = getattr(instance, IMAGE_FIELDS[model][0]).name
+    if not name:
+        return
+
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            _get_executor().submit(_process_in_worker, model, instance.pk, name)
+        else:
+            process_image(model, instance.pk, name)
+
+    transaction.on_commit(submit)
+
+
+def clear_image_variants(instance):
+    """Удаляет варианты изображения объекта, например вместе с аватаром."""
+    model = instance._meta.concrete_model
+    image_field, variants_field, _ = IMAGE_FIELDS[model]
+    variants = getattr(instance, variants_field)
+    if not variants:
+        return
+    setattr(instance, variants_field, {})
+    model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+    if model is User:
+        invalidate_users([instance.pk])
+    storage = model._meta.get_field(image_field).storage
+    transaction.on_commit(lambda: delete_variants(storage, variants))
@@ -0,0 +1,165 @@
+"""
+Потоковый импорт каталога ингредиентов.
+
+Строки файла ({'name': ..., 'measurement_unit': ...}) читаются по одной
+и обрабатываются пачками, поэтому память не растет с размером каталога.
+Есть два способа записи:
+
+* batch — для каждой пачки существующие пары (название, единица)
+  выбираются из базы запросами name__in, новые вставляются bulk_create;
+* copy — только PostgreSQL: пачки передаются через COPY во временную
+  таблицу, затем единицы и ингредиенты добавляются двумя запросами
+  INSERT ... SELECT ... ON CONFLICT DO NOTHING, дубликаты отбрасывает
+  уникальный индекс.
+
+Режим auto выбирает copy для PostgreSQL и batch для остальных баз.
+"""
+
+import csv
+import io
+
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, MeasurementUnit
+from recipes.services.utils import batched
+
+MODES = ('auto', 'copy', 'batch')
+DEFAULT_BATCH_SIZE = 5000
+# Размер пачки для фильтров name__in: SQLite ограничивает число
+# параметров запроса
+LOOKUP_BATCH_SIZE = 500
+STAGING_TABLE = 'ingredient_import'
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.units = 0
+        self.ingredients = 0
+
+
+def _clean(rows):
+    """Пары (название, единица) без пробелов по краям и пустых строк."""
+    for row in rows:
+        name = (row.get('name') or '').strip()
+        unit = (row.get('measurement_unit') or '').strip()
+        if name and unit:
+            yield name, unit
+
+
+def _unit_ids(names, known):
+    """Дополняет словарь known {название: id} единицами из names,
+    создавая отсутствующие."""
+    missing = sorted(set(names) - known.keys())
+    if not missing:
+        return
+    known.update(
+        MeasurementUnit.objects.filter(name__in=missing).values_list(
+            'name', 'id'
+        )
+    )
+    new = [name for name in missing if name not in known]
+    MeasurementUnit.objects.bulk_create(
+        [MeasurementUnit(name=name) for name in new], ignore_conflicts=True
+    )
+    known.update(
+        MeasurementUnit.objects.filter(name__in=new).values_list('name', 'id')
+    )
+
+
+def _existing_pairs(pairs):
+    names = sorted({name for name, _ in pairs})
+    existing = set()
+    for batch in batched(names, LOOKUP_BATCH_SIZE):
+        existing.update(
+            Ingredient.objects.filter(name__in=batch).values_list(
+                'name', 'measurement_unit_id'
+            )
+        )
+    return existing
+
+
+def _import_batches(rows, batch_size, result, progress):
+    # bulk_create(ignore_conflicts=True) не сообщает, сколько строк
+    # вставлено: созданные считаются по числу строк до и после загрузки
+    units_before = MeasurementUnit.objects.count()
+    ingredients_before = Ingredient.objects.count()
+    units = {}
+    for batch in batched(_clean(rows), batch_size):
+        result.rows += len(batch)
+        _unit_ids((unit for _, unit in batch), units)
+        # dict сохраняет порядок и убирает повторы внутри пачки
+        pairs = dict.fromkeys((name, units[unit]) for name, unit in batch)
+        existing = _existing_pairs(pairs)
+        new = [pair for pair in pairs if pair not in existing]
+        # ignore_conflicts защищает от параллельной загрузки тех же строк
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit_id=unit_id)
+                for name, unit_id in new
+            ],
+            ignore_conflicts=True,
+        )
+        progress(result)
+    result.units = MeasurementUnit.objects.count() - units_before
+    result.ingredients = Ingredient.objects.count() - ingredients_before
+
+
+def _import_copy(rows, batch_size, result, progress):
+    quote = connection.ops.quote_name
+    ingredients = quote(Ingredient._meta.db_table)
+    units = quote(MeasurementUnit._meta.db_table)
+    staging = quote(STAGING_TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {staging} '
+            '(name varchar(128), unit varchar(64)) ON COMMIT DROP'
+        )
+        for batch in batched(_clean(rows), batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {staging} (name, unit) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            result.rows += len(batch)
+            progress(result)
+        cursor.execute(
+            f'INSERT INTO {units} (name) '
+            f'SELECT DISTINCT unit FROM {staging} '
+            'ON CONFLICT (name) DO NOTHING'
+        )
+        result.units = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {ingredients} (name, measurement_unit_id) '
+            f'SELECT DISTINCT s.name, u.id FROM {staging} s '
+            f'JOIN {units} u ON u.name = s.unit '
+            'ON CONFLICT (name, measurement_unit_id) DO NOTHING'
+        )
+        result.ingredients = cursor.rowcount
+        # ON COMMIT DROP сработает только в конце внешней транзакции
+        cursor.execute(f'DROP TABLE {staging}')
+
+
+def import_ingredients(
+    rows, mode='auto', batch_size=DEFAULT_BATCH_SIZE, progress=None
+):
+    """Импортирует ингредиенты из итерируемого rows в одной транзакции.
+
+    progress(result) вызывается после каждой пачки. Возвращает
+    ImportResult с числом прочитанных строк и созданных единиц и
+    ингредиентов.
+    """
+    if mode not in MODES:
+        raise ValueError(f'Неизвестный режим импорта: {mode}')
+    if mode == 'auto':
+        mode = 'copy' if connection.vendor == 'postgresql' else 'batch'
+    if mode == 'copy' and connection.vendor != 'postgresql':
+        raise ValueError('Режим copy доступен только для PostgreSQL.')
+
+    result = ImportResult()
+    load = _import_copy if mode == 'copy' else _import_batches
+    with transaction.atomic():
+        load(rows, batch_size, result, progress or (lambda result: None))
+    return result
@@ -0,0 +1,173 @@
+"""
+Префиксный индекс названий ингредиентов для автодополнения.
+
+Индекс хранится в файле и отображается в память (mmap) только для чтения,
+поэтому все воркеры gunicorn на одном хосте делят одни и те же страницы
+кэша ОС. Формат файла (little-endian):
+
+    заголовок:  MAGIC, версия формата, количество записей
+    смещения:   uint32 на каждую запись, относительно начала данных
+    данные:     записи "ключ\\0id\\0название\\0единица\\0",
+                отсортированные по ключу (название в нижнем регистре)
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+MAGIC = b'FGII'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sII')
+_OFFSET = struct.Struct('<I')
+_SEPARATOR = b'\0'
+
+
+def _normalize(value):
+    return value.strip().lower()
+
+
+def _file_version(stat_result):
+    return stat_result.st_ino, stat_result.st_mtime_ns
+
+
+class IngredientPrefixIndex:
+    """Отсортированный массив названий ингредиентов в отображенном файле."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.version = _file_version(os.fstat(f.fileno()))
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f'Некорректный файл индекса: {self.path}')
+        self._offsets = memoryview(self._mm)[
+            _HEADER.size:_HEADER.size + self.count * _OFFSET.size
+        ].cast('I')
+        self._data_start = _HEADER.size + self.count * _OFFSET.size
+
+    def _key_at(self, position):
+        start = self._data_start + self._offsets[position]
+        return self._mm[start:self._mm.find(_SEPARATOR, start)]
+
+    def _record_at(self, position):
+        start = self._data_start + self._offsets[position]
+        fields = []
+        for _ in range(4):
+            end = self._mm.find(_SEPARATOR, start)
+            fields.append(self._mm[start:end])
+            start = end + 1
+        _, pk, name, unit = fields
+        return {
+            'id': int(pk),
+            'name': name.decode('utf-8'),
+            'measurement_unit': unit.decode('utf-8'),
+        }
+
+    def _lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, prefix, limit):
+        """Ингредиенты, название которых начинается с prefix (без учета
+        регистра), в алфавитном порядке, не более limit штук."""
+        key = _normalize(prefix).encode('utf-8')
+        results = []
+        position = self._lower_bound(key)
+        while position < self.count and len(results) < limit:
+            if not self._key_at(position).startswith(key):
+                break
+            results.append(self._record_at(position))
+            position += 1
+        return results
+
+
+def build_ingredient_index(path=None):
+    """Строит файл индекса из таблицы Ingredient и атомарно подменяет им
+    предыдущий, чтобы читающие воркеры не увидели частично записанный файл.
+    """
+    path = Path(path or settings.INGREDIENT_INDEX_PATH)
+    records = sorted(
+        (
+            _normalize(name).encode('utf-8'),
+            pk,
+            name.encode('utf-8'),
+            unit.encode('utf-8'),
+        )
+        for pk, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit__name'
+        ).iterator()
+    )
+    offsets = bytearray()
+    data = bytearray()
+    for key, pk, name, unit in records:
+        offsets += _OFFSET.pack(len(data))
+        data += _SEPARATOR.join((key, str(pk).encode(), name, unit))
+        data += _SEPARATOR
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(records)))
+            f.write(offsets)
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(records)
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_ingredient_index():
+    """Возвращает индекс текущего процесса.
+
+    Индекс переоткрывается, если файл был перестроен другим процессом,
+    и строится, если файла еще нет. Возвращает None, если индекс отключен.
+    """
+    global _index
+    path = settings.INGREDIENT_INDEX_PATH
+    if not path:
+        return None
+    try:
+        version = _file_version(os.stat(path))
+    except FileNotFoundError:
+        version = None
+    index = _index
+    if (
+        index is not None
+        and index.path == Path(path)
+        and index.version == version
+    ):
+        return index
+    with _lock:
+        if version is None:
+            build_ingredient_index(path)
+        # Старый mmap освобождается сборщиком мусора, когда его перестанут
+        # использовать потоки, которые еще обрабатывают запросы.
+        _index = IngredientPrefixIndex(path)
+        return _index
+
+
+def rebuild_ingredient_index():
+    """Перестраивает индекс после изменения справочника ингредиентов."""
+    if settings.INGREDIENT_INDEX_PATH:
+        build_ingredient_index(settings.INGREDIENT_INDEX_PATH)
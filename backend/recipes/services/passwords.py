@@ -0,0 +1,58 @@
+"""
+Хэширование паролей при массовом импорте пользователей.
+
+PBKDF2 намеренно медленный, поэтому хэши считаются в пуле процессов на
+всех ядрах: в потоках вычисление упиралось бы в GIL.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+
+# Сколько паролей уходит в процесс пула за раз
+CHUNK_SIZE = 16
+
+
+def _init_worker():
+    # При запуске процессов через spawn Django в них еще не настроен
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None, progress=None):
+    """Возвращает список хэшей для паролей в том же порядке. Вызывается
+    вне транзакции: пул занимает процессор надолго.
+
+    workers — число процессов, по умолчанию число ядер; при workers <= 1
+    хэши считаются в текущем процессе. progress(done, total) вызывается
+    после каждой пачки.
+    """
+    passwords = list(passwords)
+    total = len(passwords)
+    progress = progress or (lambda done, total: None)
+    workers = min(workers or os.cpu_count() or 1, -(-total // CHUNK_SIZE))
+
+    hashes = []
+
+    def collect(results):
+        for password_hash in results:
+            hashes.append(password_hash)
+            if len(hashes) % CHUNK_SIZE == 0:
+                progress(len(hashes), total)
+
+    if workers <= 1:
+        collect(map(make_password, passwords))
+    else:
+        # Процессы пула, запущенные через fork, не должны наследовать
+        # открытые соединения с базой. Внутри транзакции соединение
+        # закрыть нельзя, поэтому хэши считаются до нее
+        if not connection.in_atomic_block:
+            connections.close_all()
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            collect(pool.map(make_password, passwords, chunksize=CHUNK_SIZE))
+    if total % CHUNK_SIZE:
+        progress(total, total)
+    return hashes
@@ -0,0 +1,102 @@
+"""
+Общий кэш сериализованных фрагментов рецептов.
+
+Фрагмент — часть ответа с рецептом, одинаковая для всех пользователей:
+теги, автор, ингредиенты, описание. Поля, зависящие от текущего
+пользователя, накладываются на фрагмент при каждом запросе.
+
+Запись кэша хранит версию рецепта (updated_at рецепта и автора и версию
+справочников тегов и ингредиентов из базы), поэтому устаревший фрагмент
+не будет отдан даже без явной инвалидации и даже если у каждого процесса
+свой кэш.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+FRAGMENT_KEY = 'recipe-fragment:{pk}'
+
+
+def fragment_version(updated_at, author_updated_at, catalog_version):
+    return (
+        updated_at.isoformat(),
+        author_updated_at.isoformat(),
+        catalog_version,
+    )
+
+
+def _key(pk):
+    return FRAGMENT_KEY.format(pk=pk)
+
+
+def _split_cached(versions, keys, cached):
+    """Актуальные фрагменты из кэша и id рецептов, которых там нет."""
+    fragments = {}
+    missing = []
+    for pk, version in versions.items():
+        entry = cached.get(keys[pk])
+        if entry is not None and entry['version'] == version:
+            fragments[pk] = entry['data']
+        else:
+            missing.append(pk)
+    return fragments, missing
+
+
+def _cache_entries(rendered):
+    return {
+        _key(pk): {'version': version, 'data': data}
+        for pk, (version, data) in rendered.items()
+    }
+
+
+def get_recipe_fragments(versions, render):
+    """Возвращает словарь {id рецепта: фрагмент}.
+
+    versions — словарь {id рецепта: версия} для запрошенных рецептов;
+    render(ids) сериализует рецепты, которых нет в кэше или версия
+    которых устарела, и возвращает словарь {id: (версия, фрагмент)}.
+    """
+    keys = {pk: _key(pk) for pk in versions}
+    fragments, missing = _split_cached(
+        versions, keys, cache.get_many(keys.values())
+    )
+    if missing:
+        rendered = render(missing)
+        cache.set_many(
+            _cache_entries(rendered),
+            timeout=settings.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+        )
+        fragments.update(
+            (pk, data) for pk, (version, data) in rendered.items()
+        )
+    return fragments
+
+
+async def aget_recipe_fragments(versions, render):
+    """Асинхронный вариант get_recipe_fragments; render — корутина."""
+    keys = {pk: _key(pk) for pk in versions}
+    fragments, missing = _split_cached(
+        versions, keys, await cache.aget_many(keys.values())
+    )
+    if missing:
+        rendered = await render(missing)
+        await cache.aset_many(
+            _cache_entries(rendered),
+            timeout=settings.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+        )
+        fragments.update(
+            (pk, data) for pk, (version, data) in rendered.items()
+        )
+    return fragments
+
+
+def invalidate_recipe_fragments(recipe_ids):
+    """Удаляет фрагменты рецептов после фиксации транзакции."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    transaction.on_commit(
+        lambda: cache.delete_many([_key(pk) for pk in recipe_ids])
+    )
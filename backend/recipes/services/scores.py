@@ -0,0 +1,119 @@
+"""
+Рейтинги рецептов с затуханием: Recipe.popularity_score и trending_score.
+
+Каждое добавление в избранное или корзину дает вклад weight, который
+убывает вдвое за период полураспада (RECIPE_POPULAR_HALF_LIFE для
+популярности, RECIPE_TRENDING_HALF_LIFE для тренда). Вместо уменьшения
+всех рейтингов со временем хранится вклад, приведенный к будущему
+(forward decay):
+
+    weight * 2 ** ((created_at - RECIPE_SCORE_EPOCH) / half_life)
+
+У всех рецептов множитель затухания на текущий момент один и тот же,
+поэтому порядок по хранимому значению совпадает с порядком по
+затухающему рейтингу, а новые события только прибавляются к рейтингу
+своего рецепта. Сортировка ?ordering=popular|trending читает индекс.
+
+refresh_scores обрабатывает строки избранного и корзины после позиции из
+ScoreCheckpoint. Удаление из избранного и корзины учитывается только
+полным пересчетом (full=True).
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ScoreCheckpoint, ShoppingCart
+
+# Источник -> модель; веса в settings.RECIPE_SCORE_WEIGHTS
+SOURCES = {'favorite': Favorite, 'shopping_cart': ShoppingCart}
+# Поле рейтинга -> настройка с периодом полураспада
+SCORE_FIELDS = {
+    'popularity_score': 'RECIPE_POPULAR_HALF_LIFE',
+    'trending_score': 'RECIPE_TRENDING_HALF_LIFE',
+}
+
+
+def event_score(created_at, weight, half_life):
+    age = (created_at - settings.RECIPE_SCORE_EPOCH) / half_life
+    return weight * 2 ** age
+
+
+def _add_scores(rows, weight):
+    """Прибавляет вклады строк (recipe_id, created_at) к рейтингам одним
+    UPDATE."""
+    deltas = defaultdict(lambda: dict.fromkeys(SCORE_FIELDS, 0.0))
+    for recipe_id, created_at in rows:
+        for field, half_life in SCORE_FIELDS.items():
+            deltas[recipe_id][field] += event_score(
+                created_at, weight, getattr(settings, half_life)
+            )
+    Recipe.objects.filter(pk__in=deltas).update(
+        **{
+            field: F(field)
+            + Case(
+                *(
+                    When(pk=recipe_id, then=Value(delta[field]))
+                    for recipe_id, delta in deltas.items()
+                ),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            for field in SCORE_FIELDS
+        }
+    )
+
+
+def _refresh_source(source, model, cutoff, batch_size):
+    weight = settings.RECIPE_SCORE_WEIGHTS[source]
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # Блокировка позиции не дает параллельному запуску учесть те
+            # же строки дважды
+            checkpoint = (
+                ScoreCheckpoint.objects.select_for_update()
+                .get_or_create(source=source)[0]
+            )
+            rows = list(
+                model.objects.filter(
+                    pk__gt=checkpoint.last_id, created_at__lte=cutoff
+                )
+                .order_by('pk')
+                .values_list('pk', 'recipe_id', 'created_at')[:batch_size]
+            )
+            if not rows:
+                return processed
+            _add_scores([row[1:] for row in rows], weight)
+            checkpoint.last_id = rows[-1][0]
+            checkpoint.save(update_fields=['last_id'])
+        processed += len(rows)
+
+
+def refresh_scores(full=False, batch_size=1000):
+    """Добавляет к рейтингам строки избранного и корзины, появившиеся после
+    прошлого запуска и старше RECIPE_SCORE_REFRESH_LAG.
+
+    full=True обнуляет рейтинги и позиции и считает все заново в одной
+    транзакции, чтобы список не показывался с нулевыми рейтингами.
+    Возвращает количество учтенных строк по источникам.
+    """
+    cutoff = timezone.now() - settings.RECIPE_SCORE_REFRESH_LAG
+
+    def refresh():
+        return {
+            source: _refresh_source(source, model, cutoff, batch_size)
+            for source, model in SOURCES.items()
+        }
+
+    if not full:
+        return refresh()
+    with transaction.atomic():
+        Recipe.objects.exclude(popularity_score=0, trending_score=0).update(
+            **dict.fromkeys(SCORE_FIELDS, 0.0)
+        )
+        ScoreCheckpoint.objects.update(last_id=0)
+        return refresh()
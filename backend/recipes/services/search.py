@@ -0,0 +1,194 @@
+"""
+Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+PostgreSQL: колонка Recipe.search_vector (tsvector, GIN-индекс) и
+триграммный GIN-индекс по названию для опечаток и частичных слов.
+SQLite: теневая таблица FTS5 recipes_recipe_fts с rowid = id рецепта.
+
+Индекс обновляется при записи рецепта функцией update_search_index.
+"""
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections, router
+from django.db.models import (
+    F,
+    FloatField,
+    Func,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce
+
+from recipes.models import Recipe, RecipeIngredient
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса колонок FTS5 для bm25: название, описание, ингредиенты
+FTS_WEIGHTS = (10.0, 2.0, 4.0)
+
+
+def _write_connection():
+    return connections[router.db_for_write(Recipe)]
+
+
+def _ingredient_names():
+    return Coalesce(
+        Subquery(
+            RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+            .values('recipe')
+            .annotate(names=StringAgg('ingredient__name', ' '))
+            .values('names')
+        ),
+        Value(''),
+    )
+
+
+def _update_postgres(recipe_ids):
+    config = settings.SEARCH_CONFIG
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector('text', weight='B', config=config)
+            + SearchVector(_ingredient_names(), weight='C', config=config)
+        )
+    )
+
+
+def _update_sqlite(connection, recipe_ids):
+    names = {}
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        names.setdefault(recipe_id, []).append(name)
+    rows = [
+        (pk, name, text, ' '.join(names.get(pk, ())))
+        for pk, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', 'name', 'text')
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids],
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс для рецептов с указанными id."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = _write_connection()
+    if connection.vendor == 'postgresql':
+        _update_postgres(recipe_ids)
+    elif connection.vendor == 'sqlite':
+        _update_sqlite(connection, recipe_ids)
+
+
+def delete_from_search_index(recipe_ids):
+    """Удаляет рецепты из теневой таблицы FTS5 (для PostgreSQL индекс
+    удаляется вместе со строкой рецепта)."""
+    connection = _write_connection()
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids],
+        )
+
+
+def _fts5_query(text):
+    """Превращает пользовательский ввод в запрос FTS5: каждое слово
+    ищется как префикс, спецсимволы синтаксиса FTS5 экранируются."""
+    return ' '.join(
+        '"{}"*'.format(token.replace('"', '""')) for token in text.split()
+    )
+
+
+def _search_postgres(queryset, text):
+    query = SearchQuery(
+        text, search_type='websearch', config=settings.SEARCH_CONFIG
+    )
+    return (
+        queryset.filter(Q(search_vector=query) | Q(name__trigram_similar=text))
+        .annotate(
+            # ts_rank и similarity возвращают real: значение из курсора
+            # пагинации после JSON не совпало бы с ним при сравнении
+            search_rank=Cast(
+                SearchRank(F('search_vector'), query)
+                + TrigramSimilarity('name', text),
+                FloatField(),
+            )
+        )
+        .order_by('-search_rank', '-id')
+    )
+
+
+class _Fts5Rank(Func):
+    """Релевантность рецепта по запросу FTS5 (bm25 с весами колонок
+    FTS_WEIGHTS, с обратным знаком: больше — релевантнее).
+
+    Вычисляется коррелированным подзапросом по rowid, поэтому фильтры,
+    сортировка и пагинация выполняются в том же SQL-запросе.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, match):
+        super().__init__(F('pk'), Value(match))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pk, match = self.get_source_expressions()
+        pk_sql, pk_params = compiler.compile(pk)
+        match_sql, match_params = compiler.compile(match)
+        weights = ', '.join(['%s'] * len(FTS_WEIGHTS))
+        return (
+            f'(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH {match_sql} AND rowid = {pk_sql})',
+            [*FTS_WEIGHTS, *match_params, *pk_params],
+        )
+
+
+def _search_sqlite(queryset, text):
+    match = _fts5_query(text)
+    if not match:
+        return queryset
+    return (
+        queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match],
+            )
+        )
+        .annotate(search_rank=_Fts5Rank(match))
+        .order_by('-search_rank', '-id')
+    )
+
+
+def search_recipes(queryset, text):
+    """Фильтрует рецепты по поисковому запросу и упорядочивает их по
+    релевантности (аннотация search_rank)."""
+    text = text.strip()
+    if not text:
+        return queryset
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, text)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(queryset, text)
+    return queryset.filter(Q(name__icontains=text) | Q(text__icontains=text))
@@ -1,7 +1,19 @@
+import csv
+import json
+from collections import defaultdict
+
+from django.db import transaction
 from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
-from recipes.models import RecipeIngredient
+from recipes.models import (
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    User,
+)
+from recipes.services.auth_cache import invalidate_users
+from recipes.services.versions import catalog_version
 
 
 def get_shopping_cart_ingredients(user):
@@ -17,48 +29,264 @@ def get_shopping_cart_ingredients(user):
     )
 
 
-def render_as_txt(data):
-    """Форматирует список ингредиентов в текстовый файл"""
-    lines = ['Ingredient - Total Amount - Measurement Unit']
-    lines += [
-        f'{item["name"]} - {item["total_amount"]} {item["measure_unit"]}'
-        for item in data
-    ]
-    return '\n'.join(lines)
+def get_shopping_list_items(user):
+    """Возвращает список покупок пользователя из материализованной таблицы.
+
+    Формат строк совпадает с get_shopping_cart_ingredients.
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            name=F('ingredient__name'),
+            measure_unit=F('measurement_unit__name'),
+        )
+        .annotate(total_amount=Sum('total_amount'))
+        .order_by('name')
+    )
 
 
-def render_as_csv(data):
-    """Форматирует список ингредиентов в CSV файл"""
-    import csv
-    from io import StringIO
+def get_shopping_cart_version(user):
+    """Возвращает текущую версию корзины пользователя из базы данных."""
+    return (
+        User.objects.filter(pk=user.pk)
+        .values_list('shopping_cart_version', flat=True)
+        .get()
+    )
+
+
+def get_shopping_list_version(user):
+    """Версия выгрузки списка покупок: версия корзины и версия
+    справочников, названия ингредиентов и единиц из которых попадают в
+    файл. Читается одним запросом."""
+    return (
+        User.objects.filter(pk=user.pk)
+        .annotate(catalog_version=catalog_version())
+        .values_list('shopping_cart_version', 'catalog_version')
+        .get()
+    )
+
+
+def _bump_shopping_cart_version(user_ids):
+    User.objects.filter(pk__in=user_ids).update(
+        shopping_cart_version=F('shopping_cart_version') + 1
+    )
+    invalidate_users(user_ids)
+
+
+def _lock_users(user_ids):
+    """Блокирует строки пользователей до конца транзакции.
+
+    select_for_update по ShoppingListItem не защищает строки, которых еще
+    нет: два параллельных добавления одного ингредиента нарушили бы
+    unique_shopping_list_item. Изменения списка покупок пользователя
+    выполняются под блокировкой его строки, в порядке pk, чтобы
+    пересборка нескольких списков не взаимоблокировалась.
+    """
+    list(
+        User.objects.select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def _apply_recipe_to_shopping_list(user, recipe, sign):
+    _lock_users([user.pk])
+    amounts = defaultdict(int)
+    for ingredient_id, unit_id, amount in RecipeIngredient.objects.filter(
+        recipe=recipe
+    ).values_list('ingredient_id', 'measurement_unit_id', 'amount'):
+        amounts[(ingredient_id, unit_id)] += amount
+
+    items = {
+        (item.ingredient_id, item.measurement_unit_id): item
+        for item in ShoppingListItem.objects.filter(
+            user=user,
+            ingredient_id__in={ingredient_id for ingredient_id, _ in amounts},
+        )
+    }
+    to_create = []
+    to_update = []
+    to_delete = []
+    for (ingredient_id, unit_id), amount in amounts.items():
+        item = items.get((ingredient_id, unit_id))
+        if item is None:
+            if sign > 0:
+                to_create.append(
+                    ShoppingListItem(
+                        user=user,
+                        ingredient_id=ingredient_id,
+                        measurement_unit_id=unit_id,
+                        total_amount=amount,
+                    )
+                )
+            continue
+        item.total_amount += sign * amount
+        if item.total_amount > 0:
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+
+    if to_delete:
+        ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        ShoppingListItem.objects.bulk_update(to_update, ['total_amount'])
+    if to_create:
+        ShoppingListItem.objects.bulk_create(to_create)
+    _bump_shopping_cart_version([user.pk])
+
+
+@transaction.atomic
+def add_recipe_to_shopping_list(user, recipe):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    _apply_recipe_to_shopping_list(user, recipe, 1)
+
+
+@transaction.atomic
+def remove_recipe_from_shopping_list(user, recipe):
+    """Вычитает ингредиенты рецепта из списка покупок пользователя."""
+    _apply_recipe_to_shopping_list(user, recipe, -1)
+
+
+@transaction.atomic
+def rebuild_shopping_lists(user_ids):
+    """Пересчитывает списки покупок пользователей по их корзинам.
+
+    Используется для исправления расхождений, например после изменения
+    состава рецепта или удаления рецепта из корзин каскадом.
+    """
+    user_ids = list(user_ids)
+    _lock_users(user_ids)
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    totals = (
+        RecipeIngredient.objects.filter(
+            recipe__shoppingcart__user_id__in=user_ids
+        )
+        .values(
+            'ingredient_id',
+            'measurement_unit_id',
+            user_id=F('recipe__shoppingcart__user_id'),
+        )
+        .annotate(total_amount=Sum('amount'))
+        .order_by()
+    )
+    ShoppingListItem.objects.bulk_create(
+        [ShoppingListItem(**row) for row in totals], batch_size=1000
+    )
+    _bump_shopping_cart_version(user_ids)
+
+
+def get_recipe_shopping_cart_user_ids(recipe):
+    """Возвращает id пользователей, у которых рецепт лежит в корзине."""
+    return list(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+TXT_HEADER = 'Ingredient - Total Amount - Measurement Unit'
+CSV_HEADER = ['Ingredient', 'Total Amount', 'Measurement Unit']
+STREAM_CHUNK_SIZE = 8 * 1024
 
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Ingredient', 'Total Amount', 'Measurement Unit'])
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_as_txt(data):
+    """Построчно форматирует список ингредиентов в текстовый файл"""
+    yield TXT_HEADER
+    for item in data:
+        yield (
+            f'\n{item["name"]} - {item["total_amount"]} '
+            f'{item["measure_unit"]}'
+        )
+
+
+def iter_as_csv(data):
+    """Построчно форматирует список ингредиентов в CSV файл"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
     for item in data:
-        writer.writerow(
+        yield writer.writerow(
             [
                 item['name'],
                 item['total_amount'],
                 item['measure_unit'],
             ]
         )
-    return output.getvalue()
+
+
+def iter_as_json(data):
+    """По элементам форматирует список ингредиентов в JSON файл.
+
+    Результат совпадает с json.dumps(..., ensure_ascii=False, indent=2).
+    """
+    separator = '[\n  '
+    for item in data:
+        dumped = json.dumps(
+            {
+                'name': item['name'],
+                'amount': item['total_amount'],
+                'measurement_unit': item['measure_unit'],
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+        yield separator + dumped.replace('\n', '\n  ')
+        separator = ',\n  '
+    yield '[]' if separator == '[\n  ' else '\n]'
+
+
+def render_as_txt(data):
+    """Форматирует список ингредиентов в текстовый файл"""
+    return ''.join(iter_as_txt(data))
+
+
+def render_as_csv(data):
+    """Форматирует список ингредиентов в CSV файл"""
+    return ''.join(iter_as_csv(data))
 
 
 def render_as_json(data):
     """Форматирует список ингредиентов в JSON файл"""
-    import json
+    return ''.join(iter_as_json(data))
+
+
+SHOPPING_CART_RENDERERS = {
+    'txt': (render_as_txt, iter_as_txt, 'text/plain'),
+    'csv': (render_as_csv, iter_as_csv, 'text/csv'),
+    'json': (render_as_json, iter_as_json, 'application/json'),
+}
+
+
+def encode_chunks(parts, chunk_size=STREAM_CHUNK_SIZE, encoding='utf-8'):
+    """Склеивает строки в байтовые блоки размером около chunk_size.
 
-    result = [
-        {
-            'name': item['name'],
-            'amount': item['total_amount'],
-            'measurement_unit': item['measure_unit'],
-        }
-        for item in data
-    ]
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    Первая строка (заголовок файла) отдается сразу, чтобы клиент получил
+    первый байт до окончания выборки из базы данных.
+    """
+    buffer = []
+    size = 0
+    first = True
+    for part in parts:
+        encoded = part.encode(encoding)
+        if first:
+            yield encoded
+            first = False
+            continue
+        buffer.append(encoded)
+        size += len(encoded)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
 
 
 def build_file_response(file_content, filename, content_type):
@@ -67,3 +295,11 @@ def build_file_response(file_content, filename, content_type):
     response = HttpResponse(file_content, content_type=content_type)
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
+
+
+def build_streaming_file_response(chunks, filename, content_type):
+    """Создает потоковый HTTP ответ с файлом для скачивания"""
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
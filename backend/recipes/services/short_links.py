@@ -1,8 +1,23 @@
+import filecmp
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from hashids import Hashids
 
-from foodgram.settings import BASE62_ALPHABET
+from foodgram.settings import (
+    BASE62_ALPHABET,
+    SHORT_LINK_CACHE_TIMEOUT,
+    SHORT_LINK_NEGATIVE_CACHE_TIMEOUT,
+)
+from recipes.models import Recipe
 
 _HASHIDS = Hashids(salt='foodgram', min_length=3)
+EXISTS_KEY = 'short-link:recipe:{id}'
+RECIPE_PATH = '/recipes/{id}'
 
 
 def encode_base62(num):
@@ -54,3 +69,80 @@ def get_short_link(id, request):
 def get_id_from_short_link(code):
     """Получает идентификатор из короткой ссылки."""
     return decode_hashid(code)
+
+
+def get_recipe_path(id):
+    """Путь страницы рецепта, на который ведет короткая ссылка."""
+    return RECIPE_PATH.format(id=id)
+
+
+def _exists_timeout(exists):
+    if exists:
+        return SHORT_LINK_CACHE_TIMEOUT
+    return SHORT_LINK_NEGATIVE_CACHE_TIMEOUT
+
+
+def recipe_exists(id):
+    """Проверяет, что рецепт существует.
+
+    Кэшируется и положительный, и отрицательный результат: отрицательный
+    на короткое время, чтобы запросы несуществующих ссылок тоже не
+    доходили до базы. Записи вытесняются по таймауту и политикой кэша.
+    """
+    key = EXISTS_KEY.format(id=id)
+    exists = cache.get(key)
+    if exists is None:
+        exists = Recipe.objects.filter(pk=id).exists()
+        cache.set(key, exists, timeout=_exists_timeout(exists))
+    return exists
+
+
+async def arecipe_exists(id):
+    """Асинхронный вариант recipe_exists."""
+    key = EXISTS_KEY.format(id=id)
+    exists = await cache.aget(key)
+    if exists is None:
+        exists = await Recipe.objects.filter(pk=id).aexists()
+        await cache.aset(key, exists, timeout=_exists_timeout(exists))
+    return exists
+
+
+def invalidate_short_links(ids):
+    """Сбрасывает кэш существования рецептов после фиксации транзакции:
+    при удалении рецепта и при создании (если id был закэширован как
+    несуществующий)."""
+    keys = [EXISTS_KEY.format(id=id) for id in ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def export_short_links_map(path=None):
+    """Записывает карту "короткая ссылка -> путь рецепта" для директивы map
+    nginx и атомарно подменяет ею предыдущую. Возвращает число рецептов.
+
+    Неизменившаяся карта не перезаписывается: nginx перечитывает
+    конфигурацию только после изменения файла.
+    """
+    path = Path(path or settings.SHORT_LINKS_MAP_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    count = 0
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for id in Recipe.objects.order_by('pk').values_list(
+                'pk', flat=True
+            ).iterator(chunk_size=10000):
+                code = encode_hashid(id)
+                target = get_recipe_path(id)
+                # Django принимает ссылку и без завершающего слэша
+                f.write(f'/s/{code} {target};\n/s/{code}/ {target};\n')
+                count += 1
+        if path.exists() and filecmp.cmp(tmp_path, path, shallow=False):
+            os.unlink(tmp_path)
+            return count
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
@@ -2,6 +2,10 @@ import csv
 import json
 from pathlib import Path
 
+READ_BUFFER_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+NUMBER_CHARS = '0123456789.eE+-'
+
 
 def read_json(path: Path):
     with open(path, 'r', encoding='utf-8') as f:
@@ -19,3 +23,91 @@ def read_data_from_file(filename):
     else:
         rows_from_file = read_json(filename)
     return rows_from_file
+
+
+def iter_json_array(path: Path, buffer_size=READ_BUFFER_SIZE):
+    """Элементы JSON-массива верхнего уровня по одному.
+
+    Файл читается блоками по buffer_size символов, в памяти держится
+    только необработанный остаток блока и текущий элемент.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        eof = False
+        expect = '['
+
+        def fill():
+            nonlocal buffer, position, eof
+            chunk = f.read(buffer_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    raise ValueError(f'{path}: неожиданный конец файла')
+                fill()
+                continue
+            char = buffer[position]
+            if expect == '[':
+                if char != '[':
+                    raise ValueError(f'{path}: ожидался JSON-массив')
+                position += 1
+                expect = 'item'
+            elif char == ']' and expect in ('item', 'separator'):
+                return
+            elif expect == 'separator':
+                if char != ',':
+                    raise ValueError(f'{path}: ожидалась запятая')
+                position += 1
+                expect = 'value'
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                # Число на границе блока могло прочитаться не полностью:
+                # оно заканчивается только на символе, не входящем в число
+                if not eof and (
+                    end == len(buffer)
+                    or isinstance(item, (int, float))
+                    and buffer[end] in NUMBER_CHARS
+                ):
+                    fill()
+                    continue
+                position = end
+                expect = 'separator'
+                yield item
+
+
+def iter_csv(path: Path):
+    """Строки CSV-файла словарями по одной, без чтения файла целиком."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def iter_data_from_file(filename):
+    """Потоковый аналог read_data_from_file."""
+    if Path(filename).suffix.lower() == '.csv':
+        return iter_csv(filename)
+    return iter_json_array(filename)
+
+
+def batched(items, size):
+    """Разбивает последовательность на списки длиной не больше size."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
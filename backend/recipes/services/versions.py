@@ -0,0 +1,55 @@
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.models import DataVersion, Recipe, User
+from recipes.services.auth_cache import invalidate_users
+
+
+def touch_recipes(recipe_ids):
+    """Обновляет версию (updated_at) рецептов без загрузки объектов.
+
+    Нужен, когда меняются связанные данные рецепта (теги, ингредиенты,
+    изображения), а сама строка рецепта не сохраняется.
+    """
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
+
+def touch_users(user_ids):
+    """Обновляет версию (updated_at) пользователей.
+
+    Версия пользователя входит в ETag ответов, которые зависят от его
+    избранного, корзины и подписок.
+    """
+    User.objects.filter(pk__in=user_ids).update(updated_at=timezone.now())
+    # В кэше аутентификации лежит пользователь с прежней версией
+    invalidate_users(user_ids)
+
+
+# Версия справочников тегов, ингредиентов и единиц измерения: их названия
+# выводятся в рецептах
+CATALOG_VERSION = 'catalog'
+
+
+def touch_catalog():
+    """Меняет версию справочников в той же транзакции, что и их запись."""
+    updated = DataVersion.objects.filter(name=CATALOG_VERSION).update(
+        value=F('value') + 1
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(
+            name=CATALOG_VERSION, defaults={'value': 1}
+        )
+
+
+def catalog_version():
+    """Выражение с версией справочников для аннотации запросов: версия
+    читается тем же запросом, что и данные, которые от нее зависят."""
+    return Coalesce(
+        Subquery(
+            DataVersion.objects.filter(name=CATALOG_VERSION).values('value')[
+                :1
+            ]
+        ),
+        Value(0),
+    )
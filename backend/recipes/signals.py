@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram.db.middleware import stick_to_primary
+from recipes.models import User
+from recipes.services.auth_cache import invalidate_tokens, invalidate_users
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Выход из системы удаляет токен
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=Token)
+def token_created(sender, instance, created, **kwargs):
+    # Новый пользователь сразу после входа не должен читать с реплики,
+    # куда его запись еще не дошла
+    if created:
+        stick_to_primary(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Смена пароля, деактивация и изменение профиля
+    if not created:
+        invalidate_users([instance.pk])
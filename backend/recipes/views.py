@@ -1,8 +1,13 @@
 from django.http import Http404
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 
-from recipes.models import Recipe
-from recipes.services.short_links import get_id_from_short_link
+from foodgram.settings import SHORT_LINK_REDIRECT_MAX_AGE
+from recipes.services.short_links import (
+    get_id_from_short_link,
+    get_recipe_path,
+    recipe_exists,
+)
 
 
 def short_recipe_redirect(request, code):
@@ -11,5 +16,10 @@ def short_recipe_redirect(request, code):
     except ValueError:
         raise Http404('Invalid short link')
 
-    recipe = get_object_or_404(Recipe, id=recipe_id)
-    return redirect(f'/recipes/{recipe.id}')
+    if not recipe_exists(recipe_id):
+        raise Http404('Recipe not found')
+    response = redirect(get_recipe_path(recipe_id))
+    patch_cache_control(
+        response, public=True, max_age=SHORT_LINK_REDIRECT_MAX_AGE
+    )
+    return response
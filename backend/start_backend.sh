@@ -3,5 +3,30 @@
 echo "Starting Foodgram backend..."
 
 python manage.py migrate --no-input
+python manage.py export_short_links
 
-gunicorn -w 4 -t 600 --bind 0:8000 foodgram.wsgi
+# Карта коротких ссылок для nginx выгружается заново раз в
+# SHORT_LINKS_EXPORT_INTERVAL секунд (0 — только при запуске): новые
+# рецепты попадают в нее, удаленные пропадают. Контейнер nginx
+# перечитывает карту после изменения файла.
+EXPORT_INTERVAL=${SHORT_LINKS_EXPORT_INTERVAL:-300}
+if [ "$EXPORT_INTERVAL" -gt 0 ]; then
+    (
+        while sleep "$EXPORT_INTERVAL"; do
+            python manage.py export_short_links > /dev/null
+        done
+    ) &
+fi
+
+# SERVER_MODE=asgi: асинхронные представления горячих путей чтения,
+# один процесс на ядро держит много одновременных соединений.
+# SERVER_MODE=wsgi: синхронные воркеры, 2 * ядра + 1.
+CPUS=$(nproc)
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    WORKERS=${WEB_CONCURRENCY:-$CPUS}
+    exec gunicorn -w "$WORKERS" -k uvicorn.workers.UvicornWorker \
+        -t 600 --bind 0:8000 foodgram.asgi
+fi
+
+WORKERS=${WEB_CONCURRENCY:-$((2 * CPUS + 1))}
+exec gunicorn -w "$WORKERS" -t 600 --bind 0:8000 foodgram.wsgi
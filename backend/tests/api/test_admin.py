@@ -0,0 +1,228 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Subscription,
+    Tag,
+    User,
+)
+from recipes.services.search import search_recipes, update_search_index
+
+
+@pytest.fixture
+def admin_client_with_login(db):
+    admin = User.objects.create_superuser(
+        username='admin',
+        email='admin@example.com',
+        first_name='Admin',
+        last_name='Admin',
+        password='pass',
+    )
+    client = Client()
+    client.force_login(admin)
+    return client
+
+
+def create_favorites(count, start=0):
+    for number in range(start, start + count):
+        user = User.objects.create_user(
+            username=f'fan{number}',
+            email=f'fan{number}@example.com',
+            first_name='Fan',
+            last_name=str(number),
+        )
+        recipe = Recipe.objects.create(
+            author=user,
+            name=f'Борщ {number}',
+            text='Свекла и капуста',
+            cooking_time=60,
+        )
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        update_search_index([recipe.pk])
+
+
+def changelist_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'model_name', ['favorite', 'shoppingcart', 'recipe', 'user']
+)
+def test_changelist_queries_do_not_grow_with_rows(
+    admin_client_with_login, model_name
+):
+    url = reverse(f'admin:recipes_{model_name}_changelist')
+    create_favorites(2)
+    few = changelist_queries(admin_client_with_login, url)
+    create_favorites(5, start=2)
+
+    assert changelist_queries(admin_client_with_login, url) == few
+
+
+@pytest.mark.django_db
+def test_favorite_search_by_username_and_recipe(admin_client_with_login):
+    create_favorites(3)
+    url = reverse('admin:recipes_favorite_changelist')
+
+    by_user = admin_client_with_login.get(url, {'q': 'fan1'})
+    by_recipe = admin_client_with_login.get(url, {'q': 'борщ'})
+
+    assert list(by_user.context['cl'].result_list) == [
+        Favorite.objects.get(user__username='fan1')
+    ]
+    assert by_recipe.context['cl'].result_count == 3
+
+
+@pytest.mark.django_db
+def test_recipe_search_by_author_email(admin_client_with_login):
+    create_favorites(3)
+
+    response = admin_client_with_login.get(
+        reverse('admin:recipes_recipe_changelist'),
+        {'q': 'fan2@example.com'},
+    )
+
+    assert [recipe.name for recipe in response.context['cl'].result_list] == [
+        'Борщ 2'
+    ]
+
+
+def shopping_list(user):
+    return dict(
+        ShoppingListItem.objects.filter(user=user).values_list(
+            'ingredient__name', 'total_amount'
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_shopping_cart_admin_updates_shopping_list(
+    admin_client_with_login, user, recipe1
+):
+    response = admin_client_with_login.post(
+        reverse('admin:recipes_shoppingcart_add'),
+        {'user': user.pk, 'recipe': recipe1.pk},
+    )
+    assert response.status_code == 302
+    assert shopping_list(user) == {'Apple': 100, 'Banana': 1}
+    assert Recipe.objects.get(pk=recipe1.pk).shopping_cart_count == 1
+
+    cart = ShoppingCart.objects.get(user=user, recipe=recipe1)
+    admin_client_with_login.post(
+        reverse('admin:recipes_shoppingcart_delete', args=[cart.pk]),
+        {'post': 'yes'},
+    )
+    assert shopping_list(user) == {}
+    assert Recipe.objects.get(pk=recipe1.pk).shopping_cart_count == 0
+
+
+@pytest.mark.django_db
+def test_favorite_admin_maintains_favorites_count(
+    admin_client_with_login, user, author, recipe1
+):
+    for fan in (user, author):
+        admin_client_with_login.post(
+            reverse('admin:recipes_favorite_add'),
+            {'user': fan.pk, 'recipe': recipe1.pk},
+        )
+    assert Recipe.objects.get(pk=recipe1.pk).favorites_count == 2
+
+    admin_client_with_login.post(
+        reverse('admin:recipes_favorite_changelist'),
+        {
+            'action': 'delete_selected',
+            '_selected_action': list(
+                Favorite.objects.values_list('pk', flat=True)
+            ),
+            'post': 'yes',
+        },
+    )
+    assert Recipe.objects.get(pk=recipe1.pk).favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_recipe_admin_delete_rebuilds_shopping_lists(
+    admin_client_with_login, user, recipe1, recipe2
+):
+    for recipe in (recipe1, recipe2):
+        admin_client_with_login.post(
+            reverse('admin:recipes_shoppingcart_add'),
+            {'user': user.pk, 'recipe': recipe.pk},
+        )
+    version = User.objects.get(pk=user.pk).shopping_cart_version
+
+    admin_client_with_login.post(
+        reverse('admin:recipes_recipe_changelist'),
+        {
+            'action': 'delete_selected',
+            '_selected_action': [recipe1.pk],
+            'post': 'yes',
+        },
+    )
+
+    assert shopping_list(user) == {'Apple': 50}
+    assert User.objects.get(pk=user.pk).shopping_cart_version > version
+
+
+@pytest.mark.django_db
+def test_recipe_admin_create_publishes_to_feeds(
+    admin_client_with_login, user, author, ingredient_apple
+):
+    Subscription.objects.create(user=user, author=author)
+    User.objects.filter(pk=author.pk).update(followers_count=1)
+    tag = Tag.objects.create(name='Tag', slug='tag')
+
+    response = admin_client_with_login.post(
+        reverse('admin:recipes_recipe_add'),
+        {
+            'author': author.pk,
+            'name': 'Новый',
+            'text': 'Текст',
+            'cooking_time': 5,
+            'tags': [tag.pk],
+            'recipe_ingredients-TOTAL_FORMS': 1,
+            'recipe_ingredients-INITIAL_FORMS': 0,
+            'recipe_ingredients-0-ingredient': ingredient_apple.pk,
+            'recipe_ingredients-0-amount': 10,
+            'recipe_ingredients-0-measurement_unit': (
+                ingredient_apple.measurement_unit_id
+            ),
+        },
+    )
+
+    assert response.status_code == 302
+    recipe = Recipe.objects.get(name='Новый')
+    assert FeedEntry.objects.filter(user=user, recipe=recipe).exists()
+    assert User.objects.get(pk=author.pk).recipes_count == 1
+
+
+@pytest.mark.django_db
+def test_ingredient_rename_updates_recipe_search(
+    admin_client_with_login, recipe1, ingredient_apple
+):
+    update_search_index([recipe1.pk])
+
+    response = admin_client_with_login.post(
+        reverse('admin:recipes_ingredient_change', args=[ingredient_apple.pk]),
+        {
+            'name': 'Груша',
+            'measurement_unit': ingredient_apple.measurement_unit_id,
+        },
+    )
+
+    assert response.status_code == 302
+    assert list(search_recipes(Recipe.objects.all(), 'груша')) == [recipe1]
+    assert not search_recipes(Recipe.objects.all(), 'apple').exists()
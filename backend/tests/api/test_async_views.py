@@ -0,0 +1,117 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite
+from recipes.services.short_links import encode_hashid
+from tests.conftest import create_tags
+
+
+@pytest.fixture(autouse=True)
+def asgi_urls(settings):
+    settings.ROOT_URLCONF = 'foodgram.urls_asgi'
+
+
+class TokenAsyncClient(AsyncClient):
+    """AsyncClient в Django 4.2 не передает headers конструктора в
+    запросы, поэтому заголовок добавляется к каждому запросу."""
+
+    def __init__(self, token=None):
+        super().__init__()
+        self.auth_headers = {'Authorization': f'Token {token}'} if token else {}
+
+    def generic(self, *args, headers=None, **kwargs):
+        return super().generic(
+            *args, headers={**self.auth_headers, **(headers or {})}, **kwargs
+        )
+
+
+@pytest.fixture
+def async_client(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return TokenAsyncClient(token.key)
+
+
+def get(client, url, **params):
+    return async_to_sync(client.get)(url, params)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url_name, args, params',
+    [
+        ('recipes-list', [], {}),
+        ('recipes-list', [], {'limit': 1, 'page': 2}),
+        ('recipes-list', [], {'is_favorited': 1}),
+        ('recipes-list', [], {'tags': 'tag1'}),
+        ('recipes-detail', ['recipe1'], {}),
+        ('tags-list', [], {}),
+        ('ingredients-list', [], {'name': 'App'}),
+    ],
+)
+def test_async_views_match_sync_views(
+    user, user_client, async_client, recipe1, recipe2, url_name, args,
+    params,
+):
+    create_tags()
+    recipe1.tags.set([1])
+    Favorite.objects.create(user=user, recipe=recipe2)
+    url = reverse(
+        url_name, args=[{'recipe1': recipe1.pk}[arg] for arg in args]
+    )
+
+    async_response = get(async_client, url, **params)
+    sync_response = user_client.get(url, params)
+
+    assert async_response.status_code == sync_response.status_code == 200
+    assert async_response.json() == sync_response.json()
+
+
+@pytest.mark.django_db
+def test_async_recipe_detail_not_found(async_client):
+    missing = get(async_client, reverse('recipes-detail', args=[999]))
+    assert missing.status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_recipe_detail_returns_304_for_etag(async_client, recipe1):
+    url = reverse('recipes-detail', args=[recipe1.pk])
+    etag = get(async_client, url)['ETag']
+
+    response = async_to_sync(async_client.get)(
+        url, headers={'If-None-Match': etag}
+    )
+
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_async_views_reject_invalid_token():
+    client = TokenAsyncClient('invalid')
+
+    response = get(client, reverse('recipes-list'))
+
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_async_recipe_list_delegates_writes(async_client):
+    response = async_to_sync(async_client.post)(
+        reverse('recipes-list'), {}, content_type='application/json'
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_async_short_link_redirect(recipe1):
+    client = TokenAsyncClient()
+
+    response = get(client, f'/s/{encode_hashid(recipe1.pk)}/')
+    missing = get(client, f'/s/{encode_hashid(recipe1.pk + 100)}/')
+
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe1.pk}'
+    assert missing.status_code == 404
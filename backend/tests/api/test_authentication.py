@@ -0,0 +1,105 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipes.services.auth_cache import LRUCache
+
+
+def auth_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    token_queries = [
+        query for query in context.captured_queries
+        if Token._meta.db_table in query['sql']
+    ]
+    return response, len(token_queries)
+
+
+@pytest.fixture
+def me_url():
+    return reverse('users-me')
+
+
+@pytest.mark.django_db
+def test_token_lookup_is_cached(user_client, me_url):
+    _, first = auth_queries(user_client, me_url)
+    response, second = auth_queries(user_client, me_url)
+
+    assert response.status_code == 200
+    assert (first, second) == (1, 0)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logout_invalidates_cached_token(user_client, me_url):
+    user_client.get(me_url)
+
+    response = user_client.post(reverse('auth:logout'))
+    assert response.status_code == 204
+
+    assert user_client.get(me_url).status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deactivation_invalidates_cached_user(user, user_client, me_url):
+    user_client.get(me_url)
+
+    user.is_active = False
+    user.save()
+
+    assert user_client.get(me_url).status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_set_password_invalidates_cached_user(user, user_client):
+    url = reverse('users-set-password')
+    user_client.get(reverse('users-me'))
+
+    response = user_client.post(
+        url, {'current_password': 'pass', 'new_password': 'N3w-passw0rd!'}
+    )
+    assert response.status_code == 204
+
+    # Пароль проверяется по пользователю из кэша: старый уже не подходит
+    response = user_client.post(
+        url, {'current_password': 'pass', 'new_password': 'An0ther-pass!'}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_lru_cache_evicts_oldest_and_expired_entries(user):
+    cache = LRUCache(size=2, timeout=60)
+    cache.set('a', user)
+    cache.set('b', user)
+    cache.get('a')
+    cache.set('c', user)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is user
+
+    cache.delete_users([user.pk])
+    assert cache.get('a') is None and cache.get('c') is None
+
+    expired = LRUCache(size=2, timeout=-1)
+    expired.set('a', user)
+    assert expired.get('a') is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_set_password_keeps_counters_of_cached_user(
+    author, user_client, author_client
+):
+    author_client.get(reverse('users-me'))
+    user_client.post(reverse('users-subscribe', args=[author.pk]))
+
+    response = author_client.post(
+        reverse('users-set-password'),
+        {'current_password': 'pass', 'new_password': 'N3w-passw0rd!'},
+    )
+    assert response.status_code == 204
+
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert author.check_password('N3w-passw0rd!')
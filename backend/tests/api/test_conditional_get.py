@@ -0,0 +1,90 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import Recipe
+
+
+@pytest.mark.django_db
+def test_recipe_detail_returns_304_until_recipe_changes(
+    user_client, recipe1, recipes_detail_url
+):
+    response = user_client.get(recipes_detail_url)
+    etag = response['ETag']
+
+    not_modified = user_client.get(
+        recipes_detail_url, HTTP_IF_NONE_MATCH=etag
+    )
+    recipe1.name = 'Renamed'
+    recipe1.save()
+    modified = user_client.get(recipes_detail_url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response['Last-Modified']
+    assert not_modified.status_code == 304
+    assert not_modified['ETag'] == etag
+    assert modified.status_code == 200
+    assert modified.data['name'] == 'Renamed'
+
+
+@pytest.mark.django_db
+def test_recipe_detail_etag_depends_on_viewer_state(
+    user_client, recipe1, recipes_detail_url
+):
+    etag = user_client.get(recipes_detail_url)['ETag']
+
+    user_client.post(reverse('recipes-favorite', args=[recipe1.id]))
+    response = user_client.get(recipes_detail_url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response.data['is_favorited'] is True
+
+
+@pytest.mark.django_db
+def test_recipe_list_returns_304_until_page_changes(
+    anonym_client, author, recipe1, recipes_list_url
+):
+    etag = anonym_client.get(recipes_list_url)['ETag']
+
+    not_modified = anonym_client.get(recipes_list_url, HTTP_IF_NONE_MATCH=etag)
+    Recipe.objects.create(
+        author=author, name='New', text='Text', cooking_time=1
+    )
+    modified = anonym_client.get(recipes_list_url, HTTP_IF_NONE_MATCH=etag)
+
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified.data['count'] == 2
+
+
+@pytest.mark.django_db
+def test_me_returns_304_until_profile_changes(
+    author_client, author, users_selfinfo_url
+):
+    etag = author_client.get(users_selfinfo_url)['ETag']
+
+    not_modified = author_client.get(
+        users_selfinfo_url, HTTP_IF_NONE_MATCH=etag
+    )
+    author.first_name = 'Changed'
+    author.save()
+    modified = author_client.get(users_selfinfo_url, HTTP_IF_NONE_MATCH=etag)
+
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified.data['first_name'] == 'Changed'
+
+
+@pytest.mark.django_db
+def test_recipe_list_has_no_last_modified(
+    anonym_client, recipe1, recipe2, recipes_list_url
+):
+    response = anonym_client.get(recipes_list_url, {'limit': 1})
+    recipe2.delete()
+
+    assert 'Last-Modified' not in response
+    # Только If-Modified-Since не дает 304: список проверяется по ETag
+    assert anonym_client.get(
+        recipes_list_url,
+        {'limit': 1},
+        HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+    ).status_code == 200
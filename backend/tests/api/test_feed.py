@@ -0,0 +1,130 @@
+import base64
+import io
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from recipes.models import FeedEntry, Recipe, Subscription, Tag
+from recipes.services import feed
+
+FEED_URL = reverse('recipes-feed')
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_PROCESSING_WORKERS = 0
+
+
+def data_uri():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def create_recipe(client, ingredient, name):
+    tag = Tag.objects.get_or_create(name='Tag', slug='tag')[0]
+    response = client.post(
+        reverse('recipes-list'),
+        {
+            'name': name,
+            'text': 'Text',
+            'cooking_time': 5,
+            'image': data_uri(),
+            'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+        },
+        format='json',
+    )
+    assert response.status_code == 201, response.data
+    return response.data['id']
+
+
+def feed_ids(client, url=FEED_URL):
+    response = client.get(url)
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']], response
+
+
+@pytest.mark.django_db
+def test_feed_requires_authentication(anonym_client):
+    assert anonym_client.get(FEED_URL).status_code == 401
+
+
+@pytest.mark.django_db
+def test_subscribe_backfills_and_unsubscribe_clears_feed(
+    author, user_client, recipe1, recipe2, other_recipe
+):
+    url = reverse('users-subscribe', args=[author.pk])
+
+    assert user_client.post(url).status_code == 201
+    ids, response = feed_ids(user_client)
+    assert ids == [recipe2.pk, recipe1.pk]
+    assert response.data['results'][0]['author']['is_subscribed'] is True
+
+    assert user_client.delete(url).status_code == 204
+    assert feed_ids(user_client)[0] == []
+
+
+@pytest.mark.django_db
+def test_published_recipe_fans_out_to_followers(
+    user, author, user_client, author_client, ingredient_apple
+):
+    user_client.post(reverse('users-subscribe', args=[author.pk]))
+
+    recipe_id = create_recipe(author_client, ingredient_apple, 'New')
+
+    assert feed_ids(user_client)[0] == [recipe_id]
+    # Автор на себя не подписан, его лента пуста
+    assert feed_ids(author_client)[0] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_large_audience_fans_out_after_commit(
+    settings, monkeypatch, user, author, author_client, ingredient_apple
+):
+    settings.FEED_SYNC_FANOUT_LIMIT = 0
+    submitted = []
+
+    class Executor:
+        def submit(self, func, *args):
+            submitted.append(args)
+            func(*args)
+
+    monkeypatch.setattr(feed, '_get_executor', Executor)
+    Subscription.objects.create(user=user, author=author)
+    author.followers_count = 1
+    author.save()
+
+    recipe_id = create_recipe(author_client, ingredient_apple, 'New')
+
+    assert submitted == [(recipe_id, author.pk)]
+    assert FeedEntry.objects.filter(user=user, recipe_id=recipe_id).exists()
+
+
+@pytest.mark.django_db
+def test_feed_keyset_pagination_and_query_count(
+    user, author, user_client
+):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'R{number}', text='T', cooking_time=1)
+        for number in range(7)
+    )
+    Subscription.objects.create(user=user, author=author)
+    feed.backfill_feed(user.pk, author.pk)
+    expected = sorted((recipe.pk for recipe in recipes), reverse=True)
+
+    first, response = feed_ids(user_client, f'{FEED_URL}?limit=4')
+    assert response.data['count'] == 7
+    second, response = feed_ids(user_client, response.data['next'])
+    assert first + second == expected
+    assert response.data['next'] is None
+
+    with CaptureQueriesContext(connection) as context:
+        user_client.get(f'{FEED_URL}?limit=4&count=false')
+    # записи ленты, рецепты с полями пользователя и фрагменты из кэша
+    assert len(context.captured_queries) <= 2
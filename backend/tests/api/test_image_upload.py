@@ -0,0 +1,76 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+
+def png_bytes(size=(60, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (90, 160, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_PROCESSING_WORKERS = 0
+
+
+@pytest.mark.django_db
+def test_recipe_image_accepts_raw_body(
+    author_client, recipe1, django_capture_on_commit_callbacks
+):
+    url = reverse('recipes-image', args=[recipe1.id])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.put(
+            url, png_bytes(), content_type='image/png'
+        )
+
+    assert response.status_code == 200
+    recipe1.refresh_from_db()
+    assert recipe1.image.name.endswith('.png')
+    assert recipe1.image_variants['source'] == recipe1.image.name
+    assert response.data['image'].endswith(recipe1.image.name)
+
+
+@pytest.mark.django_db
+def test_recipe_image_is_available_only_to_author(user_client, recipe1):
+    response = user_client.put(
+        reverse('recipes-image', args=[recipe1.id]),
+        png_bytes(),
+        content_type='image/png',
+    )
+
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_avatar_accepts_multipart(user, user_client, users_avatar_url):
+    upload = SimpleUploadedFile(
+        'photo.gif', png_bytes(), content_type='image/gif'
+    )
+
+    response = user_client.put(
+        users_avatar_url, {'avatar': upload}, format='multipart'
+    )
+
+    assert response.status_code == 200
+    user.refresh_from_db()
+    # Расширение определяется по содержимому, а не по имени файла
+    assert user.avatar.name.endswith('.png')
+
+
+@pytest.mark.django_db
+def test_raw_upload_over_limit_is_rejected_before_reading(
+    settings, user_client, users_avatar_url
+):
+    settings.IMAGE_UPLOAD_MAX_BODY_SIZE = 100
+
+    response = user_client.put(
+        users_avatar_url, png_bytes((300, 300)), content_type='image/png'
+    )
+
+    assert response.status_code == 413
@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+
+import pytest
+
+from recipes.models import Recipe
+from recipes.services.search import search_recipes, update_search_index
+from tests.conftest import create_tags
+
+
+@pytest.fixture
+def many_recipes(author):
+    recipes = []
+    for number in range(7):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Recipe {number}',
+            text='Text',
+            cooking_time=1,
+        )
+        recipes.append(recipe)
+    # Несколько рецептов с одинаковой датой, чтобы проверить tie-breaker
+    for index, recipe in enumerate(recipes):
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=date(2024, 1, 1) + timedelta(days=index // 3)
+        )
+    return Recipe.objects.order_by('-pub_date', '-id')
+
+
+def collect_pages(client, url, params):
+    ids = []
+    pages = []
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        pages.append(response.data)
+        ids += [item['id'] for item in response.data['results']]
+        if not response.data['next']:
+            return ids, pages
+        response = client.get(response.data['next'])
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_walks_all_recipes_in_order(
+    anonym_client, recipes_list_url, many_recipes
+):
+    ids, pages = collect_pages(
+        anonym_client, recipes_list_url, {'cursor': '', 'limit': 3}
+    )
+
+    assert ids == [recipe.id for recipe in many_recipes]
+    assert len(pages) == 3
+    assert pages[0]['count'] == 7
+    assert pages[0]['previous'] is None
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_previous_link(
+    anonym_client, recipes_list_url, many_recipes
+):
+    first = anonym_client.get(recipes_list_url, {'cursor': '', 'limit': 3})
+    second = anonym_client.get(first.data['next'])
+    back = anonym_client.get(second.data['previous'])
+
+    assert [item['id'] for item in back.data['results']] == [
+        item['id'] for item in first.data['results']
+    ]
+    assert back.data['previous'] is None
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_count_opt_out(
+    anonym_client, recipes_list_url, many_recipes
+):
+    response = anonym_client.get(
+        recipes_list_url, {'cursor': '', 'count': 'false'}
+    )
+
+    assert 'count' not in response.data
+    assert len(response.data['results']) == 6
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_rejects_invalid_cursor(
+    anonym_client, recipes_list_url
+):
+    response = anonym_client.get(recipes_list_url, {'cursor': 'broken'})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_tags_filter_returns_each_recipe_once(
+    anonym_client, recipes_list_url, recipe1
+):
+    tags = create_tags()
+    recipe1.tags.set(tags)
+
+    response = anonym_client.get(
+        recipes_list_url, {'tags': [tag.slug for tag in tags]}
+    )
+
+    assert [item['id'] for item in response.data['results']] == [recipe1.id]
+
+
+@pytest.mark.django_db
+def test_users_list_keyset_pagination(
+    anonym_client, users_list_url, user, author
+):
+    ids, _ = collect_pages(
+        anonym_client, users_list_url, {'cursor': '', 'limit': 1}
+    )
+
+    assert ids == [user.id, author.id]
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_by_search_rank(
+    anonym_client, recipes_list_url, author
+):
+    recipes = [
+        Recipe.objects.create(
+            author=author, name=name, text='Пирог', cooking_time=1
+        )
+        for name in ('Пирог', 'Яблочный пирог', 'Пирог с вишней', 'Суп')
+    ]
+    update_search_index([recipe.id for recipe in recipes])
+    expected = [
+        recipe.id
+        for recipe in search_recipes(Recipe.objects.all(), 'пирог')
+    ]
+
+    # На PostgreSQL ранг дробный: курсор должен точно совпадать с ним
+    ids, pages = collect_pages(
+        anonym_client,
+        recipes_list_url,
+        {'search': 'пирог', 'cursor': '', 'limit': 1},
+    )
+
+    assert ids == expected
+    assert len(ids) == 4
@@ -1,7 +1,11 @@
 import pytest
+from django.urls import reverse
 
-from recipes.models import ShoppingCart
+from recipes.models import Ingredient, RecipeIngredient, ShoppingCart
+from recipes.services.search import update_search_index
 from recipes.services.short_links import encode_hashid
+from recipes.services.versions import touch_catalog
+from tests.conftest import create_tags
 
 
 @pytest.mark.django_db
@@ -53,3 +57,123 @@ def test_shopping_cart_rejects_duplicate(
 
     assert first_response.status_code == 201
     assert second_response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_recipe_update_applies_only_changed_ingredients(
+    author_client, recipe1, ingredient_apple, ingredient_banana, unit
+):
+    tags = create_tags()
+    cherry = Ingredient.objects.create(name='Cherry', measurement_unit=unit)
+    apple_row = RecipeIngredient.objects.get(
+        recipe=recipe1, ingredient=ingredient_apple
+    )
+
+    response = author_client.patch(
+        reverse('recipes-detail', args=[recipe1.id]),
+        {
+            'ingredients': [
+                {'id': ingredient_apple.id, 'amount': 200},
+                {'id': cherry.id, 'amount': 3},
+            ],
+            'tags': [tags[0].id],
+        },
+        format='json',
+    )
+
+    assert response.status_code == 200
+    rows = {
+        row.ingredient_id: row
+        for row in RecipeIngredient.objects.filter(recipe=recipe1)
+    }
+    assert set(rows) == {ingredient_apple.id, cherry.id}
+    assert rows[ingredient_apple.id].pk == apple_row.pk
+    assert rows[ingredient_apple.id].amount == 200
+    assert rows[cherry.id].amount == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format', ('txt', 'csv', 'json'))
+def test_download_shopping_cart_streams_file(
+    author_client, recipe1, recipe2, file_format
+):
+    for recipe in (recipe1, recipe2):
+        author_client.post(reverse('recipes-shopping-cart', args=[recipe.id]))
+
+    response = author_client.get(
+        reverse('recipes-download-shopping-cart'),
+        {'file_format': file_format},
+    )
+
+    assert response.status_code == 200
+    assert response.streaming
+    content = b''.join(response.streaming_content).decode()
+    assert 'Apple' in content
+    assert '150' in content
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="shopping_cart.{file_format}"'
+    )
+
+
+@pytest.mark.django_db
+def test_download_shopping_cart_returns_304_for_unchanged_cart(
+    author_client, recipe1, recipe2
+):
+    url = reverse('recipes-download-shopping-cart')
+    author_client.post(reverse('recipes-shopping-cart', args=[recipe1.id]))
+    etag = author_client.get(url)['ETag']
+
+    not_modified = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    author_client.post(reverse('recipes-shopping-cart', args=[recipe2.id]))
+    modified = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_download_shopping_cart_etag_follows_ingredient_names(
+    author_client, recipe1, ingredient_apple
+):
+    url = reverse('recipes-download-shopping-cart')
+    author_client.post(reverse('recipes-shopping-cart', args=[recipe1.id]))
+    etag = author_client.get(url)['ETag']
+
+    # Так ингредиент переименовывает админка
+    Ingredient.objects.filter(pk=ingredient_apple.pk).update(name='Груша')
+    touch_catalog()
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert 'Груша' in b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_ingredient_search_uses_prefix_index(
+    anonym_client, ingredient_apple, ingredient_banana
+):
+    response = anonym_client.get(
+        reverse('ingredients-list'), {'name': 'AP', 'limit': 5}
+    )
+
+    assert response.status_code == 200
+    assert response.data == [
+        {
+            'id': ingredient_apple.id,
+            'name': 'Apple',
+            'measurement_unit': 'g',
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_recipe_list_search_filter(anonym_client, recipe1, recipe2):
+    update_search_index([recipe1.id, recipe2.id])
+
+    response = anonym_client.get(
+        reverse('recipes-list'), {'search': 'Recipe 2'}
+    )
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['results']][0] == recipe2.id
@@ -0,0 +1,82 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Tag
+from recipes.services.versions import touch_catalog
+from tests.conftest import create_tags
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries), response
+
+
+@pytest.mark.django_db
+def test_recipe_list_is_served_from_cached_fragments(
+    anonym_client, recipe1, recipe2, recipes_list_url
+):
+    cold_queries, cold = count_queries(anonym_client, recipes_list_url)
+    warm_queries, warm = count_queries(anonym_client, recipes_list_url)
+
+    assert warm_queries < cold_queries
+    assert warm.json() == cold.json()
+    assert cold.data['results'][0]['ingredients']
+
+
+@pytest.mark.django_db
+def test_cached_fragment_gets_viewer_fields(
+    user, user_client, anonym_client, recipe1, recipes_detail_url
+):
+    Favorite.objects.create(user=user, recipe=recipe1)
+
+    anonymous = anonym_client.get(recipes_detail_url)
+    viewer = user_client.get(recipes_detail_url)
+
+    assert anonymous.data['is_favorited'] is False
+    assert viewer.data['is_favorited'] is True
+    assert viewer.data['is_in_shopping_cart'] is False
+    assert viewer.data['author']['is_subscribed'] is False
+
+
+@pytest.mark.django_db
+def test_recipe_update_invalidates_fragment(
+    author_client, recipe1, recipes_detail_url, ingredient_apple
+):
+    tags = create_tags()
+    author_client.get(recipes_detail_url)
+
+    response = author_client.patch(
+        recipes_detail_url,
+        {
+            'name': 'Обновленный',
+            'tags': [tags[0].id],
+            'ingredients': [{'id': ingredient_apple.id, 'amount': 3}],
+        },
+        format='json',
+    )
+
+    assert response.status_code == 200
+    detail = author_client.get(recipes_detail_url)
+    assert detail.data['name'] == 'Обновленный'
+    assert [item['amount'] for item in detail.data['ingredients']] == [3]
+
+
+@pytest.mark.django_db
+def test_catalog_version_outdates_cached_fragments(
+    anonym_client, recipe1, recipes_detail_url
+):
+    tag = Tag.objects.create(name='Старое', slug='old')
+    recipe1.tags.set([tag])
+    first = anonym_client.get(recipes_detail_url)
+
+    # Так справочник меняет админка в любом процессе: кэш не очищается,
+    # меняется только версия в базе
+    Tag.objects.filter(pk=tag.pk).update(name='Новое')
+    touch_catalog()
+
+    second = anonym_client.get(recipes_detail_url)
+    assert [item['name'] for item in second.data['tags']] == ['Новое']
+    assert second['ETag'] != first['ETag']
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from foodgram.db.middleware import ReplicaRoutingMiddleware
+from foodgram.db.routers import PrimaryReplicaRouter, read_from
+from recipes.models import Recipe
+
+AUTH = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.REPLICA_DATABASES = ['replica1']
+    settings.REPLICA_STICKY_TIMEOUT = 10
+
+
+def read_db(request):
+    """get_response, возвращающий алиас базы для чтения."""
+    return HttpResponse(PrimaryReplicaRouter().db_for_read(Recipe))
+
+
+def test_router_reads_default_outside_requests_and_transactions():
+    router = PrimaryReplicaRouter()
+
+    assert router.db_for_read(Recipe) == 'default'
+    with read_from('replica1'):
+        assert router.db_for_read(Recipe) == 'replica1'
+        assert router.db_for_write(Recipe) == 'default'
+    assert router.db_for_read(Recipe) == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_router_reads_default_inside_atomic():
+    router = PrimaryReplicaRouter()
+    with read_from('replica1'), transaction.atomic():
+        assert router.db_for_read(Recipe) == 'default'
+
+
+def test_middleware_routes_reads_to_replica(replicas):
+    middleware = ReplicaRoutingMiddleware(read_db)
+    factory = RequestFactory()
+
+    assert middleware(factory.get('/api/recipes/')).content == b'replica1'
+    assert middleware(factory.post('/api/recipes/')).content == b'default'
+
+
+def test_middleware_sticks_to_default_after_write(replicas):
+    middleware = ReplicaRoutingMiddleware(read_db)
+    factory = RequestFactory()
+
+    middleware(factory.post('/api/recipes/1/favorite/', **AUTH))
+
+    response = middleware(factory.get('/api/recipes/', **AUTH))
+    assert response.content == b'default'
+    # Другой клиент продолжает читать с реплики
+    response = middleware(
+        factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token other')
+    )
+    assert response.content == b'replica1'
+
+
+def test_middleware_without_replicas_reads_default():
+    middleware = ReplicaRoutingMiddleware(read_db)
+
+    response = middleware(RequestFactory().get('/api/recipes/'))
+
+    assert response.content == b'default'
+
+
+def test_async_middleware_sticks_to_default_after_write(replicas):
+    async def get_response(request):
+        return read_db(request)
+
+    middleware = ReplicaRoutingMiddleware(get_response)
+    factory = RequestFactory()
+
+    async def run():
+        before = await middleware(factory.get('/api/recipes/', **AUTH))
+        await middleware(factory.delete('/api/recipes/1/favorite/', **AUTH))
+        after = await middleware(factory.get('/api/recipes/', **AUTH))
+        return before.content, after.content
+
+    assert asyncio.run(run()) == (b'replica1', b'default')
+
+
+@pytest.mark.django_db
+def test_new_token_sticks_to_default(replicas, user):
+    middleware = ReplicaRoutingMiddleware(read_db)
+    token = Token.objects.create(user=user)
+
+    response = middleware(
+        RequestFactory().get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+    )
+
+    assert response.content == b'default'
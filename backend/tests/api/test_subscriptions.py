@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.models import Recipe, Subscription, User
+from recipes.services.counters import recount_counters
+
+
+def create_author_with_recipes(index, recipes_count):
+    author = User.objects.create_user(
+        username=f'author{index}',
+        email=f'author{index}@example.com',
+        first_name='Author',
+        last_name=str(index),
+        password='pass',
+    )
+    for number in range(recipes_count):
+        Recipe.objects.create(
+            author=author,
+            name=f'Recipe {index}-{number}',
+            text='Text',
+            cooking_time=1,
+        )
+    recount_counters()
+    return author
+
+
+def count_queries(client, url):
+    # Первый запрос кладет пользователя токена в кэш аутентификации
+    client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_subscriptions_query_count_does_not_depend_on_page_size(
+    user, user_client, users_get_subscriptions_url
+):
+    author = create_author_with_recipes(0, 2)
+    Subscription.objects.create(user=user, author=author)
+    one_author_queries = count_queries(
+        user_client, users_get_subscriptions_url
+    )
+
+    for index in range(1, 5):
+        author = create_author_with_recipes(index, 3)
+        Subscription.objects.create(user=user, author=author)
+
+    assert (
+        count_queries(user_client, users_get_subscriptions_url)
+        == one_author_queries
+    )
+
+
+@pytest.mark.django_db
+def test_subscriptions_respect_recipes_limit(
+    user, user_client, users_get_subscriptions_url
+):
+    author = create_author_with_recipes(0, 3)
+    Subscription.objects.create(user=user, author=author)
+
+    response = user_client.get(
+        users_get_subscriptions_url, {'recipes_limit': 2}
+    )
+
+    result = response.data['results'][0]
+    newest = Recipe.objects.filter(author=author).order_by('-id')[:2]
+    assert result['is_subscribed'] is True
+    assert result['recipes_count'] == 3
+    assert [recipe['id'] for recipe in result['recipes']] == [
+        recipe.id for recipe in newest
+    ]
+
+
+@pytest.mark.django_db
+def test_subscribe_returns_author_with_limited_recipes(user, user_client):
+    author = create_author_with_recipes(0, 3)
+    url = reverse('users-subscribe', args=[author.id])
+
+    response = user_client.post(f'{url}?recipes_limit=1')
+
+    assert response.status_code == 201
+    assert response.data['is_subscribed'] is True
+    assert response.data['recipes_count'] == 3
+    assert len(response.data['recipes']) == 1
@@ -1,5 +1,6 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
@@ -12,10 +13,26 @@ from recipes.models import (
     RecipeIngredient,
     Tag,
 )
+from recipes.services.auth_cache import clear_token_cache
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def ingredient_index_path(settings, tmp_path):
+    settings.INGREDIENT_INDEX_PATH = str(tmp_path / 'ingredient_index.bin')
+    return settings.INGREDIENT_INDEX_PATH
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    clear_token_cache()
+    yield
+    cache.clear()
+    clear_token_cache()
+
+
 @pytest.fixture
 @pytest.mark.django_db
 def user(django_user_model):
@@ -0,0 +1,68 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import Favorite, Recipe, User
+from recipes.services.counters import change_counter, recount_counters
+
+
+@pytest.mark.django_db
+def test_favorite_and_cart_update_recipe_counters(user_client, recipe1):
+    favorite_url = reverse('recipes-favorite', args=[recipe1.id])
+    cart_url = reverse('recipes-shopping-cart', args=[recipe1.id])
+
+    user_client.post(favorite_url)
+    user_client.post(cart_url)
+    recipe1.refresh_from_db()
+    assert (recipe1.favorites_count, recipe1.shopping_cart_count) == (1, 1)
+
+    user_client.delete(favorite_url)
+    recipe1.refresh_from_db()
+    assert (recipe1.favorites_count, recipe1.shopping_cart_count) == (0, 1)
+
+
+@pytest.mark.django_db
+def test_subscription_updates_followers_count(user_client, author):
+    url = reverse('users-subscribe', args=[author.id])
+
+    user_client.post(url)
+    author.refresh_from_db()
+    assert author.followers_count == 1
+
+    user_client.delete(url)
+    author.refresh_from_db()
+    assert author.followers_count == 0
+
+
+@pytest.mark.django_db
+def test_recipe_delete_updates_author_recipes_count(
+    author_client, author, recipe1
+):
+    User.objects.filter(pk=author.pk).update(recipes_count=1)
+
+    author_client.delete(reverse('recipes-detail', args=[recipe1.id]))
+
+    author.refresh_from_db()
+    assert author.recipes_count == 0
+
+
+@pytest.mark.django_db
+def test_counter_never_goes_below_zero(recipe1):
+    change_counter(Recipe, recipe1.pk, 'favorites_count', -1)
+
+    recipe1.refresh_from_db()
+    assert recipe1.favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_recount_counters_fixes_drift(user, author, recipe1, recipe2):
+    Favorite.objects.create(user=user, recipe=recipe1)
+    Recipe.objects.filter(pk=recipe2.pk).update(favorites_count=5)
+
+    recount_counters(batch_size=1)
+
+    recipe1.refresh_from_db()
+    recipe2.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe1.favorites_count == 1
+    assert recipe2.favorites_count == 0
+    assert author.recipes_count == 2
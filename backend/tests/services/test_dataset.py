@@ -0,0 +1,133 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    Subscription,
+    User,
+)
+from recipes.services.benchmark import (
+    build_cases,
+    compare_reports,
+    percentile,
+)
+from recipes.services.dataset import DatasetGenerator
+
+
+def generate(**sizes):
+    return DatasetGenerator(
+        users=10,
+        recipes=30,
+        favorites=50,
+        shopping_carts=20,
+        subscriptions=15,
+        batch_size=7,
+        **sizes,
+    ).generate()
+
+
+@pytest.mark.django_db
+def test_generate_dataset_creates_requested_sizes():
+    sizes = generate()
+
+    assert sizes == {
+        'users': 10,
+        'recipes': 30,
+        'favorites': 50,
+        'shopping_carts': 20,
+        'subscriptions': 15,
+    }
+    assert User.objects.count() == 10
+    assert Recipe.objects.count() == 30
+    assert Favorite.objects.count() == 50
+    assert ShoppingCart.objects.count() == 20
+    assert not Subscription.objects.filter(
+        user=F('author')
+    ).exists()
+    assert RecipeIngredient.objects.count() == 30 * 8
+    assert ShoppingListItem.objects.exists()
+    recipe = Recipe.objects.order_by('-favorites_count').first()
+    assert recipe.favorites_count == recipe.favorites.count() > 0
+
+
+@pytest.mark.django_db
+def test_generate_dataset_is_reproducible():
+    generate()
+    first = sorted(
+        Favorite.objects.values_list('user__username', 'recipe__name')
+    )
+    Recipe.objects.all().delete()
+    User.objects.all().delete()
+
+    generate()
+
+    assert sorted(
+        Favorite.objects.values_list('user__username', 'recipe__name')
+    ) == first
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+
+
+def test_compare_reports_flags_slower_cases_and_extra_queries():
+    baseline = {
+        'results': {
+            'fast': {'p95_ms': 10.0, 'queries': 3},
+            'slow': {'p95_ms': 10.0, 'queries': 3},
+            'queries': {'p95_ms': 10.0, 'queries': 3},
+        }
+    }
+    current = {
+        'results': {
+            'fast': {'p95_ms': 11.0, 'queries': 3},
+            'slow': {'p95_ms': 13.0, 'queries': 3},
+            'queries': {'p95_ms': 10.0, 'queries': 4},
+            'new': {'p95_ms': 1.0, 'queries': 1},
+        }
+    }
+
+    _, regressions = compare_reports(baseline, current, max_regression=20)
+
+    assert regressions == ['slow', 'queries']
+
+
+@pytest.mark.django_db
+def test_benchmark_command_writes_report(tmp_path):
+    generate()
+    output = tmp_path / 'report.json'
+
+    call_command(
+        'benchmark', iterations=2, warmup=0, output=str(output), stdout=None
+    )
+
+    report = json.loads(output.read_text())
+    assert report['dataset']['recipes'] == 30
+    result = report['results']['api.recipes.list']
+    assert result['iterations'] == 2
+    assert result['p50_ms'] <= result['p99_ms']
+    assert result['queries'] > 0
+    assert 'services.shopping_cart.get_shopping_list_items' in (
+        report['results']
+    )
+
+
+@pytest.mark.django_db
+def test_benchmark_skips_disabled_ingredient_index(settings):
+    generate()
+
+    assert 'services.ingredient_index.search' in build_cases()
+    settings.INGREDIENT_INDEX_PATH = ''
+    assert 'services.ingredient_index.search' not in build_cases()
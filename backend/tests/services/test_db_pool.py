@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from foodgram.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.connections))
+        self.connections.append(conn)
+        return conn
+
+    @staticmethod
+    def close(conn):
+        conn.closed = True
+
+    @staticmethod
+    def check(conn):
+        return conn.healthy
+
+
+def make_pool(db, **kwargs):
+    return ConnectionPool(db.connect, db.close, check=db.check, **kwargs)
+
+
+def test_pool_reuses_returned_connection():
+    db = FakeDatabase()
+    pool = make_pool(db)
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert len(db.connections) == 1
+    stats = pool.snapshot()
+    assert stats['checkouts'] == 2
+    assert stats['created'] == 1
+    assert stats['checked_out'] == 1
+
+
+def test_pool_waits_for_connection_and_counts_wait_time():
+    db = FakeDatabase()
+    pool = make_pool(db, max_size=1, timeout=5)
+    conn = pool.getconn()
+    got = []
+
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    # Ждем, пока второй поток встанет в очередь
+    while not pool.snapshot()['waiting']:
+        pass
+    pool.putconn(conn)
+    waiter.join()
+
+    assert got == [conn]
+    stats = pool.snapshot()
+    assert stats['waits'] == 1
+    assert stats['max_wait_time'] > 0
+    assert stats['size'] == 1
+
+
+def test_pool_timeout_when_exhausted():
+    pool = make_pool(FakeDatabase(), max_size=1, timeout=0.01)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.snapshot()['timeouts'] == 1
+
+
+def test_pool_replaces_connection_failing_health_check():
+    db = FakeDatabase()
+    pool = make_pool(db, max_size=1, health_check_interval=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.healthy = False
+
+    new_conn = pool.getconn()
+
+    assert new_conn is not conn
+    assert conn.closed
+    stats = pool.snapshot()
+    assert stats['health_check_failures'] == 1
+    assert stats['size'] == 1
+
+
+def test_pool_closes_expired_and_discarded_connections():
+    db = FakeDatabase()
+    pool = make_pool(db, max_lifetime=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert conn.closed
+    assert pool.snapshot()['size'] == 0
+
+    pool = make_pool(db)
+    conn = pool.getconn()
+    pool.putconn(conn, discard=True)
+    assert conn.closed
+    assert pool.snapshot()['idle'] == 0
+
+
+def test_pool_failed_connect_releases_slot():
+    def connect():
+        raise OSError('connection refused')
+
+    pool = ConnectionPool(connect, FakeDatabase.close, max_size=1)
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.getconn()
+    assert pool.snapshot()['size'] == 0
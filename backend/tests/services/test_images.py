@@ -0,0 +1,151 @@
+import base64
+import io
+
+import pytest
+from django.urls import reverse
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import Base64ImageField
+from recipes.models import Recipe
+from tests.conftest import create_tags
+
+
+def data_uri(size=(800, 600), image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_PROCESSING_WORKERS = 0
+    settings.RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_recipe_image_variants_are_built_after_commit(
+    author_client, ingredient_apple, django_capture_on_commit_callbacks
+):
+    tags = create_tags()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            reverse('recipes-list'),
+            {
+                'name': 'С картинкой',
+                'text': 'Текст',
+                'cooking_time': 10,
+                'tags': [tags[0].id],
+                'ingredients': [{'id': ingredient_apple.id, 'amount': 1}],
+                'image': data_uri(),
+            },
+            format='json',
+        )
+    assert response.status_code == 201
+
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    variants = recipe.image_variants
+    assert variants['source'] == recipe.image.name
+    assert (variants['width'], variants['height']) == (800, 600)
+    # Ширина 1280 больше оригинала и заменяется его шириной
+    assert set(variants['files']['webp']) == {'320', '640', '800'}
+    with recipe.image.storage.open(variants['files']['jpeg']['320']) as f:
+        assert Image.open(f).size == (320, 240)
+
+    detail = author_client.get(reverse('recipes-detail', args=[recipe.pk]))
+    image_variants = detail.data['image_variants']
+    assert image_variants['placeholder'].startswith('data:image/webp;base64')
+    assert image_variants['sources']['webp']['320'].startswith('http')
+
+
+@pytest.mark.django_db
+def test_avatar_variants_are_replaced_and_removed(
+    user, user_client, users_avatar_url, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.put(
+            users_avatar_url, {'avatar': data_uri((100, 100))}, format='json'
+        )
+    user.refresh_from_db()
+    first = user.avatar_variants['files']['webp']['64']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.put(
+            users_avatar_url, {'avatar': data_uri((300, 300))}, format='json'
+        )
+    user.refresh_from_db()
+    assert user.avatar_variants['source'] == user.avatar.name
+    assert not user.avatar.storage.exists(first)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.delete(users_avatar_url)
+    user.refresh_from_db()
+    assert user.avatar_variants == {}
+
+
+@pytest.mark.django_db
+def test_non_image_payload_is_rejected(user_client, users_avatar_url):
+    payload = base64.b64encode(b'not an image').decode()
+
+    response = user_client.put(
+        users_avatar_url,
+        {'avatar': f'data:image/png;base64,{payload}'},
+        format='json',
+    )
+
+    assert response.status_code == 400
+
+
+def png_bytes(size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_base64_field_decodes_in_chunks(monkeypatch):
+    monkeypatch.setattr('api.serializers.BASE64_CHUNK_SIZE', 8)
+    content = png_bytes()
+    field = Base64ImageField(max_size=len(content))
+
+    file = field.to_internal_value(
+        'data:image/png;base64,' + base64.b64encode(content).decode()
+    )
+
+    assert file.name == 'image.png'
+    assert file.size == len(content)
+    assert file.read() == content
+
+
+@pytest.mark.parametrize(
+    'payload, code',
+    (
+        # Размер оценивается по длине строки, до декодирования
+        ('iVBORw0KGgo' + 'A' * 2000 + '=', 'max_size'),
+        (base64.b64encode(b'GIF89a' + b'\0' * 10).decode(), 'invalid_image'),
+        (base64.b64encode(b'<svg></svg>').decode(), 'invalid_image'),
+        ('iVBORw0K@@@@', 'invalid_image'),
+    ),
+)
+def test_base64_field_rejects_before_decoding(payload, code):
+    field = Base64ImageField(max_size=1000)
+
+    with pytest.raises(ValidationError) as error:
+        field.to_internal_value(f'data:image/png;base64,{payload}')
+
+    assert error.value.detail[0].code == code
+
+
+@pytest.mark.django_db
+def test_oversized_json_body_is_rejected(
+    settings, user_client, users_avatar_url
+):
+    settings.JSON_MAX_BODY_SIZE = 100
+
+    response = user_client.put(
+        users_avatar_url, {'avatar': data_uri((200, 200))}, format='json'
+    )
+
+    assert response.status_code == 413
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from recipes.models import Ingredient, MeasurementUnit
+from recipes.services import ingredient_import
+from recipes.services.ingredient_import import import_ingredients
+from recipes.services.utils import iter_csv, iter_json_array
+
+
+def test_iter_json_array_reads_items_across_buffer_boundaries(tmp_path):
+    items = [1, 22, {'name': 'мука', 'tags': [1, 2]}, 'x]', None, 4.5]
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding='utf-8')
+
+    for buffer_size in (1, 3, 64):
+        assert list(iter_json_array(path, buffer_size)) == items
+
+
+def test_iter_json_array_rejects_non_array(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('{"name": "мука"}', encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(path))
+
+
+def test_iter_csv_yields_rows(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('name,measurement_unit\nмука,г\nяйца,шт\n', 'utf-8')
+
+    assert list(iter_csv(path)) == [
+        {'name': 'мука', 'measurement_unit': 'г'},
+        {'name': 'яйца', 'measurement_unit': 'шт'},
+    ]
+
+
+@pytest.mark.django_db
+def test_import_ingredients_skips_duplicates_in_chunks():
+    unit = MeasurementUnit.objects.create(name='г')
+    Ingredient.objects.create(name='мука', measurement_unit=unit)
+    rows = [
+        {'name': 'мука', 'measurement_unit': 'г'},
+        {'name': 'сахар', 'measurement_unit': 'г'},
+        {'name': 'сахар', 'measurement_unit': 'г'},
+        {'name': 'яйца', 'measurement_unit': 'шт'},
+        {'name': ' ', 'measurement_unit': 'шт'},
+        {'name': 'сахар', 'measurement_unit': 'шт'},
+    ]
+    batches = []
+
+    result = import_ingredients(
+        iter(rows),
+        mode='batch',
+        batch_size=2,
+        progress=lambda result: batches.append(result.rows),
+    )
+
+    assert (result.rows, result.units, result.ingredients) == (5, 1, 3)
+    assert batches == [2, 4, 5]
+    assert set(
+        Ingredient.objects.values_list('name', 'measurement_unit__name')
+    ) == {('мука', 'г'), ('сахар', 'г'), ('яйца', 'шт'), ('сахар', 'шт')}
+
+    again = import_ingredients(iter(rows), mode='batch', batch_size=2)
+    assert (again.units, again.ingredients) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_import_ingredients_counts_only_inserted_rows(monkeypatch):
+    rows = [{'name': 'мука', 'measurement_unit': 'г'}]
+    import_ingredients(iter(rows), mode='batch')
+    # Строки, вставленные параллельной загрузкой после проверки
+    # существующих, отбрасывает ignore_conflicts
+    monkeypatch.setattr(
+        ingredient_import, '_existing_pairs', lambda pairs: set()
+    )
+
+    again = import_ingredients(iter(rows), mode='batch')
+
+    assert (again.rows, again.units, again.ingredients) == (1, 0, 0)
+
+
+@pytest.mark.django_db
+def test_import_ingredients_copy_requires_postgresql(settings):
+    from django.db import connection
+
+    if connection.vendor == 'postgresql':
+        pytest.skip('Проверка для баз без COPY')
+    with pytest.raises(ValueError):
+        import_ingredients([], mode='copy')
@@ -0,0 +1,72 @@
+import pytest
+
+from recipes.models import Ingredient, MeasurementUnit
+from recipes.services.ingredient_index import (
+    IngredientPrefixIndex,
+    build_ingredient_index,
+    get_ingredient_index,
+)
+
+
+@pytest.fixture
+def catalog(unit):
+    piece = MeasurementUnit.objects.create(name='шт.')
+    for name, measurement_unit in (
+        ('Яблоко', piece),
+        ('яблочный сок', unit),
+        ('Абрикос', piece),
+        ('Apple', unit),
+        ('apricot', unit),
+    ):
+        Ingredient.objects.create(
+            name=name, measurement_unit=measurement_unit
+        )
+
+
+@pytest.mark.django_db
+def test_search_is_case_insensitive_and_sorted(catalog, ingredient_index_path):
+    assert build_ingredient_index(ingredient_index_path) == 5
+    index = IngredientPrefixIndex(ingredient_index_path)
+
+    assert [item['name'] for item in index.search('ЯБЛ', 10)] == [
+        'Яблоко',
+        'яблочный сок',
+    ]
+    assert [item['name'] for item in index.search('ap', 10)] == [
+        'Apple',
+        'apricot',
+    ]
+    assert index.search('Абрикос', 10) == [
+        {
+            'id': Ingredient.objects.get(name='Абрикос').id,
+            'name': 'Абрикос',
+            'measurement_unit': 'шт.',
+        }
+    ]
+    assert index.search('zzz', 10) == []
+
+
+@pytest.mark.django_db
+def test_search_respects_limit(catalog, ingredient_index_path):
+    build_ingredient_index(ingredient_index_path)
+    index = IngredientPrefixIndex(ingredient_index_path)
+
+    assert len(index.search('', 3)) == 3
+
+
+@pytest.mark.django_db
+def test_index_is_reloaded_after_rebuild(unit):
+    Ingredient.objects.create(name='Apple', measurement_unit=unit)
+    assert len(get_ingredient_index().search('a', 10)) == 1
+
+    Ingredient.objects.create(name='Apricot', measurement_unit=unit)
+    build_ingredient_index()
+
+    assert len(get_ingredient_index().search('a', 10)) == 2
+
+
+@pytest.mark.django_db
+def test_empty_catalog(ingredient_index_path):
+    build_ingredient_index(ingredient_index_path)
+
+    assert IngredientPrefixIndex(ingredient_index_path).search('a', 10) == []
@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+from recipes.services.passwords import hash_passwords
+
+
+def write_data(path, recipes):
+    files = {
+        'tags.json': [
+            {'name': 'Завтрак', 'slug': 'breakfast'},
+            {'name': 'Обед', 'slug': 'lunch'},
+        ],
+        'units.json': [{'name': 'г'}, {'name': 'шт'}],
+        'ingredients.json': [
+            {'name': 'мука', 'measurement_unit': 'г'},
+            {'name': 'яйца', 'measurement_unit': 'шт'},
+        ],
+        'users.json': [
+            {
+                'email': f'cook{number}@example.com',
+                'username': f'cook{number}',
+                'first_name': 'Повар',
+                'last_name': str(number),
+                'password': 'secret-password',
+            }
+            for number in range(2)
+        ],
+        'recipes.json': recipes,
+    }
+    for name, data in files.items():
+        (path / name).write_text(json.dumps(data, ensure_ascii=False))
+
+
+def recipe(number, tags=('breakfast',)):
+    return {
+        'author_email': f'cook{number % 2}@example.com',
+        'name': f'Блины {number}',
+        'text': 'Смешать и пожарить.',
+        'cooking_time': 20,
+        'tags': list(tags),
+        'ingredients': [
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 200},
+            {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 2},
+        ],
+    }
+
+
+@pytest.mark.django_db
+def test_load_demo_data_is_idempotent(tmp_path):
+    write_data(tmp_path, [recipe(number) for number in range(5)])
+
+    for _ in range(2):
+        call_command(
+            'load_demo_data',
+            data_dir=str(tmp_path),
+            batch_size=2,
+            workers=2,
+            stdout=io.StringIO(),
+        )
+
+    assert User.objects.count() == 2
+    assert User.objects.get(username='cook0').check_password(
+        'secret-password'
+    )
+    assert Tag.objects.count() == 2
+    assert Ingredient.objects.count() == 2
+    assert Recipe.objects.count() == 5
+    assert RecipeIngredient.objects.count() == 10
+    assert Recipe.tags.through.objects.count() == 5
+    assert User.objects.get(username='cook0').recipes_count == 3
+
+
+@pytest.mark.django_db
+def test_load_demo_data_fails_on_unknown_tag(tmp_path):
+    write_data(tmp_path, [recipe(0, tags=('breakfast', 'dinner'))])
+
+    with pytest.raises(CommandError, match='dinner'):
+        call_command(
+            'load_demo_data', data_dir=str(tmp_path), stdout=io.StringIO()
+        )
+
+    assert not Recipe.objects.exists()
+
+
+def test_hash_passwords_in_process_pool(settings):
+    # Быстрый хэшер: процессы пула наследуют настройки при fork
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher'
+    ]
+    passwords = [f'password-{number}' for number in range(20)]
+    reported = []
+
+    hashes = hash_passwords(
+        passwords, workers=2, progress=lambda done, total: reported.append(done)
+    )
+
+    assert len(hashes) == len(set(hashes)) == 20
+    assert all(map(check_password, passwords, hashes))
+    assert reported == [16, 20]
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ScoreCheckpoint, ShoppingCart
+from recipes.services.scores import refresh_scores
+
+
+@pytest.fixture(autouse=True)
+def no_refresh_lag(settings):
+    settings.RECIPE_SCORE_REFRESH_LAG = timedelta(0)
+
+
+@pytest.fixture
+def recipes(author):
+    return Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'R{number}', text='T', cooking_time=1)
+        for number in range(3)
+    )
+
+
+def add(model, user, recipe, days_ago):
+    relation = model.objects.create(user=user, recipe=recipe)
+    model.objects.filter(pk=relation.pk).update(
+        created_at=timezone.now() - timedelta(days=days_ago)
+    )
+    return relation
+
+
+def ranked(field):
+    return list(
+        Recipe.objects.order_by(f'-{field}', '-id').values_list(
+            'pk', flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_trending_prefers_recent_activity_popular_prefers_volume(
+    user, author, recipes
+):
+    old, recent, _ = recipes
+    add(Favorite, user, old, days_ago=20)
+    add(Favorite, author, old, days_ago=20)
+    add(ShoppingCart, user, old, days_ago=20)
+    add(Favorite, user, recent, days_ago=0)
+
+    assert refresh_scores() == {'favorite': 3, 'shopping_cart': 1}
+
+    assert ranked('popularity_score')[0] == old.pk
+    assert ranked('trending_score')[0] == recent.pk
+
+
+@pytest.mark.django_db
+def test_refresh_is_incremental_and_full_accounts_for_removals(
+    user, author, recipes
+):
+    first, second, _ = recipes
+    favorite = add(Favorite, user, first, days_ago=1)
+    refresh_scores()
+    score = Recipe.objects.get(pk=first.pk).popularity_score
+
+    # Уже учтенные строки повторно не прибавляются
+    assert refresh_scores() == {'favorite': 0, 'shopping_cart': 0}
+    add(Favorite, author, second, days_ago=1)
+    refresh_scores()
+    assert Recipe.objects.get(pk=first.pk).popularity_score == score
+    assert ScoreCheckpoint.objects.get(source='favorite').last_id > (
+        favorite.pk
+    )
+
+    favorite.delete()
+    refresh_scores(full=True)
+    assert Recipe.objects.get(pk=first.pk).popularity_score == 0
+    assert Recipe.objects.get(pk=second.pk).popularity_score == (
+        pytest.approx(score)
+    )
+
+
+@pytest.mark.django_db
+def test_recipes_ordering_by_scores(user, user_client, recipes):
+    add(Favorite, user, recipes[0], days_ago=30)
+    add(Favorite, user, recipes[1], days_ago=0)
+    add(ShoppingCart, user, recipes[0], days_ago=30)
+    refresh_scores()
+    url = reverse('recipes-list')
+
+    response = user_client.get(url, {'ordering': 'trending'})
+    ids = [recipe['id'] for recipe in response.data['results']]
+    assert ids == [recipes[1].pk, recipes[0].pk, recipes[2].pk]
+
+    response = user_client.get(
+        url, {'ordering': 'trending', 'cursor': '', 'limit': 2}
+    )
+    next_page = user_client.get(response.data['next'])
+    assert [recipe['id'] for recipe in next_page.data['results']] == [
+        recipes[2].pk
+    ]
+
+    assert user_client.get(url, {'ordering': 'best'}).status_code == 400
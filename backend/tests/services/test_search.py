@@ -0,0 +1,66 @@
+import pytest
+
+from recipes.models import Recipe
+from recipes.services.search import (
+    delete_from_search_index,
+    search_recipes,
+    update_search_index,
+)
+
+
+@pytest.fixture
+def indexed_recipes(recipe1, recipe2, other_recipe):
+    recipe1.name = 'Яблочный пирог'
+    recipe1.save()
+    recipe2.text = 'Пирог с яблоками и корицей'
+    recipe2.save()
+    update_search_index([recipe1.id, recipe2.id, other_recipe.id])
+    return recipe1, recipe2, other_recipe
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_matches_first(indexed_recipes):
+    recipe1, recipe2, _ = indexed_recipes
+
+    results = list(search_recipes(Recipe.objects.all(), 'пирог'))
+
+    assert results == [recipe1, recipe2]
+
+
+@pytest.mark.django_db
+def test_search_matches_word_prefixes_and_ingredients(indexed_recipes):
+    recipe1, recipe2, other_recipe = indexed_recipes
+
+    assert list(search_recipes(Recipe.objects.all(), 'ябл')) == [
+        recipe1,
+        recipe2,
+    ]
+    assert set(search_recipes(Recipe.objects.all(), 'banana')) == {
+        recipe1,
+        other_recipe,
+    }
+
+
+@pytest.mark.django_db
+def test_search_escapes_query_syntax(indexed_recipes):
+    assert list(search_recipes(Recipe.objects.all(), '"OR (NEAR')) == []
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_is_removed_from_index(indexed_recipes):
+    recipe1, recipe2, _ = indexed_recipes
+
+    delete_from_search_index([recipe1.id])
+
+    assert list(search_recipes(Recipe.objects.all(), 'пирог')) == [recipe2]
+
+
+@pytest.mark.django_db
+def test_search_is_filtered_and_counted_in_sql(indexed_recipes):
+    recipe1, recipe2, _ = indexed_recipes
+    found = search_recipes(Recipe.objects.all(), 'пирог')
+
+    assert found.filter(pk=recipe2.pk).count() == 1
+    assert list(found.exclude(pk=recipe1.pk)) == [recipe2]
+    assert found.count() == 2
+    assert found[0].search_rank > found[1].search_rank
@@ -2,10 +2,18 @@
 
 import pytest
 
-from recipes.models import ShoppingCart
+from recipes.models import RecipeIngredient, ShoppingCart
 from recipes.services.shopping_cart import (
     build_file_response,
+    build_streaming_file_response,
+    encode_chunks,
+    add_recipe_to_shopping_list,
     get_shopping_cart_ingredients,
+    get_shopping_cart_version,
+    get_shopping_list_items,
+    iter_as_txt,
+    rebuild_shopping_lists,
+    remove_recipe_from_shopping_list,
     render_as_csv,
     render_as_json,
     render_as_txt,
@@ -40,6 +48,42 @@ def test_get_shopping_cart_ingredients_aggregates_and_sorts(
     ]
 
 
+@pytest.mark.django_db
+def test_shopping_list_is_maintained_incrementally(
+    recipe1, recipe2, author
+):
+    version = get_shopping_cart_version(author)
+    for recipe in (recipe1, recipe2):
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+        add_recipe_to_shopping_list(author, recipe)
+
+    assert list(get_shopping_list_items(author)) == list(
+        get_shopping_cart_ingredients(author)
+    )
+
+    ShoppingCart.objects.filter(user=author, recipe=recipe1).delete()
+    remove_recipe_from_shopping_list(author, recipe1)
+
+    assert list(get_shopping_list_items(author)) == [
+        {'name': 'Apple', 'measure_unit': 'g', 'total_amount': 50},
+    ]
+    assert get_shopping_cart_version(author) == version + 3
+
+
+@pytest.mark.django_db
+def test_rebuild_shopping_lists_fixes_drift(recipe1, recipe2, author):
+    for recipe in (recipe1, recipe2):
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+        add_recipe_to_shopping_list(author, recipe)
+    RecipeIngredient.objects.filter(recipe=recipe2).update(amount=10)
+
+    rebuild_shopping_lists([author.id])
+
+    assert list(get_shopping_list_items(author)) == list(
+        get_shopping_cart_ingredients(author)
+    )
+
+
 def test_render_as_txt():
     data = [
         {'name': 'Sugar', 'total_amount': 10, 'measure_unit': 'g'},
@@ -70,6 +114,43 @@ def test_render_as_json():
     ]
 
 
+@pytest.mark.parametrize('size', (0, 1, 3))
+def test_render_as_json_matches_json_dumps(size):
+    data = [
+        {'name': f'Соль {i}', 'total_amount': i, 'measure_unit': 'г'}
+        for i in range(size)
+    ]
+    expected = [
+        {'name': f'Соль {i}', 'amount': i, 'measurement_unit': 'г'}
+        for i in range(size)
+    ]
+    assert render_as_json(data) == json.dumps(
+        expected, ensure_ascii=False, indent=2
+    )
+
+
+def test_encode_chunks_sends_header_first():
+    data = [
+        {'name': 'Sugar', 'total_amount': i, 'measure_unit': 'g'}
+        for i in range(100)
+    ]
+    chunks = list(encode_chunks(iter_as_txt(data), chunk_size=64))
+
+    assert chunks[0] == b'Ingredient - Total Amount - Measurement Unit'
+    assert len(chunks) > 2
+    assert b''.join(chunks).decode() == render_as_txt(data)
+
+
+def test_build_streaming_file_response():
+    response = build_streaming_file_response(
+        iter([b'a', b'bc']), 'file.txt', 'text/plain'
+    )
+
+    assert response.streaming
+    assert b''.join(response.streaming_content) == b'abc'
+    assert response['Content-Disposition'] == 'attachment; filename="file.txt"'
+
+
 def test_build_file_response():
     response = build_file_response('abc', 'file.txt', 'text/plain')
 
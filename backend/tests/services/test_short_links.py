@@ -1,4 +1,9 @@
-﻿import pytest
+﻿import os
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 from recipes.services import short_links
 
@@ -47,3 +52,87 @@ def test_get_short_link_uses_request_builder():
 def test_get_id_from_short_link_decodes_hashid():
     code = short_links.encode_hashid(5)
     assert short_links.get_id_from_short_link(code) == 5
+
+
+def short_link_url(recipe_id):
+    return reverse(
+        'short-recipe-link', args=[short_links.encode_hashid(recipe_id)]
+    )
+
+
+@pytest.mark.django_db
+def test_short_link_redirect_is_cached(anonym_client, recipe1):
+    url = short_link_url(recipe1.id)
+    anonym_client.get(url)
+
+    with CaptureQueriesContext(connection) as context:
+        response = anonym_client.get(url)
+
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe1.id}'
+    assert 'public' in response['Cache-Control']
+    assert 'max-age' in response['Cache-Control']
+    assert len(context.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_missing_recipe_is_cached_until_created(
+    author, author_client, recipe1, django_capture_on_commit_callbacks
+):
+    missing_id = recipe1.id + 1
+    assert not short_links.recipe_exists(missing_id)
+    with CaptureQueriesContext(connection) as context:
+        assert not short_links.recipe_exists(missing_id)
+    assert len(context.captured_queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe1.pk = None
+        recipe1.save()
+        short_links.invalidate_short_links([recipe1.pk])
+
+    assert recipe1.pk == missing_id
+    assert short_links.recipe_exists(missing_id)
+
+
+@pytest.mark.django_db
+def test_deleting_recipe_invalidates_short_link(
+    author_client, anonym_client, recipe1, django_capture_on_commit_callbacks
+):
+    url = short_link_url(recipe1.id)
+    assert anonym_client.get(url).status_code == 302
+
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.delete(reverse('recipes-detail', args=[recipe1.id]))
+
+    assert anonym_client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_short_links_map(tmp_path, recipe1, recipe2):
+    path = tmp_path / 'nginx' / 'short_links.map'
+
+    count = short_links.export_short_links_map(path)
+
+    code = short_links.encode_hashid(recipe1.id)
+    assert count == 2
+    lines = path.read_text().splitlines()
+    assert f'/s/{code} /recipes/{recipe1.id};' in lines
+    assert f'/s/{code}/ /recipes/{recipe1.id};' in lines
+
+
+@pytest.mark.django_db
+def test_export_short_links_map_rewrites_only_changed_map(
+    tmp_path, recipe1, recipe2
+):
+    path = tmp_path / 'short_links.map'
+    short_links.export_short_links_map(path)
+    os.utime(path, (0, 0))
+
+    short_links.export_short_links_map(path)
+    assert path.stat().st_mtime == 0
+
+    recipe2.delete()
+    assert short_links.export_short_links_map(path) == 1
+    assert path.stat().st_mtime > 0
+    assert f'/recipes/{recipe2.id};' not in path.read_text()
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,22 @@
+#!/bin/sh
+# Запускается образом nginx из /docker-entrypoint.d перед стартом nginx.
+# Директива map читается только при загрузке конфигурации, поэтому после
+# каждой новой выгрузки карты коротких ссылок (export_short_links в
+# контейнере бэкенда) нужен nginx -s reload. Раз в
+# SHORT_LINKS_RELOAD_INTERVAL секунд сравнивается время изменения карт.
+
+INTERVAL=${SHORT_LINKS_RELOAD_INTERVAL:-30}
+
+map_mtimes() {
+    stat -c %Y /short_links/*.map 2>/dev/null
+}
+
+(
+    last=$(map_mtimes)
+    while sleep "$INTERVAL"; do
+        current=$(map_mtimes)
+        if [ "$current" != "$last" ] && nginx -s reload; then
+            last=$current
+        fi
+    done
+) &